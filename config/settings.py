@@ -115,6 +115,19 @@ STORAGES = {
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Caches. LLM responses go to a file-based cache so that separate
+# analyze_refactoring runs can reuse them.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'llm': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('LLM_CACHE_DIR', BASE_DIR / 'llm_cache'),
+        'TIMEOUT': 7 * 24 * 3600,
+    },
+}
+
 # Django Components
 COMPONENTS = {
     'autodiscover': True,
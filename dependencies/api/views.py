@@ -24,7 +24,7 @@ from django.utils import timezone
 from django.db import transaction
 
 from dependencies.models import (
-    Component, Dependency, AnalysisRun, LayerDefinition,
+    Component, AnalysisRun, LayerDefinition,
     LayerAssignment, LayerViolation, NodeMetrics
 )
 from dependencies.components.graph.graph import (
@@ -35,26 +35,15 @@ from dependencies.components.graph.graph import (
     find_sccs_kosaraju,
     louvain_communities,
     calculate_all_metrics,
+    build_adjacency,
 )
 
 
-def build_adjacency() -> dict[str, set[str]]:
-    """Build adjacency list from database."""
-    adjacency: dict[str, set[str]] = {}
-    for dep in Dependency.objects.select_related('source', 'target').all():
-        source_key = str(dep.source.id)
-        target_key = str(dep.target.id)
-        adjacency.setdefault(source_key, set()).add(target_key)
-    for component in Component.objects.all():
-        adjacency.setdefault(str(component.id), set())
-    return adjacency
-
-
 def get_layer_assignments() -> dict[str, int]:
     """Get layer assignments from database."""
     return {
-        str(la.component.id): la.layer.level
-        for la in LayerAssignment.objects.select_related('component', 'layer').all()
+        str(component_id): level
+        for component_id, level in LayerAssignment.objects.values_list('component_id', 'layer__level')
     }
 
 
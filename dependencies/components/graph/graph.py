@@ -1,8 +1,15 @@
 import fnmatch
+import heapq
 import json
 import math
+import random
 import re
 import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import cached_property
+from itertools import chain
 from django_components import Component, register
 
 # Time limits for expensive operations (in seconds)
@@ -12,11 +19,58 @@ MAX_CYCLE_TIME = 1.0
 MAX_TRAVERSAL_TIME = 2.0
 MAX_TOPO_SORT_TIME = 2.0
 MAX_CENTRALITY_TIME = 5.0
+
+# Graph size from which betweenness centrality is computed in worker processes
+PARALLEL_CENTRALITY_MIN_NODES = 200
+
+# Rows fetched per round trip when streaming the graph from the database
+ADJACENCY_CHUNK_SIZE = 5000
 from django.http import HttpRequest, JsonResponse, HttpResponse
 from django.urls import path
 from django.views.decorators.csrf import csrf_exempt
 from dependencies.models import Component, Dependency, NodeGroup
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+def _dumps_json(data) -> str:
+    """Serialize graph data to a JSON string, using orjson when available."""
+    if HAS_ORJSON:
+        return orjson.dumps(data).decode('utf-8')
+    return json.dumps(data)
+
+
+def _json_response(data: dict, status: int = 200) -> HttpResponse:
+    """Build a JSON response, bypassing Django's encoder when orjson is available."""
+    if HAS_ORJSON:
+        return HttpResponse(orjson.dumps(data), content_type='application/json', status=status)
+    return JsonResponse(data, status=status)
+
+
+def build_adjacency() -> dict[str, set[str]]:
+    """Build adjacency list of component ids from the database."""
+    adjacency: dict[str, set[str]] = {}
+
+    # Stringify each id once; edges reuse the component's key string
+    keys = {}
+    component_ids = Component.objects.values_list('id', flat=True)
+    for component_id in component_ids.iterator(chunk_size=ADJACENCY_CHUNK_SIZE):
+        keys[component_id] = key = str(component_id)
+        adjacency[key] = set()
+
+    # Only the id columns are needed; skip the join and model instances
+    edges = Dependency.objects.values_list('source_id', 'target_id')
+    for source_id, target_id in edges.iterator(chunk_size=ADJACENCY_CHUNK_SIZE):
+        source_key = keys.get(source_id) or str(source_id)
+        target_key = keys.get(target_id) or str(target_id)
+        adjacency.setdefault(source_key, set()).add(target_key)
+
+    return adjacency
+
 
 # =============================================================================
 # Graph Algorithms for Refactoring Analysis
@@ -25,81 +79,31 @@ from dependencies.models import Component, Dependency, NodeGroup
 
 def find_sccs_kosaraju(adjacency: dict[str, set[str]], timeout: float = None) -> list[list[str]]:
     """
-    Find all strongly connected components using Kosaraju's algorithm (iterative).
+    Find all strongly connected components.
 
-    Returns list of SCCs, each SCC is a list of node IDs.
-    SCCs with size >= 2 indicate cyclic dependencies.
+    Runs the iterative Tarjan's algorithm over integer node ids (see
+    _build_index); the name is kept for existing callers.
+
+    Returns list of SCCs, each SCC is a list of node IDs, in topological
+    order of the condensed graph. SCCs with size >= 2 indicate cyclic
+    dependencies.
 
     Includes timeout to prevent hanging on large graphs.
     """
     if timeout is None:
         timeout = MAX_SCC_TIME
 
-    start_time = time.time()
-
-    # Ensure all nodes are included
-    all_nodes = set(adjacency.keys())
-    for targets in adjacency.values():
-        all_nodes.update(targets)
-
-    if not all_nodes:
-        return []
-
-    # Build reverse graph
-    reverse_adj: dict[str, set[str]] = {node: set() for node in all_nodes}
-    for source, targets in adjacency.items():
-        for target in targets:
-            reverse_adj[target].add(source)
-
-    # Step 1: DFS on original graph to get finish order
-    visited = set()
-    finish_order = []
+    nodes, succ = _build_index(adjacency)
+    scc_id = _tarjan_scc_ids(succ, time.time() + timeout)
+    if scc_id is None:
+        return []  # Timeout - return empty
 
-    for start in all_nodes:
-        if time.time() - start_time > timeout:
-            return []  # Timeout - return empty
-
-        if start in visited:
-            continue
-        # Iterative DFS
-        stack = [(start, False)]
-        while stack:
-            node, processed = stack.pop()
-            if processed:
-                finish_order.append(node)
-                continue
-            if node in visited:
-                continue
-            visited.add(node)
-            stack.append((node, True))  # Mark for post-processing
-            for neighbor in adjacency.get(node, set()):
-                if neighbor not in visited:
-                    stack.append((neighbor, False))
-
-    # Step 2: DFS on reverse graph in reverse finish order
-    visited.clear()
-    sccs = []
-
-    for node in reversed(finish_order):
-        if time.time() - start_time > timeout:
-            break  # Timeout - return what we have
-
-        if node in visited:
-            continue
-        # Iterative DFS on reverse graph
-        scc = []
-        stack = [node]
-        while stack:
-            current = stack.pop()
-            if current in visited:
-                continue
-            visited.add(current)
-            scc.append(current)
-            for neighbor in reverse_adj.get(current, set()):
-                if neighbor not in visited:
-                    stack.append(neighbor)
-        sccs.append(scc)
+    sccs: list[list[str]] = [[] for _ in range(max(scc_id, default=-1) + 1)]
+    for node, component in zip(nodes, scc_id):
+        sccs[component].append(node)
 
+    # Tarjan completes SCCs sinks first
+    sccs.reverse()
     return sccs
 
 
@@ -221,23 +225,9 @@ def louvain_communities(adjacency: dict[str, set[str]], resolution: float = 1.0,
     node_to_community = {node: i for i, node in enumerate(nodes)}
     communities = {i: {node} for i, node in enumerate(nodes)}
 
-    def modularity_gain(node, target_comm):
-        """Calculate modularity gain from moving node to target_comm."""
-        current_comm = node_to_community[node]
-        if current_comm == target_comm:
-            return 0.0
-
-        # Edges from node to target community (outgoing + incoming)
-        k_i_in = sum(1 for neighbor in adjacency.get(node, set())
-                     if node_to_community.get(neighbor) == target_comm)
-        k_i_in += sum(1 for source in incoming.get(node, set())
-                      if node_to_community.get(source) == target_comm)
-
-        # Sum of degrees in target community
-        sigma_tot = sum(degree[n] for n in communities.get(target_comm, set()))
-        k_i = degree[node]
-
-        return (k_i_in / m) - resolution * (sigma_tot * k_i) / (2 * m * m)
+    # Sum of degrees per community, kept up to date as nodes move so the
+    # modularity gain does not re-sum the members of every candidate
+    sigma_tot = {i: degree[node] for i, node in enumerate(nodes)}
 
     # Greedy optimization
     improved = True
@@ -253,19 +243,24 @@ def louvain_communities(adjacency: dict[str, set[str]], resolution: float = 1.0,
 
         for node in nodes:
             current_comm = node_to_community[node]
+            k_i = degree[node]
 
-            # Find neighboring communities (using pre-computed incoming)
+            # Find neighboring communities and count the edges (outgoing +
+            # incoming) from node into each of them in a single pass
             neighbor_comms = set()
-            for neighbor in adjacency.get(node, set()):
-                neighbor_comms.add(node_to_community[neighbor])
-            for source in incoming.get(node, set()):
-                neighbor_comms.add(node_to_community[source])
+            k_i_in = {}
+            for neighbor in chain(adjacency.get(node, ()), incoming[node]):
+                comm = node_to_community[neighbor]
+                neighbor_comms.add(comm)
+                k_i_in[comm] = k_i_in.get(comm, 0) + 1
 
             best_comm = current_comm
             best_gain = 0.0
 
             for target_comm in neighbor_comms:
-                gain = modularity_gain(node, target_comm)
+                if target_comm == current_comm:
+                    continue
+                gain = (k_i_in[target_comm] / m) - resolution * (sigma_tot[target_comm] * k_i) / (2 * m * m)
                 if gain > best_gain:
                     best_gain = gain
                     best_comm = target_comm
@@ -279,6 +274,8 @@ def louvain_communities(adjacency: dict[str, set[str]], resolution: float = 1.0,
                     communities[best_comm] = set()
                 communities[best_comm].add(node)
                 node_to_community[node] = best_comm
+                sigma_tot[current_comm] -= k_i
+                sigma_tot[best_comm] += k_i
                 improved = True
 
     # Convert to list format
@@ -470,12 +467,104 @@ def enumerate_cycles(
     return valid_cycles
 
 
+def _build_index(
+    adjacency: dict[str, set[str]],
+    ordered: bool = False,
+) -> tuple[list[str], list[list[int]]]:
+    """
+    Map graph nodes to integer ids for the list-based algorithms.
+
+    Args:
+        adjacency: Graph as adjacency list {node: {neighbors}}
+        ordered: Assign ids in sorted node order, so comparing ids
+            compares node IDs
+
+    Returns:
+        - List of node IDs, where the position is the node's integer id
+        - Successor lists indexed by integer id
+    """
+    all_nodes = set(adjacency.keys())
+    for targets in adjacency.values():
+        all_nodes.update(targets)
+
+    nodes = sorted(all_nodes) if ordered else list(all_nodes)
+    node_to_idx = {node: i for i, node in enumerate(nodes)}
+    succ = [[node_to_idx[w] for w in adjacency.get(node, ())] for node in nodes]
+    return nodes, succ
+
+
+def _tarjan_scc_ids(succ: list[list[int]], deadline: float) -> list[int] | None:
+    """
+    Label each node with its SCC using an iterative Tarjan's algorithm.
+
+    Args:
+        succ: Successor lists indexed by integer node id
+        deadline: Absolute time.time() value after which to give up
+
+    Returns:
+        SCC id per node id, or None if the deadline passed.
+    """
+    n = len(succ)
+    index = [-1] * n
+    lowlink = [0] * n
+    on_stack = [False] * n
+    scc_id = [-1] * n
+    stack = []
+    counter = 0
+    scc_count = 0
+
+    for root in range(n):
+        if index[root] >= 0:
+            continue
+        if time.time() > deadline:
+            return None
+
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        # Work stack of (node, next child position) replaces recursion
+        work = [(root, 0)]
+        while work:
+            v, i = work[-1]
+            children = succ[v]
+            if i < len(children):
+                work[-1] = (v, i + 1)
+                w = children[i]
+                if index[w] < 0:
+                    index[w] = lowlink[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, 0))
+                elif on_stack[w] and index[w] < lowlink[v]:
+                    lowlink[v] = index[w]
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if lowlink[v] < lowlink[parent]:
+                    lowlink[parent] = lowlink[v]
+            if lowlink[v] == index[v]:
+                # v is the root of an SCC; pop its members
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    scc_id[w] = scc_count
+                    if w == v:
+                        break
+                scc_count += 1
+
+    return scc_id
+
+
 def get_cycle_edges(adjacency: dict[str, set[str]], timeout: float = None) -> set[tuple[str, str]]:
     """
     Find all edges that are part of any cycle using SCC detection.
 
     An edge is in a cycle if both endpoints are in the same SCC of size >= 2,
-    or if it's a self-loop.
+    or if it's a self-loop. Both cases reduce to the endpoints sharing an SCC.
     This is much faster than enumerating all cycles (O(V+E) vs exponential).
 
     Returns a set of (source, target) tuples.
@@ -483,38 +572,21 @@ def get_cycle_edges(adjacency: dict[str, set[str]], timeout: float = None) -> se
     if timeout is None:
         timeout = MAX_CYCLE_TIME
 
-    start_time = time.time()
-
-    cycle_edges = set()
-
-    # First, detect self-loops (A -> A) - these are cycles of length 1
-    for source, targets in adjacency.items():
-        if source in targets:
-            cycle_edges.add((source, source))
-
-    # Find SCCs using Kosaraju's algorithm
-    sccs = find_sccs_kosaraju(adjacency, timeout=timeout)
+    deadline = time.time() + timeout
 
-    # Check timeout
-    if time.time() - start_time > timeout:
-        return cycle_edges  # Return at least the self-loops we found
+    nodes, succ = _build_index(adjacency)
+    scc_id = _tarjan_scc_ids(succ, deadline)
 
-    # Build a mapping from node to its SCC (only for SCCs with cycles)
-    node_to_scc = {}
-    for scc_idx, scc in enumerate(sccs):
-        if len(scc) >= 2:  # Only SCCs with 2+ nodes have cycles
-            for node in scc:
-                node_to_scc[node] = scc_idx
+    if scc_id is None:
+        # Timeout - return at least the self-loops
+        return {(source, source) for source, targets in adjacency.items() if source in targets}
 
-    # An edge is in a cycle if both endpoints are in the same multi-node SCC
-    for source, targets in adjacency.items():
-        source_scc = node_to_scc.get(source)
-        if source_scc is not None:
-            for target in targets:
-                if node_to_scc.get(target) == source_scc:
-                    cycle_edges.add((source, target))
-
-    return cycle_edges
+    return {
+        (nodes[v], nodes[w])
+        for v, targets in enumerate(succ)
+        for w in targets
+        if scc_id[v] == scc_id[w]
+    }
 
 
 def matches_filter(text: str, pattern: str) -> bool:
@@ -780,53 +852,50 @@ def topological_sort(
 
     start_time = time.time()
 
-    # Get all nodes
-    all_nodes = set(adjacency.keys())
-    for targets in adjacency.values():
-        all_nodes.update(targets)
+    # Ids follow sorted node order, so the smallest ready id is the
+    # smallest ready node
+    nodes, succ = _build_index(adjacency, ordered=True)
 
-    if not all_nodes:
+    if not nodes:
         return [], True, []
 
     # Calculate in-degree for each node
-    in_degree = {node: 0 for node in all_nodes}
-    for targets in adjacency.values():
+    in_degree = [0] * len(nodes)
+    for targets in succ:
         for target in targets:
             in_degree[target] += 1
 
-    # Queue of nodes with no incoming edges
-    queue = [node for node in all_nodes if in_degree[node] == 0]
+    # Heap of nodes with no incoming edges; popped in sorted order for
+    # deterministic output
+    queue = [v for v, degree in enumerate(in_degree) if degree == 0]
     result = []
 
     while queue:
         if time.time() - start_time > timeout:
             break
 
-        # Sort queue for deterministic output
-        queue.sort()
-        node = queue.pop(0)
-        result.append(node)
+        v = heapq.heappop(queue)
+        result.append(v)
 
-        for neighbor in adjacency.get(node, set()):
-            in_degree[neighbor] -= 1
-            if in_degree[neighbor] == 0:
-                queue.append(neighbor)
+        for w in succ[v]:
+            in_degree[w] -= 1
+            if in_degree[w] == 0:
+                heapq.heappush(queue, w)
 
     # Check if we processed all nodes (DAG) or have cycles
-    is_dag = len(result) == len(all_nodes)
+    is_dag = len(result) == len(nodes)
 
     # Find back edges (edges that create cycles)
     back_edges = []
     if not is_dag:
         # Nodes with remaining in-degree are in cycles
-        cycle_nodes = {node for node, degree in in_degree.items() if degree > 0}
-        for source, targets in adjacency.items():
-            if source in cycle_nodes:
-                for target in targets:
-                    if target in cycle_nodes:
-                        back_edges.append((source, target))
+        for v, targets in enumerate(succ):
+            if in_degree[v] > 0:
+                for w in targets:
+                    if in_degree[w] > 0:
+                        back_edges.append((nodes[v], nodes[w]))
 
-    return result, is_dag, back_edges
+    return [nodes[v] for v in result], is_dag, back_edges
 
 
 def assign_topological_layers(
@@ -999,9 +1068,8 @@ def calculate_instability(adjacency: dict[str, set[str]]) -> dict[str, dict]:
         metrics[source]['efferent'] = len(targets)
 
     # Calculate afferent coupling (incoming)
-    for targets in adjacency.values():
-        for target in targets:
-            metrics[target]['afferent'] += 1
+    for target, count in Counter(chain.from_iterable(adjacency.values())).items():
+        metrics[target]['afferent'] = count
 
     # Calculate instability
     for node, m in metrics.items():
@@ -1039,10 +1107,7 @@ def calculate_degree_centrality(adjacency: dict[str, set[str]]) -> dict[str, flo
 
     # Calculate degrees
     out_degree = {node: len(adjacency.get(node, set())) for node in all_nodes}
-    in_degree = {node: 0 for node in all_nodes}
-    for targets in adjacency.values():
-        for target in targets:
-            in_degree[target] += 1
+    in_degree = Counter(chain.from_iterable(adjacency.values()))
 
     # Normalize
     max_possible = 2 * (n - 1)  # Max possible degree in directed graph
@@ -1054,9 +1119,93 @@ def calculate_degree_centrality(adjacency: dict[str, set[str]]) -> dict[str, flo
     return centrality
 
 
+def _brandes_accumulate(
+    sources: list[int],
+    succ: list[list[int]],
+    deadline: float,
+) -> list[float]:
+    """
+    Run Brandes' single-source passes for the given sources.
+
+    Works on integer node ids so it can be shipped to worker processes.
+    Stops early once the deadline (an absolute time.time() value) passes.
+
+    Returns:
+        Unnormalized betweenness contribution per node id.
+    """
+    n = len(succ)
+    betweenness = [0.0] * n
+
+    # Scratch buffers allocated once and reused across sources. Only entries
+    # reached from the current source are touched, and they are reset during
+    # back-propagation, so each source starts from a clean state.
+    predecessors: list[list[int]] = [[] for _ in range(n)]
+    sigma = [0] * n  # Number of shortest paths
+    dist = [-1] * n  # Distance from s
+    delta = [0.0] * n
+
+    for s in sources:
+        if time.time() > deadline:
+            break
+
+        # Single-source shortest paths; BFS order doubles as the stack
+        sigma[s] = 1
+        dist[s] = 0
+        order = [s]
+        head = 0
+        while head < len(order):
+            v = order[head]
+            head += 1
+            dist_next = dist[v] + 1
+            for w in succ[v]:
+                # Path discovery
+                if dist[w] < 0:
+                    dist[w] = dist_next
+                    order.append(w)
+                # Path counting
+                if dist[w] == dist_next:
+                    sigma[w] += sigma[v]
+                    predecessors[w].append(v)
+
+        # Back-propagation
+        for w in reversed(order):
+            sigma_w = sigma[w]
+            if sigma_w > 0:
+                coeff = (1 + delta[w]) / sigma_w
+                for v in predecessors[w]:
+                    delta[v] += sigma[v] * coeff
+            if w != s:
+                betweenness[w] += delta[w]
+            # Reset scratch state for the next source
+            predecessors[w].clear()
+            sigma[w] = 0
+            dist[w] = -1
+            delta[w] = 0.0
+
+    return betweenness
+
+
+# Successor lists of the graph being processed, set once per worker process
+_worker_succ: list[list[int]] = None
+
+
+def _init_brandes_worker(succ: list[list[int]]) -> None:
+    """Store the graph in a worker process so tasks only carry their sources."""
+    global _worker_succ
+    _worker_succ = succ
+
+
+def _brandes_worker(sources: list[int], deadline: float) -> list[float]:
+    """Run _brandes_accumulate against the worker's shared graph."""
+    return _brandes_accumulate(sources, _worker_succ, deadline)
+
+
 def calculate_betweenness_centrality(
     adjacency: dict[str, set[str]],
     timeout: float = None,
+    k: int = None,
+    seed: int = None,
+    workers: int = None,
 ) -> dict[str, float]:
     """
     Calculate betweenness centrality for each node using Brandes' algorithm.
@@ -1064,9 +1213,20 @@ def calculate_betweenness_centrality(
     Betweenness centrality measures how often a node lies on shortest paths
     between other nodes. High betweenness indicates a "bridge" or "bottleneck".
 
+    With workers > 1, graphs with at least PARALLEL_CENTRALITY_MIN_NODES
+    nodes are split by source node across worker processes; partial results
+    are summed. The default is serial, so request handlers never fork.
+
+    With k set, only k randomly chosen source nodes are used and their
+    contributions scaled by n/k. This approximates the exact result in
+    O(k*E) instead of O(V*E) time.
+
     Args:
         adjacency: Graph as adjacency list
         timeout: Maximum time in seconds
+        k: Number of sampled source nodes (None = all nodes, exact)
+        seed: Random seed for the source sample
+        workers: Maximum worker processes (None or 1 = serial)
 
     Returns:
         Dict mapping node ID to centrality score (normalized 0.0 to 1.0).
@@ -1074,70 +1234,55 @@ def calculate_betweenness_centrality(
     if timeout is None:
         timeout = MAX_CENTRALITY_TIME
 
-    start_time = time.time()
-
-    # Get all nodes
-    all_nodes = set(adjacency.keys())
-    for targets in adjacency.values():
-        all_nodes.update(targets)
+    deadline = time.time() + timeout
 
-    nodes = list(all_nodes)
+    # Map nodes to integer ids so the inner loops index lists instead of dicts
+    nodes, succ = _build_index(adjacency)
     n = len(nodes)
 
     if n <= 2:
         return {node: 0.0 for node in nodes}
 
-    # Initialize betweenness
-    betweenness = {node: 0.0 for node in nodes}
-
-    # Brandes' algorithm
-    for s in nodes:
-        if time.time() - start_time > timeout:
-            break
-
-        # Single-source shortest paths
-        stack = []
-        predecessors: dict[str, list[str]] = {node: [] for node in nodes}
-        sigma = {node: 0 for node in nodes}  # Number of shortest paths
-        sigma[s] = 1
-        dist = {node: -1 for node in nodes}  # Distance from s
-        dist[s] = 0
-
-        queue = [s]
-        while queue:
-            v = queue.pop(0)
-            stack.append(v)
-            for w in adjacency.get(v, set()):
-                # Path discovery
-                if dist[w] < 0:
-                    dist[w] = dist[v] + 1
-                    queue.append(w)
-                # Path counting
-                if dist[w] == dist[v] + 1:
-                    sigma[w] += sigma[v]
-                    predecessors[w].append(v)
-
-        # Back-propagation
-        delta = {node: 0.0 for node in nodes}
-        while stack:
-            w = stack.pop()
-            for v in predecessors[w]:
-                if sigma[w] > 0:
-                    delta[v] += (sigma[v] / sigma[w]) * (1 + delta[w])
-            if w != s:
-                betweenness[w] += delta[w]
-
-    # Normalize by (n-1)(n-2) for directed graphs
-    norm = (n - 1) * (n - 2) if n > 2 else 1
-    for node in nodes:
-        betweenness[node] /= norm
-
-    return betweenness
+    sources = range(n)
+    scale = 1.0
+    if k and k < n:
+        sources = random.Random(seed).sample(sources, k)
+        scale = n / k
+
+    workers = min(workers or 1, len(sources))
+    betweenness = None
+    if len(sources) >= PARALLEL_CENTRALITY_MIN_NODES and workers > 1:
+        # Sources are independent, so interleave them across workers. The
+        # graph is sent once per worker via the initializer, not per chunk.
+        chunks = [sources[i::workers] for i in range(workers)]
+        try:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_brandes_worker,
+                initargs=(succ,),
+            ) as executor:
+                partials = list(executor.map(
+                    _brandes_worker, chunks, [deadline] * workers
+                ))
+            betweenness = [sum(values) for values in zip(*partials)]
+        except (OSError, BrokenProcessPool):
+            betweenness = None  # Fall back to the serial path
+
+    if betweenness is None:
+        betweenness = _brandes_accumulate(sources, succ, deadline)
+
+    # Normalize by (n-1)(n-2) for directed graphs; scale up sampled sums
+    norm = ((n - 1) * (n - 2) if n > 2 else 1) / scale
+    return {node: betweenness[i] / norm for i, node in enumerate(nodes)}
 
 
 def calculate_all_metrics(
     adjacency: dict[str, set[str]],
     timeout: float = 10.0,
+    ordering: list[str] = None,
+    layers: dict[str, int] = None,
+    betweenness_k: int = None,
+    workers: int = None,
 ) -> dict[str, dict]:
     """
     Calculate all metrics for each node in one pass.
@@ -1148,6 +1293,10 @@ def calculate_all_metrics(
     Args:
         adjacency: Graph as adjacency list
         timeout: Maximum total time in seconds
+        ordering: Precomputed topological_sort ordering, if available
+        layers: Precomputed assign_topological_layers result, if available
+        betweenness_k: Sample size for approximate betweenness (None = exact)
+        workers: Worker processes for betweenness (None = serial)
 
     Returns:
         Dict: {node_id: {all metrics}}
@@ -1159,52 +1308,102 @@ def calculate_all_metrics(
     for targets in adjacency.values():
         all_nodes.update(targets)
 
-    # Initialize with basic metrics
-    basic = calculate_node_metrics(adjacency)
-    instability = calculate_instability(adjacency)
+    if not all_nodes:
+        return {}
 
-    # Combine metrics
+    # Degree-based metrics (coupling, instability, degree centrality) all
+    # derive from in/out-degree, so count those once and fill every node in
+    # a single pass instead of one pass per metric function
+    in_degree = Counter(chain.from_iterable(adjacency.values()))
+    max_degree = 2 * (len(all_nodes) - 1)
     metrics = {}
     for node in all_nodes:
+        fan_in = in_degree[node]
+        fan_out = len(adjacency.get(node, ()))
+        degree = fan_in + fan_out
         metrics[node] = {
-            'fan_in': basic[node]['fan_in'],
-            'fan_out': basic[node]['fan_out'],
-            'coupling_score': basic[node]['coupling_score'],
-            'afferent': instability[node]['afferent'],
-            'efferent': instability[node]['efferent'],
-            'instability': instability[node]['instability'],
+            'fan_in': fan_in,
+            'fan_out': fan_out,
+            'coupling_score': fan_in * 0.6 + fan_out * 0.4,
+            'afferent': fan_in,
+            'efferent': fan_out,
+            'instability': fan_out / degree if degree else 0.0,
+            'degree_centrality': degree / max_degree if max_degree > 0 else 0.0,
         }
 
-    # Add degree centrality (fast)
-    if time.time() - start_time < timeout:
-        degree = calculate_degree_centrality(adjacency)
-        for node in all_nodes:
-            metrics[node]['degree_centrality'] = degree[node]
-
-    # Add betweenness centrality (slower)
+    # Add betweenness centrality (slower). With two nodes or fewer no node
+    # can lie between two others, so skip the shortest-path passes.
     remaining_time = timeout - (time.time() - start_time)
-    if remaining_time > 0:
-        betweenness = calculate_betweenness_centrality(adjacency, timeout=remaining_time)
+    if len(all_nodes) <= 2:
+        for node in all_nodes:
+            metrics[node]['betweenness_centrality'] = 0.0
+    elif remaining_time > 0:
+        betweenness = calculate_betweenness_centrality(
+            adjacency, timeout=remaining_time, k=betweenness_k, workers=workers
+        )
         for node in all_nodes:
             metrics[node]['betweenness_centrality'] = betweenness.get(node, 0.0)
 
     # Add topological info
     remaining_time = timeout - (time.time() - start_time)
-    if remaining_time > 0:
+    if ordering is None and remaining_time > 0:
         ordering, is_dag, _ = topological_sort(adjacency, timeout=remaining_time / 2)
+    if layers is None and remaining_time > 0:
         layers = assign_topological_layers(adjacency, timeout=remaining_time / 2)
 
-        for i, node in enumerate(ordering):
-            if node in metrics:
-                metrics[node]['topological_order'] = i
+    for i, node in enumerate(ordering or []):
+        if node in metrics:
+            metrics[node]['topological_order'] = i
 
-        for node, layer in layers.items():
-            if node in metrics:
-                metrics[node]['layer_depth'] = layer
+    for node, layer in (layers or {}).items():
+        if node in metrics:
+            metrics[node]['layer_depth'] = layer
 
     return metrics
 
 
+class GraphContext:
+    """
+    Lazily computed, memoized analyses of one graph.
+
+    Commands that run several analyses over the same adjacency share one
+    context, so each traversal (SCCs, topological sort, layers, metrics)
+    runs at most once.
+    """
+
+    def __init__(
+        self,
+        adjacency: dict[str, set[str]],
+        betweenness_k: int = None,
+        workers: int = None,
+    ):
+        self.adjacency = adjacency
+        self.betweenness_k = betweenness_k
+        self.workers = workers
+
+    @cached_property
+    def sccs(self) -> list[list[str]]:
+        return find_sccs_kosaraju(self.adjacency)
+
+    @cached_property
+    def topo_sort(self) -> tuple[list[str], bool, list[tuple[str, str]]]:
+        return topological_sort(self.adjacency)
+
+    @cached_property
+    def layers(self) -> dict[str, int]:
+        return assign_topological_layers(self.adjacency)
+
+    @cached_property
+    def metrics(self) -> dict[str, dict]:
+        return calculate_all_metrics(
+            self.adjacency,
+            ordering=self.topo_sort[0],
+            layers=self.layers,
+            betweenness_k=self.betweenness_k,
+            workers=self.workers,
+        )
+
+
 @register("dependency_graph")
 class DependencyGraph(Component):
     template_name = "graph/graph.html"
@@ -1213,7 +1412,7 @@ class DependencyGraph(Component):
         graph_data = self.get_graph_data()
         return {
             "height": height,
-            "graph_data": json.dumps(graph_data),
+            "graph_data": _dumps_json(graph_data),
             "has_positions": graph_data.get("has_positions", False),
         }
 
@@ -1331,15 +1530,16 @@ class DependencyGraph(Component):
         if source == target:
             return True
 
+        get_neighbors = adjacency.get
         visited = {source}
-        queue = list(adjacency.get(source, set()))
+        queue = deque(get_neighbors(source, ()))
         visited.update(queue)
 
         while queue:
-            current = queue.pop(0)
+            current = queue.popleft()
             if current == target:
                 return True
-            for neighbor in adjacency.get(current, set()):
+            for neighbor in get_neighbors(current, ()):
                 if neighbor not in visited:
                     visited.add(neighbor)
                     queue.append(neighbor)
@@ -1349,7 +1549,7 @@ class DependencyGraph(Component):
     @staticmethod
     def htmx_graph_data(request: HttpRequest):
         """Return graph data as JSON for HTMX refresh."""
-        return JsonResponse(DependencyGraph.get_graph_data())
+        return _json_response(DependencyGraph.get_graph_data())
 
     @staticmethod
     def htmx_graph(request: HttpRequest):
@@ -1554,7 +1754,7 @@ class DependencyGraph(Component):
             filter_terms = data.get('filter', [])
 
             if not filter_terms:
-                return JsonResponse(DependencyGraph.get_graph_data())
+                return _json_response(DependencyGraph.get_graph_data())
 
             # Find matching components (by ID or name)
             # Supports wildcards: "foo:*" matches "foo:bar", "*:foo:*" matches "x:foo:y"
@@ -1568,15 +1768,19 @@ class DependencyGraph(Component):
                         break
 
             if not matching_components:
-                return JsonResponse({"nodes": [], "edges": [], "has_positions": False})
+                return _json_response({"nodes": [], "edges": [], "has_positions": False})
 
-            # Find all connected components (dependencies and dependents)
+            # Find all connected components (dependencies and dependents).
+            # Edges are fetched once as plain tuples and reused below.
             connected_components = set(matching_components)
-            deps = list(Dependency.objects.select_related('source', 'target').all())
+            deps = [
+                (str(source_id), str(target_id), scope)
+                for source_id, target_id, scope in Dependency.objects.values_list(
+                    'source_id', 'target_id', 'scope'
+                )
+            ]
 
-            for dep in deps:
-                source_id = str(dep.source.id)
-                target_id = str(dep.target.id)
+            for source_id, target_id, _ in deps:
                 if source_id in matching_components:
                     connected_components.add(target_id)
                 if target_id in matching_components:
@@ -1624,39 +1828,37 @@ class DependencyGraph(Component):
 
             # Build edges (only between visible nodes)
             edges = []
+            visible_deps = [
+                dep for dep in deps
+                if dep[0] in connected_components and dep[1] in connected_components
+            ]
             adjacency: dict[str, set[str]] = {}
-            for dep in deps:
-                source_id = str(dep.source.id)
-                target_id = str(dep.target.id)
-                if source_id in connected_components and target_id in connected_components:
-                    adjacency.setdefault(source_id, set()).add(target_id)
+            for source_id, target_id, _ in visible_deps:
+                adjacency.setdefault(source_id, set()).add(target_id)
 
             transitive_edges = DependencyGraph._find_transitive_edges(adjacency)
             cycle_edges = get_cycle_edges(adjacency)
 
-            for dep in deps:
-                source_id = str(dep.source.id)
-                target_id = str(dep.target.id)
-                if source_id in connected_components and target_id in connected_components:
-                    edge_key = (source_id, target_id)
-                    edges.append({
-                        "data": {
-                            "id": f"{source_id}->{target_id}",
-                            "source": source_id,
-                            "target": target_id,
-                            "scope": dep.scope,
-                            "transitive": edge_key in transitive_edges,
-                            "inCycle": edge_key in cycle_edges,
-                        }
-                    })
-
-            return JsonResponse({
+            for source_id, target_id, scope in visible_deps:
+                edge_key = (source_id, target_id)
+                edges.append({
+                    "data": {
+                        "id": f"{source_id}->{target_id}",
+                        "source": source_id,
+                        "target": target_id,
+                        "scope": scope,
+                        "transitive": edge_key in transitive_edges,
+                        "inCycle": edge_key in cycle_edges,
+                    }
+                })
+
+            return _json_response({
                 "nodes": nodes,
                 "edges": edges,
                 "has_positions": any("position" in n for n in nodes),
             })
         except Exception as e:
-            return JsonResponse({"error": str(e)}, status=500)
+            return _json_response({"error": str(e)}, status=500)
 
     @classmethod
     def get_urls(cls):
@@ -4,11 +4,54 @@ Django component for displaying and managing refactoring proposals.
 
 import json
 from django_components import Component, register
+from django.core.cache import cache
+from django.db.models import Count
 from django.http import HttpRequest, HttpResponse
+from django.template.loader import render_to_string
 from django.urls import path
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from dependencies.models import RefactoringProposal, AnalysisRun
 
+DETAIL_TEMPLATE = "refactoring/refactoring_detail.html"
+
+# Columns needed to render a row of the proposal list
+LIST_FIELDS = (
+    'proposal_id', 'proposal_type', 'status', 'impact', 'risk',
+    'summary', 'scope', 'created_at',
+)
+
+# Valid values for a status update
+STATUS_VALUES = frozenset(value for value, _ in RefactoringProposal.STATUS_CHOICES)
+
+# Number of affected services listed before collapsing into "+N more"
+DETAIL_SCOPE_LIMIT = 10
+
+# Seconds to keep a rendered proposal detail in the cache
+DETAIL_CACHE_TIMEOUT = 3600
+
+# Latest analysis run shown in the backlog header
+LATEST_RUN_CACHE_KEY = "refactoring:latest_run"
+LATEST_RUN_CACHE_TIMEOUT = 30
+LATEST_RUN_FIELDS = (
+    'started_at', 'status', 'total_projects', 'total_sccs', 'proposals_generated',
+)
+
+
+def get_latest_run() -> AnalysisRun | None:
+    """
+    Return the most recent analysis run for the backlog header.
+
+    Uses the started_at index and caches the row briefly, since every
+    backlog render and filter click shows the same run.
+    """
+    latest_run = cache.get(LATEST_RUN_CACHE_KEY)
+    if latest_run is None:
+        latest_run = AnalysisRun.objects.order_by('-started_at').only(*LATEST_RUN_FIELDS).first()
+        # Cache a miss as False so an empty table is not re-queried either
+        cache.set(LATEST_RUN_CACHE_KEY, latest_run or False, LATEST_RUN_CACHE_TIMEOUT)
+    return latest_run or None
+
 
 @register("refactoring_backlog")
 class RefactoringBacklog(Component):
@@ -21,7 +64,8 @@ class RefactoringBacklog(Component):
         risk: str = None,
         status: str = None,
     ):
-        proposals = RefactoringProposal.objects.all()
+        # Only load the columns the list template renders
+        proposals = RefactoringProposal.objects.only(*LIST_FIELDS)
 
         # Apply filters
         if proposal_type:
@@ -33,18 +77,23 @@ class RefactoringBacklog(Component):
         if status:
             proposals = proposals.filter(status=status)
 
-        # Get proposal types with counts
-        proposal_types_with_counts = []
-        for ptype, label in RefactoringProposal.PROPOSAL_TYPES:
-            count = RefactoringProposal.objects.filter(proposal_type=ptype).count()
-            proposal_types_with_counts.append((ptype, label, count))
+        # Get proposal types with counts (single GROUP BY query)
+        type_counts = dict(
+            RefactoringProposal.objects.order_by()
+            .values_list('proposal_type')
+            .annotate(count=Count('id'))
+        )
+        proposal_types_with_counts = [
+            (ptype, label, type_counts.get(ptype, 0))
+            for ptype, label in RefactoringProposal.PROPOSAL_TYPES
+        ]
 
         # Get latest analysis run
-        latest_run = AnalysisRun.objects.first()
+        latest_run = get_latest_run()
 
         return {
-            "proposals": proposals[:50],  # Limit to 50
-            "total_count": RefactoringProposal.objects.count(),
+            "proposals": list(proposals.order_by('-created_at')[:50]),  # Limit to 50
+            "total_count": sum(type_counts.values()),
             "latest_run": latest_run,
             "proposal_types": proposal_types_with_counts,
             "impact_choices": RefactoringProposal.IMPACT_CHOICES,
@@ -78,10 +127,22 @@ class RefactoringBacklog(Component):
 
     @staticmethod
     def htmx_detail(request: HttpRequest, proposal_id: str):
-        """Return detailed view of a proposal."""
+        """Return detailed view of a proposal.
+
+        The rendered HTML is cached per proposal and last update time, so
+        any save of the proposal yields a fresh cache key.
+        """
         try:
-            proposal = RefactoringProposal.objects.get(proposal_id=proposal_id)
-            return HttpResponse(RefactoringBacklog._render_detail(proposal))
+            updated_at = RefactoringProposal.objects.values_list(
+                'updated_at', flat=True
+            ).get(proposal_id=proposal_id)
+            cache_key = f"refactoring:detail:{proposal_id}:{updated_at.timestamp()}"
+            html = cache.get(cache_key)
+            if html is None:
+                proposal = RefactoringProposal.objects.get(proposal_id=proposal_id)
+                html = RefactoringBacklog._render_detail(proposal)
+                cache.set(cache_key, html, DETAIL_CACHE_TIMEOUT)
+            return HttpResponse(html)
         except RefactoringProposal.DoesNotExist:
             return HttpResponse(
                 '<div class="alert alert-danger">Proposal not found</div>',
@@ -99,15 +160,24 @@ class RefactoringBacklog(Component):
             data = json.loads(request.body)
             new_status = data.get('status')
 
-            if new_status not in dict(RefactoringProposal.STATUS_CHOICES):
+            if new_status not in STATUS_VALUES:
                 return HttpResponse(
                     '<div class="alert alert-danger">Invalid status</div>',
                     status=400,
                 )
 
-            proposal = RefactoringProposal.objects.get(proposal_id=proposal_id)
-            proposal.status = new_status
-            proposal.save()
+            # Single UPDATE; update() skips auto_now, so bump updated_at
+            # explicitly to invalidate the cached detail view.
+            updated = RefactoringProposal.objects.filter(proposal_id=proposal_id).update(
+                status=new_status,
+                updated_at=timezone.now(),
+            )
+            if not updated:
+                raise RefactoringProposal.DoesNotExist
+
+            # The badge depends only on the new status; render it from an
+            # unsaved instance instead of re-reading the row.
+            proposal = RefactoringProposal(status=new_status)
 
             return HttpResponse(
                 f'<span class="badge bg-{proposal.status_badge_class}">'
@@ -127,90 +197,11 @@ class RefactoringBacklog(Component):
     @staticmethod
     def _render_detail(proposal: RefactoringProposal) -> str:
         """Render detailed proposal view."""
-        steps_html = ""
-        for i, step in enumerate(proposal.steps, 1):
-            steps_html += f'<li class="list-group-item">{i}. {step}</li>'
-
-        scope_html = ""
-        for service in proposal.scope[:10]:
-            scope_html += f'<span class="badge bg-secondary me-1">{service}</span>'
-        if len(proposal.scope) > 10:
-            scope_html += f'<span class="badge bg-light text-dark">+{len(proposal.scope) - 10} more</span>'
-
-        return f'''
-        <div class="card">
-            <div class="card-header d-flex justify-content-between align-items-center">
-                <h5 class="mb-0">{proposal.proposal_id}: {proposal.get_proposal_type_display()}</h5>
-                <button type="button" class="btn-close" data-bs-dismiss="modal" aria-label="Close"
-                    onclick="document.getElementById('proposal-detail-modal').style.display='none'"></button>
-            </div>
-            <div class="card-body">
-                <p class="lead">{proposal.summary}</p>
-
-                <div class="row mb-3">
-                    <div class="col-md-4">
-                        <strong>Impact:</strong>
-                        <span class="badge bg-{proposal.impact_badge_class}">{proposal.get_impact_display()}</span>
-                    </div>
-                    <div class="col-md-4">
-                        <strong>Risk:</strong>
-                        <span class="badge bg-{proposal.risk_badge_class}">{proposal.get_risk_display()}</span>
-                    </div>
-                    <div class="col-md-4">
-                        <strong>Status:</strong>
-                        <span class="badge bg-{proposal.status_badge_class}">{proposal.get_status_display()}</span>
-                    </div>
-                </div>
-
-                <div class="mb-3">
-                    <strong>Affected Services:</strong>
-                    <div class="mt-1">{scope_html}</div>
-                </div>
-
-                {f'<div class="mb-3"><strong>Root Cause:</strong><p class="text-muted">{proposal.root_cause}</p></div>' if proposal.root_cause else ''}
-
-                <div class="mb-3">
-                    <strong>Refactoring Steps:</strong>
-                    <ol class="list-group list-group-numbered mt-2">{steps_html}</ol>
-                </div>
-
-                {f'<div class="mb-3"><strong>Expected Improvement:</strong><p class="text-muted">{proposal.expected_improvement}</p></div>' if proposal.expected_improvement else ''}
-
-                <div class="mb-3">
-                    <strong>Metrics Before:</strong>
-                    <ul class="list-unstyled text-muted">
-                        {f'<li>SCC Size: {proposal.scc_size_before}</li>' if proposal.scc_size_before else ''}
-                        {f'<li>Fan-in: {proposal.fan_in_before:.1f}</li>' if proposal.fan_in_before else ''}
-                        {f'<li>Fan-out: {proposal.fan_out_before:.1f}</li>' if proposal.fan_out_before else ''}
-                    </ul>
-                </div>
-
-                <div class="d-flex gap-2">
-                    <button class="btn btn-success btn-sm"
-                        hx-post="/htmx/refactoring/{proposal.proposal_id}/status/"
-                        hx-vals='{{"status": "approved"}}'
-                        hx-target="#status-{proposal.proposal_id}"
-                        hx-swap="innerHTML">
-                        Approve
-                    </button>
-                    <button class="btn btn-warning btn-sm"
-                        hx-post="/htmx/refactoring/{proposal.proposal_id}/status/"
-                        hx-vals='{{"status": "in_progress"}}'
-                        hx-target="#status-{proposal.proposal_id}"
-                        hx-swap="innerHTML">
-                        Start Work
-                    </button>
-                    <button class="btn btn-secondary btn-sm"
-                        hx-post="/htmx/refactoring/{proposal.proposal_id}/status/"
-                        hx-vals='{{"status": "rejected"}}'
-                        hx-target="#status-{proposal.proposal_id}"
-                        hx-swap="innerHTML">
-                        Reject
-                    </button>
-                </div>
-            </div>
-        </div>
-        '''
+        return render_to_string(DETAIL_TEMPLATE, {
+            "proposal": proposal,
+            "scope_shown": proposal.scope[:DETAIL_SCOPE_LIMIT],
+            "scope_hidden": max(len(proposal.scope) - DETAIL_SCOPE_LIMIT, 0),
+        })
 
     @classmethod
     def get_urls(cls):
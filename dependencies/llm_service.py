@@ -6,13 +6,18 @@ actionable refactoring proposals based on the prompt templates defined in
 doc/refactor-planning.md.
 """
 
+import hashlib
 import os
 import json
 import logging
 import re
-from dataclasses import dataclass
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from typing import Any
 
+from django.core.cache import caches
+
 logger = logging.getLogger(__name__)
 
 try:
@@ -22,121 +27,98 @@ except ImportError:
     HAS_ANTHROPIC = False
     logger.warning("anthropic package not installed. LLM analysis will be disabled.")
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
 
-@dataclass
-class AnalysisContext:
-    """Context data for LLM analysis."""
-    services: list[str]
-    edges: list[tuple[str, str]]
-    shared_concepts: list[str] = None
-    existing_groups: list[str] = None
-    internal_clusters: list[list[str]] = None
-    external_dependencies: list[str] = None
-    downstream_services: list[str] = None
-    dependency_types: list[str] = None
-    internal_vs_external_edges: dict = None
-    service_names: list[str] = None
-    metrics: dict = None
-
-
-@dataclass
-class RefactoringResult:
-    """Result from LLM analysis."""
-    root_cause: str = ""
-    shared_concepts: list[str] = None
-    steps: list[str] = None
-    expected_improvement: str = ""
-    summary: str = ""
-    candidates: list[dict] = None
-    stable_elements: list[str] = None
-    volatile_elements: list[str] = None
-    boundary_issues: list[str] = None
-    suggested_regroupings: list[dict] = None
-    raw_response: str = ""
+# Maximum number of Claude requests in flight at once
+MAX_CONCURRENT_REQUESTS = 8
 
+# Numbered markdown list prefix, e.g. "3. "
+NUMBERED_ITEM_RE = re.compile(r'^\d+\.\s*')
 
-class RefactoringAnalyzer:
-    """LLM-based architectural analysis service."""
+# Level 2/3 markdown header line; the title is captured
+SECTION_HEADER_RE = re.compile(r'^#{2,3} (.*)$', re.MULTILINE)
 
-    def __init__(self, api_key: str = None, model: str = "claude-sonnet-4-20250514"):
-        self.api_key = api_key or os.environ.get('ANTHROPIC_API_KEY', '')
-        self.model = model
-        self._client = None
 
-    @property
-    def client(self):
-        if self._client is None and HAS_ANTHROPIC and self.api_key:
-            self._client = anthropic.Anthropic(api_key=self.api_key)
-        return self._client
+# Anthropic clients shared by all analyzers, keyed by API key
+_clients: dict[str, Any] = {}
+_clients_lock = threading.Lock()
 
-    @property
-    def is_available(self) -> bool:
-        return HAS_ANTHROPIC and bool(self.api_key)
 
-    def _call_llm(self, prompt: str) -> str:
-        """Make API call to Claude."""
-        if not self.is_available:
-            logger.warning("LLM not available, returning empty response")
-            return ""
+def _get_client(api_key: str):
+    """
+    Return the shared Anthropic client for an API key.
 
-        try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            return response.content[0].text
-        except Exception as e:
-            logger.error(f"LLM API call failed: {e}")
-            return ""
+    Each client owns an HTTP connection pool; sharing it lets analyzers
+    created per command or per thread reuse open keep-alive connections
+    instead of repeating the TLS handshake.
+    """
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = _clients[api_key] = anthropic.Anthropic(api_key=api_key)
+        return client
 
-    def _parse_markdown_sections(self, text: str) -> dict[str, str]:
-        """Parse markdown response into sections."""
-        sections = {}
-        current_section = "intro"
-        current_content = []
 
-        for line in text.split('\n'):
-            if line.startswith('## ') or line.startswith('### '):
-                if current_content:
-                    sections[current_section] = '\n'.join(current_content).strip()
-                current_section = line.lstrip('#').strip().lower().replace(' ', '_')
-                current_content = []
-            else:
-                current_content.append(line)
+def _sorted(values) -> list:
+    """Sort prompt values so equal inputs give identical prompts."""
+    return sorted(values, key=str)
 
-        if current_content:
-            sections[current_section] = '\n'.join(current_content).strip()
 
-        return sections
+def _to_json(value) -> str:
+    """Serialize a prompt value deterministically, using orjson when available."""
+    if HAS_ORJSON:
+        return orjson.dumps(value, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS).decode('utf-8')
+    return json.dumps(value, indent=2, sort_keys=True)
 
-    def _parse_list_items(self, text: str) -> list[str]:
-        """Extract list items from markdown."""
-        items = []
-        for line in text.split('\n'):
-            line = line.strip()
-            if line.startswith('- ') or line.startswith('* '):
-                items.append(line[2:].strip())
-            elif re.match(r'^\d+\.', line):
-                items.append(re.sub(r'^\d+\.\s*', '', line).strip())
-        return items
 
-    def analyze_scc(self, context: AnalysisContext) -> RefactoringResult:
-        """
-        Generate cycle-breaking proposal for a strongly connected component.
-        Uses prompt template 3.1 from refactor-planning.md.
-        """
-        prompt = f"""You are an expert software architect.
+@dataclass(slots=True)
+class AnalysisContext:
+    """Context data for LLM analysis."""
+    services: list[str]
+    edges: list[tuple[str, str]]
+    shared_concepts: list[str] = field(default_factory=list)
+    existing_groups: list[str] = field(default_factory=list)
+    internal_clusters: list[list[str]] = field(default_factory=list)
+    external_dependencies: list[str] = field(default_factory=list)
+    downstream_services: list[str] = field(default_factory=list)
+    dependency_types: list[str] = field(default_factory=list)
+    internal_vs_external_edges: dict = field(default_factory=dict)
+    service_names: list[str] = field(default_factory=list)
+    metrics: dict = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class RefactoringResult:
+    """Result from LLM analysis."""
+    root_cause: str = ""
+    shared_concepts: list[str] = field(default_factory=list)
+    steps: list[str] = field(default_factory=list)
+    expected_improvement: str = ""
+    summary: str = ""
+    candidates: list[dict] = field(default_factory=list)
+    stable_elements: list[str] = field(default_factory=list)
+    volatile_elements: list[str] = field(default_factory=list)
+    boundary_issues: list[str] = field(default_factory=list)
+    suggested_regroupings: list[dict] = field(default_factory=list)
+    raw_response: str = ""
+
+
+# Prompt template 3.1 from refactor-planning.md
+SCC_PROMPT = """You are an expert software architect.
 
 Context:
 - The following services form a cyclic dependency group:
-  {json.dumps(context.services, indent=2)}
+  {services}
 - Dependencies:
-  {json.dumps([f"{s} -> {t}" for s, t in context.edges], indent=2)}
+  {edges}
 - Shared types / libraries:
-  {json.dumps(context.shared_concepts or [], indent=2)}
+  {shared_concepts}
 - Known groupings:
-  {json.dumps(context.existing_groups or [], indent=2)}
+  {existing_groups}
 
 Goal:
 Propose a stepwise refactoring plan to break this cycle while preserving system behavior.
@@ -163,32 +145,17 @@ Output format (use these exact section headers):
 [One-sentence summary of the proposal]
 """
 
-        response = self._call_llm(prompt)
-        sections = self._parse_markdown_sections(response)
 
-        return RefactoringResult(
-            root_cause=sections.get('root_cause_analysis', ''),
-            shared_concepts=self._parse_list_items(sections.get('identified_shared_concepts', '')),
-            steps=self._parse_list_items(sections.get('step-by-step_refactoring_plan', '')),
-            expected_improvement=sections.get('expected_architectural_improvement', ''),
-            summary=sections.get('summary', ''),
-            raw_response=response,
-        )
-
-    def analyze_extraction(self, service_name: str, context: AnalysisContext) -> RefactoringResult:
-        """
-        Generate service extraction proposal.
-        Uses prompt template 3.2 from refactor-planning.md.
-        """
-        prompt = f"""You are analyzing a large microservice for potential extraction.
+# Prompt template 3.2 from refactor-planning.md
+EXTRACTION_PROMPT = """You are analyzing a large microservice for potential extraction.
 
 Context:
 - Service: {service_name}
 - Internal dependency clusters:
-  {json.dumps(context.internal_clusters or [], indent=2)}
+  {internal_clusters}
 - External dependencies:
-  {json.dumps(context.external_dependencies or [], indent=2)}
-- Metrics: Fan-in={context.metrics.get('fan_in', 0)}, Fan-out={context.metrics.get('fan_out', 0)}
+  {external_dependencies}
+- Metrics: Fan-in={fan_in}, Fan-out={fan_out}
 
 Goal:
 Identify candidate sub-domains that could be extracted into independent services.
@@ -214,35 +181,17 @@ Output format (use these exact section headers):
 [One-sentence summary]
 """
 
-        response = self._call_llm(prompt)
-        sections = self._parse_markdown_sections(response)
 
-        candidates = []
-        for item in self._parse_list_items(sections.get('candidate_extractions', '')):
-            candidates.append({'name': item, 'rationale': ''})
-
-        return RefactoringResult(
-            candidates=candidates,
-            steps=self._parse_list_items(sections.get('staged_extraction_plan', '')),
-            expected_improvement=sections.get('risk_assessment', ''),
-            summary=sections.get('summary', ''),
-            raw_response=response,
-        )
-
-    def analyze_api_stability(self, service_name: str, context: AnalysisContext) -> RefactoringResult:
-        """
-        Generate API stabilization proposal.
-        Uses prompt template 3.3 from refactor-planning.md.
-        """
-        prompt = f"""You are evaluating API stability for a central service.
+# Prompt template 3.3 from refactor-planning.md
+API_STABILITY_PROMPT = """You are evaluating API stability for a central service.
 
 Context:
 - Service: {service_name}
 - Consumers:
-  {json.dumps(context.downstream_services or [], indent=2)}
+  {consumers}
 - Dependency types:
-  {json.dumps(context.dependency_types or ['API'], indent=2)}
-- Metrics: Fan-in={context.metrics.get('fan_in', 0)}, Fan-out={context.metrics.get('fan_out', 0)}
+  {dependency_types}
+- Metrics: Fan-in={fan_in}, Fan-out={fan_out}
 
 Goal:
 Propose a plan to stabilize APIs and reduce downstream coupling.
@@ -268,32 +217,17 @@ Output format (use these exact section headers):
 [One-sentence summary]
 """
 
-        response = self._call_llm(prompt)
-        sections = self._parse_markdown_sections(response)
-
-        return RefactoringResult(
-            stable_elements=self._parse_list_items(sections.get('stable_api_elements', '')),
-            volatile_elements=self._parse_list_items(sections.get('volatile_api_elements', '')),
-            steps=self._parse_list_items(sections.get('migration_strategy', '')),
-            expected_improvement=sections.get('proposed_contract_boundary', ''),
-            summary=sections.get('summary', ''),
-            raw_response=response,
-        )
 
-    def analyze_boundaries(self, context: AnalysisContext) -> RefactoringResult:
-        """
-        Generate boundary redefinition proposal.
-        Uses prompt template 3.4 from refactor-planning.md.
-        """
-        prompt = f"""You are analyzing service groupings for boundary clarity.
+# Prompt template 3.4 from refactor-planning.md
+BOUNDARY_PROMPT = """You are analyzing service groupings for boundary clarity.
 
 Context:
 - Service cluster:
-  {json.dumps(context.services, indent=2)}
+  {services}
 - Dependency density:
-  {json.dumps(context.internal_vs_external_edges or {}, indent=2)}
+  {edge_density}
 - Naming patterns:
-  {json.dumps(context.service_names or context.services, indent=2)}
+  {naming_patterns}
 
 Goal:
 Recommend clearer service or domain boundaries.
@@ -316,6 +250,210 @@ Output format (use these exact section headers):
 [One-sentence summary]
 """
 
+
+class RefactoringAnalyzer:
+    """LLM-based architectural analysis service."""
+
+    def __init__(
+        self,
+        api_key: str = None,
+        model: str = "claude-sonnet-4-20250514",
+        use_cache: bool = True,
+    ):
+        self.api_key = api_key or os.environ.get('ANTHROPIC_API_KEY', '')
+        self.model = model
+        self.use_cache = use_cache
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None and HAS_ANTHROPIC and self.api_key:
+            self._client = _get_client(self.api_key)
+        return self._client
+
+    @property
+    def is_available(self) -> bool:
+        return HAS_ANTHROPIC and bool(self.api_key)
+
+    def _cache_key(self, prompt: str) -> str:
+        """Cache key for a prompt sent to the configured model."""
+        digest = hashlib.blake2b(prompt.encode('utf-8'), digest_size=16).hexdigest()
+        return f"llm:{self.model}:{digest}"
+
+    def _call_llm(self, prompt: str) -> str:
+        """
+        Make API call to Claude.
+
+        The response is streamed and its text chunks joined, so long
+        responses do not sit on one blocking request until completion.
+        Responses are cached by prompt hash in the "llm" cache; identical
+        prompts are answered from the cache without calling the API.
+        """
+        if not self.is_available:
+            logger.warning("LLM not available, returning empty response")
+            return ""
+
+        cache_key = self._cache_key(prompt)
+        if self.use_cache:
+            cached = caches['llm'].get(cache_key)
+            if cached is not None:
+                logger.debug(f"LLM cache hit: {cache_key}")
+                return cached
+
+        try:
+            with self.client.messages.stream(
+                model=self.model,
+                max_tokens=4096,
+                messages=[{"role": "user", "content": prompt}]
+            ) as stream:
+                text = ''.join(stream.text_stream)
+        except Exception as e:
+            logger.error(f"LLM API call failed: {e}")
+            return ""
+
+        if self.use_cache and text:
+            caches['llm'].set(cache_key, text)
+        return text
+
+    def analyze_batch(self, analyze, calls: list[tuple]) -> list[RefactoringResult]:
+        """
+        Run one of the analyze_* methods for many inputs concurrently.
+
+        LLM calls are network-bound, so running them on threads overlaps
+        their latency. At most MAX_CONCURRENT_REQUESTS calls are in flight.
+
+        Args:
+            analyze: Bound analyze_* method, e.g. self.analyze_scc
+            calls: Positional argument tuples, one per call
+
+        Returns:
+            Results in the same order as calls.
+        """
+        if len(calls) <= 1:
+            return [analyze(*args) for args in calls]
+
+        workers = min(MAX_CONCURRENT_REQUESTS, len(calls))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda args: analyze(*args), calls))
+
+    def _parse_markdown_sections(self, text: str) -> dict[str, str]:
+        """
+        Parse markdown response into sections.
+
+        Splits once on "## " / "### " header lines; the result alternates
+        header titles and section bodies after the leading intro text.
+        """
+        parts = SECTION_HEADER_RE.split(text)
+
+        sections = {}
+        if parts[0]:
+            sections["intro"] = parts[0].strip()
+        for title, body in zip(parts[1::2], parts[2::2]):
+            sections[title.strip().lower().replace(' ', '_')] = body.strip()
+
+        return sections
+
+    def _parse_list_items(self, text: str) -> list[str]:
+        """Extract list items from markdown."""
+        items = []
+        for line in text.split('\n'):
+            line = line.strip()
+            if line.startswith('- ') or line.startswith('* '):
+                items.append(line[2:].strip())
+            else:
+                match = NUMBERED_ITEM_RE.match(line)
+                if match:
+                    items.append(line[match.end():].strip())
+        return items
+
+    def analyze_scc(self, context: AnalysisContext) -> RefactoringResult:
+        """
+        Generate cycle-breaking proposal for a strongly connected component.
+        Uses prompt template 3.1 from refactor-planning.md.
+        """
+        prompt = SCC_PROMPT.format(
+            services=_to_json(_sorted(context.services)),
+            edges=_to_json(sorted(f"{s} -> {t}" for s, t in context.edges)),
+            shared_concepts=_to_json(_sorted(context.shared_concepts)),
+            existing_groups=_to_json(_sorted(context.existing_groups)),
+        )
+
+        response = self._call_llm(prompt)
+        sections = self._parse_markdown_sections(response)
+
+        return RefactoringResult(
+            root_cause=sections.get('root_cause_analysis', ''),
+            shared_concepts=self._parse_list_items(sections.get('identified_shared_concepts', '')),
+            steps=self._parse_list_items(sections.get('step-by-step_refactoring_plan', '')),
+            expected_improvement=sections.get('expected_architectural_improvement', ''),
+            summary=sections.get('summary', ''),
+            raw_response=response,
+        )
+
+    def analyze_extraction(self, service_name: str, context: AnalysisContext) -> RefactoringResult:
+        """
+        Generate service extraction proposal.
+        Uses prompt template 3.2 from refactor-planning.md.
+        """
+        prompt = EXTRACTION_PROMPT.format(
+            service_name=service_name,
+            internal_clusters=_to_json(sorted(_sorted(cluster) for cluster in context.internal_clusters)),
+            external_dependencies=_to_json(_sorted(context.external_dependencies)),
+            fan_in=context.metrics.get('fan_in', 0),
+            fan_out=context.metrics.get('fan_out', 0),
+        )
+
+        response = self._call_llm(prompt)
+        sections = self._parse_markdown_sections(response)
+
+        candidates = []
+        for item in self._parse_list_items(sections.get('candidate_extractions', '')):
+            candidates.append({'name': item, 'rationale': ''})
+
+        return RefactoringResult(
+            candidates=candidates,
+            steps=self._parse_list_items(sections.get('staged_extraction_plan', '')),
+            expected_improvement=sections.get('risk_assessment', ''),
+            summary=sections.get('summary', ''),
+            raw_response=response,
+        )
+
+    def analyze_api_stability(self, service_name: str, context: AnalysisContext) -> RefactoringResult:
+        """
+        Generate API stabilization proposal.
+        Uses prompt template 3.3 from refactor-planning.md.
+        """
+        prompt = API_STABILITY_PROMPT.format(
+            service_name=service_name,
+            consumers=_to_json(_sorted(context.downstream_services)),
+            dependency_types=_to_json(_sorted(context.dependency_types or ['API'])),
+            fan_in=context.metrics.get('fan_in', 0),
+            fan_out=context.metrics.get('fan_out', 0),
+        )
+
+        response = self._call_llm(prompt)
+        sections = self._parse_markdown_sections(response)
+
+        return RefactoringResult(
+            stable_elements=self._parse_list_items(sections.get('stable_api_elements', '')),
+            volatile_elements=self._parse_list_items(sections.get('volatile_api_elements', '')),
+            steps=self._parse_list_items(sections.get('migration_strategy', '')),
+            expected_improvement=sections.get('proposed_contract_boundary', ''),
+            summary=sections.get('summary', ''),
+            raw_response=response,
+        )
+
+    def analyze_boundaries(self, context: AnalysisContext) -> RefactoringResult:
+        """
+        Generate boundary redefinition proposal.
+        Uses prompt template 3.4 from refactor-planning.md.
+        """
+        prompt = BOUNDARY_PROMPT.format(
+            services=_to_json(_sorted(context.services)),
+            edge_density=_to_json(context.internal_vs_external_edges),
+            naming_patterns=_to_json(_sorted(context.service_names or context.services)),
+        )
+
         response = self._call_llm(prompt)
         sections = self._parse_markdown_sections(response)
 
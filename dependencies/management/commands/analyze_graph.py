@@ -22,21 +22,27 @@ Usage:
 
     # Include LLM interpretations (if available)
     python manage.py analyze_graph --all --with-llm
+
+    # Approximate betweenness on large graphs (500 sampled sources)
+    python manage.py analyze_graph --metrics --betweenness-k 500
+
+    # Limit betweenness to 4 worker processes (0 or 1 = no subprocesses)
+    python manage.py analyze_graph --metrics --workers 4
 """
-import json
+import heapq
+import os
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.utils import timezone
+from dependencies.management.output import write_json
 from dependencies.models import (
-    Component, Dependency, AnalysisRun, LayerDefinition,
+    AnalysisRun, LayerDefinition,
     LayerAssignment, LayerViolation, NodeMetrics
 )
 from dependencies.components.graph.graph import (
-    find_sccs_kosaraju,
+    GraphContext,
+    build_adjacency,
     louvain_communities,
-    calculate_all_metrics,
-    topological_sort,
-    assign_topological_layers,
     detect_layer_violations,
 )
 
@@ -53,6 +59,14 @@ class Command(BaseCommand):
         parser.add_argument('--output', choices=['text', 'json', 'yaml'], default='text', help='Output format')
         parser.add_argument('--save', action='store_true', help='Save results to database')
         parser.add_argument('--with-llm', action='store_true', help='Include LLM interpretations')
+        parser.add_argument(
+            '--betweenness-k', type=int, default=None,
+            help='Approximate betweenness from K sampled source nodes (default: exact)',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Worker processes for betweenness centrality (default: CPU count, 0 or 1 = no subprocesses)',
+        )
 
     def handle(self, *args, **options):
         run_all = options['all']
@@ -63,6 +77,13 @@ class Command(BaseCommand):
         output_format = options['output']
         save = options['save']
         with_llm = options['with_llm']
+        betweenness_k = options['betweenness_k']
+        workers = options['workers']
+        if workers is not None and workers < 0:
+            self.stderr.write(self.style.ERROR('--workers must not be negative'))
+            return
+        # The graph functions default to serial; commands use every CPU
+        workers = os.cpu_count() if workers is None else max(workers, 1)
 
         if not any([run_scc, run_metrics, run_layers, run_clusters]):
             self.stderr.write(self.style.WARNING(
@@ -71,7 +92,7 @@ class Command(BaseCommand):
             return
 
         # Build adjacency
-        adjacency = self._build_adjacency()
+        adjacency = build_adjacency()
         if not adjacency:
             self.stderr.write(self.style.WARNING("No dependencies found"))
             return
@@ -81,18 +102,21 @@ class Command(BaseCommand):
             'total_dependencies': sum(len(targets) for targets in adjacency.values()),
         }
 
-        # Run analyses
+        # Run analyses; passes share topological order and layers via ctx
+        ctx = GraphContext(adjacency, betweenness_k=betweenness_k, workers=workers)
+
         if run_scc:
-            results['scc'] = self._analyze_scc(adjacency)
+            results['scc'] = self._analyze_scc(ctx)
 
         if run_metrics:
-            results['metrics'] = self._analyze_metrics(adjacency)
+            # Per-node metrics are only needed to save them
+            results['metrics'] = self._analyze_metrics(ctx, include_all=save)
 
         if run_layers:
-            results['layers'] = self._analyze_layers(adjacency)
+            results['layers'] = self._analyze_layers(ctx)
 
         if run_clusters:
-            results['clusters'] = self._analyze_clusters(adjacency)
+            results['clusters'] = self._analyze_clusters(ctx)
 
         # Add LLM interpretations if requested
         if with_llm:
@@ -110,68 +134,61 @@ class Command(BaseCommand):
         else:
             self._output_text(results)
 
-    def _build_adjacency(self) -> dict[str, set[str]]:
-        """Build adjacency list from database."""
-        adjacency: dict[str, set[str]] = {}
-        for dep in Dependency.objects.select_related('source', 'target').all():
-            source_key = str(dep.source.id)
-            target_key = str(dep.target.id)
-            adjacency.setdefault(source_key, set()).add(target_key)
-        for component in Component.objects.all():
-            adjacency.setdefault(str(component.id), set())
-        return adjacency
-
-    def _analyze_scc(self, adjacency) -> dict:
+    def _analyze_scc(self, ctx: GraphContext) -> dict:
         """Analyze strongly connected components."""
-        sccs = find_sccs_kosaraju(adjacency)
+        sccs = ctx.sccs
         cyclic_sccs = [scc for scc in sccs if len(scc) >= 2]
 
-        ordering, is_dag, back_edges = topological_sort(adjacency)
+        ordering, is_dag, back_edges = ctx.topo_sort
+
+        # Only the five largest cycles are reported (and their members sorted);
+        # the first of them also gives the largest cycle size
+        largest = heapq.nlargest(5, cyclic_sccs, key=len)
 
         return {
             'is_dag': is_dag,
             'total_sccs': len(sccs),
             'cyclic_sccs': len(cyclic_sccs),
-            'largest_cycle_size': max((len(scc) for scc in cyclic_sccs), default=0),
+            'largest_cycle_size': len(largest[0]) if largest else 0,
             'back_edges': len(back_edges),
-            'cycles': [
-                {'members': sorted(scc), 'size': len(scc)}
-                for scc in sorted(cyclic_sccs, key=len, reverse=True)[:5]
-            ],
+            'cycles': [{'members': sorted(scc), 'size': len(scc)} for scc in largest],
         }
 
-    def _analyze_metrics(self, adjacency) -> dict:
-        """Calculate all metrics."""
-        metrics = calculate_all_metrics(adjacency)
+    def _analyze_metrics(self, ctx: GraphContext, include_all: bool = False) -> dict:
+        """Calculate all metrics; include_all adds the per-node metrics as all_metrics."""
+        metrics = ctx.metrics
 
-        # Find hotspots
-        by_instability = sorted(metrics.items(), key=lambda x: x[1].get('instability', 0), reverse=True)
-        by_betweenness = sorted(metrics.items(), key=lambda x: x[1].get('betweenness_centrality', 0), reverse=True)
-        by_coupling = sorted(metrics.items(), key=lambda x: x[1].get('coupling_score', 0), reverse=True)
+        # Find hotspots (top 5 only; no need to sort every node)
+        by_instability = heapq.nlargest(5, metrics.items(), key=lambda x: x[1].get('instability', 0))
+        by_betweenness = heapq.nlargest(5, metrics.items(), key=lambda x: x[1].get('betweenness_centrality', 0))
+        by_coupling = heapq.nlargest(5, metrics.items(), key=lambda x: x[1].get('coupling_score', 0))
 
-        return {
+        summary = {
             'total_nodes': len(metrics),
             'high_instability': [
                 {'node': n, 'instability': m['instability']}
-                for n, m in by_instability[:5] if m.get('instability', 0) > 0.7
+                for n, m in by_instability if m.get('instability', 0) > 0.7
             ],
             'high_betweenness': [
                 {'node': n, 'betweenness': m['betweenness_centrality']}
-                for n, m in by_betweenness[:5]
+                for n, m in by_betweenness
             ],
             'high_coupling': [
                 {'node': n, 'coupling': m['coupling_score'], 'fan_in': m['fan_in'], 'fan_out': m['fan_out']}
-                for n, m in by_coupling[:5]
+                for n, m in by_coupling
             ],
-            'all_metrics': metrics,
         }
+        if include_all:
+            summary['all_metrics'] = metrics
+        return summary
 
-    def _analyze_layers(self, adjacency) -> dict:
+    def _analyze_layers(self, ctx: GraphContext) -> dict:
         """Analyze layer violations."""
-        # Get layer assignments from database
-        layer_assignments = {}
-        for la in LayerAssignment.objects.select_related('component', 'layer').all():
-            layer_assignments[str(la.component.id)] = la.layer.level
+        # Get layer assignments from database (only the two columns needed)
+        layer_assignments = {
+            str(component_id): level
+            for component_id, level in LayerAssignment.objects.values_list('component_id', 'layer__level')
+        }
 
         if not layer_assignments:
             return {
@@ -179,11 +196,11 @@ class Command(BaseCommand):
                 'message': 'No layer assignments. Use manage_layers to define layers.',
             }
 
-        violations = detect_layer_violations(adjacency, layer_assignments)
+        violations = detect_layer_violations(ctx.adjacency, layer_assignments)
         critical = [v for v in violations if v['severity'] == 'critical']
 
         # Compute topological layers
-        topo_layers = assign_topological_layers(adjacency)
+        topo_layers = ctx.layers
 
         return {
             'configured': True,
@@ -194,16 +211,20 @@ class Command(BaseCommand):
             'topological_depth': max(topo_layers.values()) if topo_layers else 0,
         }
 
-    def _analyze_clusters(self, adjacency) -> dict:
+    def _analyze_clusters(self, ctx: GraphContext) -> dict:
         """Detect communities using Louvain."""
-        communities = louvain_communities(adjacency)
+        communities = louvain_communities(ctx.adjacency)
+
+        # Size each community once; only the five largest need their members
+        sizes = [len(c) for c in communities]
+        largest = heapq.nlargest(5, range(len(communities)), key=sizes.__getitem__)
 
         return {
             'total_clusters': len(communities),
-            'cluster_sizes': sorted([len(c) for c in communities], reverse=True),
+            'cluster_sizes': sorted(sizes, reverse=True),
             'clusters': [
-                {'id': i, 'members': sorted(c), 'size': len(c)}
-                for i, c in enumerate(sorted(communities, key=len, reverse=True)[:5])
+                {'id': i, 'members': sorted(communities[index]), 'size': sizes[index]}
+                for i, index in enumerate(largest)
             ],
         }
 
@@ -224,134 +245,130 @@ class Command(BaseCommand):
     @transaction.atomic
     def _save_results(self, results):
         """Save analysis results to database."""
+        # The run stays 'running' until its metrics are written
         analysis_run = AnalysisRun.objects.create(
             total_projects=results['total_projects'],
             total_sccs=results.get('scc', {}).get('cyclic_sccs', 0),
             total_clusters=results.get('clusters', {}).get('total_clusters', 0),
-            status='completed',
-            completed_at=timezone.now(),
         )
 
-        # Save metrics
+        # Save metrics (one upsert per batch instead of one per component)
         if 'metrics' in results and 'all_metrics' in results['metrics']:
-            components = {str(c.id): c for c in Component.objects.all()}
-            for node_key, metrics in results['metrics']['all_metrics'].items():
-                component = components.get(node_key)
-                if component:
-                    NodeMetrics.objects.update_or_create(
-                        component=component,
-                        defaults={
-                            'analysis_run': analysis_run,
-                            'fan_in': metrics.get('fan_in', 0),
-                            'fan_out': metrics.get('fan_out', 0),
-                            'coupling_score': metrics.get('coupling_score', 0.0),
-                            'afferent_coupling': metrics.get('afferent', 0),
-                            'efferent_coupling': metrics.get('efferent', 0),
-                            'instability': metrics.get('instability', 0.0),
-                            'degree_centrality': metrics.get('degree_centrality', 0.0),
-                            'betweenness_centrality': metrics.get('betweenness_centrality', 0.0),
-                            'topological_order': metrics.get('topological_order'),
-                            'layer_depth': metrics.get('layer_depth'),
-                        }
-                    )
+            NodeMetrics.save_metrics(analysis_run, results['metrics']['all_metrics'])
+
+        AnalysisRun.objects.filter(pk=analysis_run.pk).update(
+            status='completed', completed_at=timezone.now()
+        )
 
         self.stdout.write(self.style.SUCCESS(f"Saved analysis run #{analysis_run.id}"))
 
     def _output_text(self, results):
         """Output results as text."""
-        self.stdout.write(self.style.SUCCESS("\n" + "=" * 60))
-        self.stdout.write(self.style.SUCCESS("Static Dependency Analysis Results"))
-        self.stdout.write("=" * 60)
+        # Collect the lines and write them at once instead of once per line
+        lines = [
+            self.style.SUCCESS("\n" + "=" * 60),
+            self.style.SUCCESS("Static Dependency Analysis Results"),
+            "=" * 60,
+        ]
 
-        self.stdout.write(f"\nTotal projects: {results['total_projects']}")
-        self.stdout.write(f"Total dependencies: {results['total_dependencies']}")
+        lines.append(f"\nTotal projects: {results['total_projects']}")
+        lines.append(f"Total dependencies: {results['total_dependencies']}")
 
         if 'scc' in results:
             scc = results['scc']
-            self.stdout.write(self.style.SUCCESS("\n--- Cycle Analysis ---"))
-            self.stdout.write(f"Is DAG: {scc['is_dag']}")
-            self.stdout.write(f"Cyclic components: {scc['cyclic_sccs']}")
+            lines.append(self.style.SUCCESS("\n--- Cycle Analysis ---"))
+            lines.append(f"Is DAG: {scc['is_dag']}")
+            lines.append(f"Cyclic components: {scc['cyclic_sccs']}")
             if scc['cyclic_sccs'] > 0:
-                self.stdout.write(f"Largest cycle size: {scc['largest_cycle_size']}")
-                self.stdout.write("Top cycles:")
+                lines.append(f"Largest cycle size: {scc['largest_cycle_size']}")
+                lines.append("Top cycles:")
                 for cycle in scc['cycles']:
-                    self.stdout.write(f"  - {cycle['size']} nodes: {', '.join(cycle['members'][:3])}...")
+                    lines.append(f"  - {cycle['size']} nodes: {', '.join(cycle['members'][:3])}...")
 
         if 'metrics' in results:
             metrics = results['metrics']
-            self.stdout.write(self.style.SUCCESS("\n--- Metrics Hotspots ---"))
+            lines.append(self.style.SUCCESS("\n--- Metrics Hotspots ---"))
             if metrics['high_instability']:
-                self.stdout.write("Highly unstable (I > 0.7):")
+                lines.append("Highly unstable (I > 0.7):")
                 for item in metrics['high_instability']:
-                    self.stdout.write(f"  - {item['node']}: {item['instability']:.2f}")
+                    lines.append(f"  - {item['node']}: {item['instability']:.2f}")
             if metrics['high_betweenness']:
-                self.stdout.write("High betweenness (bridges):")
+                lines.append("High betweenness (bridges):")
                 for item in metrics['high_betweenness']:
-                    self.stdout.write(f"  - {item['node']}: {item['betweenness']:.3f}")
+                    lines.append(f"  - {item['node']}: {item['betweenness']:.3f}")
 
         if 'layers' in results:
             layers = results['layers']
-            self.stdout.write(self.style.SUCCESS("\n--- Layer Analysis ---"))
+            lines.append(self.style.SUCCESS("\n--- Layer Analysis ---"))
             if layers.get('configured'):
-                self.stdout.write(f"Assigned projects: {layers['assigned_projects']}")
-                self.stdout.write(f"Total violations: {layers['total_violations']}")
-                self.stdout.write(f"Critical violations: {layers['critical_violations']}")
+                lines.append(f"Assigned projects: {layers['assigned_projects']}")
+                lines.append(f"Total violations: {layers['total_violations']}")
+                lines.append(f"Critical violations: {layers['critical_violations']}")
                 if layers['violations']:
-                    self.stdout.write("Top violations:")
+                    lines.append("Top violations:")
                     for v in layers['violations'][:5]:
-                        self.stdout.write(f"  - {v['source']} -> {v['target']} ({v['reason']})")
+                        lines.append(f"  - {v['source']} -> {v['target']} ({v['reason']})")
             else:
-                self.stdout.write(self.style.WARNING(layers['message']))
+                lines.append(self.style.WARNING(layers['message']))
 
         if 'clusters' in results:
             clusters = results['clusters']
-            self.stdout.write(self.style.SUCCESS("\n--- Community Detection ---"))
-            self.stdout.write(f"Total clusters: {clusters['total_clusters']}")
-            self.stdout.write(f"Cluster sizes: {clusters['cluster_sizes'][:10]}")
+            lines.append(self.style.SUCCESS("\n--- Community Detection ---"))
+            lines.append(f"Total clusters: {clusters['total_clusters']}")
+            lines.append(f"Cluster sizes: {clusters['cluster_sizes'][:10]}")
 
         if results.get('llm_available'):
-            self.stdout.write(self.style.SUCCESS("\nLLM interpretations available"))
+            lines.append(self.style.SUCCESS("\nLLM interpretations available"))
+
+        self.stdout.write('\n'.join(lines))
 
     def _output_json(self, results):
         """Output results as JSON."""
-        # Remove all_metrics for cleaner output
-        output = {k: v for k, v in results.items()}
-        if 'metrics' in output and 'all_metrics' in output['metrics']:
-            output['metrics'] = {k: v for k, v in output['metrics'].items() if k != 'all_metrics'}
+        # Remove all_metrics for cleaner output; only the metrics dict is copied
+        output = results
+        if 'all_metrics' in results.get('metrics', {}):
+            metrics = dict(results['metrics'])
+            del metrics['all_metrics']
+            output = {**results, 'metrics': metrics}
 
-        self.stdout.write(json.dumps(output, indent=2, default=str))
+        write_json(self.stdout, output)
 
     def _output_yaml(self, results):
         """Output results as YAML-like format."""
-        self.stdout.write(f"total_projects: {results['total_projects']}")
-        self.stdout.write(f"total_dependencies: {results['total_dependencies']}")
+        # Collect the lines and write them at once instead of once per line
+        lines = [
+            f"total_projects: {results['total_projects']}",
+            f"total_dependencies: {results['total_dependencies']}",
+        ]
 
         if 'scc' in results:
             scc = results['scc']
-            self.stdout.write("scc:")
-            self.stdout.write(f"  is_dag: {str(scc['is_dag']).lower()}")
-            self.stdout.write(f"  cyclic_sccs: {scc['cyclic_sccs']}")
-            self.stdout.write(f"  largest_cycle_size: {scc['largest_cycle_size']}")
+            lines.append("scc:")
+            lines.append(f"  is_dag: {str(scc['is_dag']).lower()}")
+            lines.append(f"  cyclic_sccs: {scc['cyclic_sccs']}")
+            lines.append(f"  largest_cycle_size: {scc['largest_cycle_size']}")
 
         if 'metrics' in results:
             metrics = results['metrics']
-            self.stdout.write("metrics:")
-            self.stdout.write(f"  total_nodes: {metrics['total_nodes']}")
+            lines.append("metrics:")
+            lines.append(f"  total_nodes: {metrics['total_nodes']}")
             if metrics['high_instability']:
-                self.stdout.write("  high_instability:")
+                lines.append("  high_instability:")
                 for item in metrics['high_instability']:
-                    self.stdout.write(f"    - node: {item['node']}")
-                    self.stdout.write(f"      instability: {item['instability']:.3f}")
+                    lines.append(f"    - node: {item['node']}")
+                    lines.append(f"      instability: {item['instability']:.3f}")
 
         if 'layers' in results:
             layers = results['layers']
-            self.stdout.write("layers:")
-            self.stdout.write(f"  configured: {str(layers.get('configured', False)).lower()}")
+            lines.append("layers:")
+            lines.append(f"  configured: {str(layers.get('configured', False)).lower()}")
             if layers.get('configured'):
-                self.stdout.write(f"  critical_violations: {layers['critical_violations']}")
+                lines.append(f"  critical_violations: {layers['critical_violations']}")
 
         if 'clusters' in results:
             clusters = results['clusters']
-            self.stdout.write("clusters:")
-            self.stdout.write(f"  total: {clusters['total_clusters']}")
-            self.stdout.write(f"  sizes: {clusters['cluster_sizes']}")
+            lines.append("clusters:")
+            lines.append(f"  total: {clusters['total_clusters']}")
+            lines.append(f"  sizes: {clusters['cluster_sizes']}")
+
+        self.stdout.write('\n'.join(lines))
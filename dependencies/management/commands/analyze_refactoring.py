@@ -16,6 +16,9 @@ Usage:
 
     # Use specific model
     python manage.py analyze_refactoring --model claude-sonnet-4-20250514
+
+    # Ignore cached LLM responses
+    python manage.py analyze_refactoring --no-cache
 """
 
 from django.core.management.base import BaseCommand
@@ -23,6 +26,10 @@ from dependencies.refactoring_pipeline import RefactoringPipeline
 from dependencies.llm_service import RefactoringAnalyzer
 
 
+# Proposals listed in the summary printed after a run
+PROPOSAL_SUMMARY_LIMIT = 50
+
+
 class Command(BaseCommand):
     help = 'Analyze dependency graph and generate refactoring proposals'
 
@@ -70,6 +77,11 @@ class Command(BaseCommand):
             type=str,
             help='Anthropic API key (default: ANTHROPIC_API_KEY env var)',
         )
+        parser.add_argument(
+            '--no-cache',
+            action='store_true',
+            help='Always call the LLM instead of reusing cached responses',
+        )
 
     def handle(self, *args, **options):
         dry_run = options.get('dry_run', False)
@@ -80,6 +92,7 @@ class Command(BaseCommand):
         coupling_threshold = options.get('coupling_threshold', 90)
         model = options.get('model', 'claude-sonnet-4-20250514')
         api_key = options.get('api_key')
+        use_cache = not options.get('no_cache', False)
 
         # Determine which analyses to run
         if scc_only or coupling_only or boundaries_only:
@@ -92,7 +105,7 @@ class Command(BaseCommand):
             analyze_boundaries = True
 
         # Create services
-        llm_service = RefactoringAnalyzer(api_key=api_key, model=model)
+        llm_service = RefactoringAnalyzer(api_key=api_key, model=model, use_cache=use_cache)
         pipeline = RefactoringPipeline(llm_service=llm_service, dry_run=dry_run)
 
         if not llm_service.is_available:
@@ -134,10 +147,18 @@ class Command(BaseCommand):
             if run.proposals_generated > 0:
                 self.stdout.write('\nProposal summary:')
                 from dependencies.models import RefactoringProposal
-                for proposal in RefactoringProposal.objects.filter(analysis_run=run):
+                type_labels = dict(RefactoringProposal.PROPOSAL_TYPES)
+                proposals = RefactoringProposal.objects.filter(analysis_run=run).values_list(
+                    'proposal_id', 'proposal_type', 'summary'
+                )[:PROPOSAL_SUMMARY_LIMIT]
+                for proposal_id, proposal_type, summary in proposals:
+                    self.stdout.write(
+                        f'  [{proposal_id}] {type_labels.get(proposal_type, proposal_type)}: '
+                        f'{summary[:60]}...'
+                    )
+                if run.proposals_generated > PROPOSAL_SUMMARY_LIMIT:
                     self.stdout.write(
-                        f'  [{proposal.proposal_id}] {proposal.get_proposal_type_display()}: '
-                        f'{proposal.summary[:60]}...'
+                        f'  ... and {run.proposals_generated - PROPOSAL_SUMMARY_LIMIT} more'
                     )
 
         except Exception as e:
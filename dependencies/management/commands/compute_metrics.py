@@ -19,12 +19,21 @@ Usage:
 
     # Output as JSON
     python manage.py compute_metrics --output json
+
+    # Approximate betweenness on large graphs (500 sampled sources)
+    python manage.py compute_metrics --sort-by betweenness --betweenness-k 500
+
+    # Limit betweenness to 4 worker processes (0 or 1 = no subprocesses)
+    python manage.py compute_metrics --workers 4
 """
-import json
+import heapq
+import os
 from django.core.management.base import BaseCommand
 from django.db import transaction
-from dependencies.models import Component, Dependency, NodeMetrics, AnalysisRun
-from dependencies.components.graph.graph import calculate_all_metrics
+from django.utils import timezone
+from dependencies.management.output import write_json
+from dependencies.models import NodeMetrics, AnalysisRun
+from dependencies.components.graph.graph import build_adjacency, calculate_all_metrics
 
 
 class Command(BaseCommand):
@@ -62,6 +71,18 @@ class Command(BaseCommand):
             action='store_true',
             help='Save metrics to database'
         )
+        parser.add_argument(
+            '--betweenness-k',
+            type=int,
+            default=None,
+            help='Approximate betweenness from K sampled source nodes (default: exact)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Worker processes for betweenness centrality (default: CPU count, 0 or 1 = no subprocesses)'
+        )
 
     def handle(self, *args, **options):
         project_key = options['project']
@@ -69,16 +90,25 @@ class Command(BaseCommand):
         top_n = options['top']
         output_format = options['output']
         save = options['save']
+        betweenness_k = options['betweenness_k']
+        workers = options['workers']
+        if workers is not None and workers < 0:
+            self.stderr.write(self.style.ERROR('--workers must not be negative'))
+            return
+        # The graph functions default to serial; commands use every CPU
+        workers = os.cpu_count() if workers is None else max(workers, 1)
 
         # Build adjacency list from database
-        adjacency = self._build_adjacency()
+        adjacency = build_adjacency()
 
         if not adjacency:
             self.stderr.write(self.style.WARNING("No dependencies found"))
             return
 
         # Calculate all metrics
-        metrics = calculate_all_metrics(adjacency)
+        metrics = calculate_all_metrics(
+            adjacency, betweenness_k=betweenness_k, workers=workers
+        )
 
         # Filter to specific project if requested
         if project_key:
@@ -87,16 +117,16 @@ class Command(BaseCommand):
                 return
             metrics = {project_key: metrics[project_key]}
 
-        # Sort by requested metric
+        # Sort by requested metric (only the top N when listing all projects)
         sort_key = self._get_sort_key(sort_by)
-        sorted_metrics = sorted(
-            metrics.items(),
-            key=lambda x: x[1].get(sort_key, 0),
-            reverse=True
-        )
-
-        if not project_key:
-            sorted_metrics = sorted_metrics[:top_n]
+        if project_key:
+            sorted_metrics = list(metrics.items())
+        else:
+            sorted_metrics = heapq.nlargest(
+                top_n,
+                metrics.items(),
+                key=lambda x: x[1].get(sort_key, 0)
+            )
 
         # Save if requested
         if save:
@@ -110,20 +140,6 @@ class Command(BaseCommand):
         else:
             self._output_text(sorted_metrics, sort_by, project_key)
 
-    def _build_adjacency(self) -> dict[str, set[str]]:
-        """Build adjacency list from database."""
-        adjacency: dict[str, set[str]] = {}
-
-        for dep in Dependency.objects.select_related('source', 'target').all():
-            source_key = str(dep.source.id)
-            target_key = str(dep.target.id)
-            adjacency.setdefault(source_key, set()).add(target_key)
-
-        for component in Component.objects.all():
-            adjacency.setdefault(str(component.id), set())
-
-        return adjacency
-
     def _get_sort_key(self, sort_by: str) -> str:
         """Map sort option to metric key."""
         return {
@@ -138,66 +154,47 @@ class Command(BaseCommand):
     @transaction.atomic
     def _save_metrics(self, metrics):
         """Save metrics to database."""
-        # Create analysis run
-        analysis_run = AnalysisRun.objects.create(
-            total_projects=len(metrics),
-            status='completed'
-        )
+        # Create analysis run; it stays 'running' until its metrics are written
+        analysis_run = AnalysisRun.objects.create(total_projects=len(metrics))
 
-        components = {str(c.id): c for c in Component.objects.all()}
-        count = 0
-
-        for node_key, node_metrics in metrics.items():
-            component = components.get(node_key)
-            if not component:
-                continue
-
-            NodeMetrics.objects.update_or_create(
-                component=component,
-                defaults={
-                    'analysis_run': analysis_run,
-                    'fan_in': node_metrics.get('fan_in', 0),
-                    'fan_out': node_metrics.get('fan_out', 0),
-                    'coupling_score': node_metrics.get('coupling_score', 0.0),
-                    'afferent_coupling': node_metrics.get('afferent', 0),
-                    'efferent_coupling': node_metrics.get('efferent', 0),
-                    'instability': node_metrics.get('instability', 0.0),
-                    'degree_centrality': node_metrics.get('degree_centrality', 0.0),
-                    'betweenness_centrality': node_metrics.get('betweenness_centrality', 0.0),
-                    'topological_order': node_metrics.get('topological_order'),
-                    'layer_depth': node_metrics.get('layer_depth'),
-                }
-            )
-            count += 1
+        # One upsert per batch instead of one per component
+        saved = NodeMetrics.save_metrics(analysis_run, metrics)
+
+        AnalysisRun.objects.filter(pk=analysis_run.pk).update(
+            status='completed', completed_at=timezone.now()
+        )
 
-        self.stdout.write(self.style.SUCCESS(f"Saved metrics for {count} components"))
+        self.stdout.write(self.style.SUCCESS(f"Saved metrics for {saved} components"))
 
     def _output_text(self, sorted_metrics, sort_by, project_key):
         """Output results as text."""
         if project_key:
-            self.stdout.write(self.style.SUCCESS(f"\nMetrics for: {project_key}"))
+            title = f"\nMetrics for: {project_key}"
         else:
-            self.stdout.write(self.style.SUCCESS(f"\nTop Projects by {sort_by}"))
+            title = f"\nTop Projects by {sort_by}"
 
-        self.stdout.write("-" * 80)
+        # Collect the lines and write them at once instead of once per line
+        lines = [self.style.SUCCESS(title), "-" * 80]
 
         for node, m in sorted_metrics:
-            self.stdout.write(f"\n  {node}")
-            self.stdout.write(f"    Fan-in: {m.get('fan_in', 0):<6} Fan-out: {m.get('fan_out', 0):<6}")
-            self.stdout.write(
+            lines.append(f"\n  {node}")
+            lines.append(f"    Fan-in: {m.get('fan_in', 0):<6} Fan-out: {m.get('fan_out', 0):<6}")
+            lines.append(
                 f"    Instability: {m.get('instability', 0):.3f}    "
                 f"Coupling: {m.get('coupling_score', 0):.2f}"
             )
-            self.stdout.write(
+            lines.append(
                 f"    Degree centrality: {m.get('degree_centrality', 0):.3f}    "
                 f"Betweenness: {m.get('betweenness_centrality', 0):.3f}"
             )
             if 'topological_order' in m:
-                self.stdout.write(
+                lines.append(
                     f"    Topo order: {m.get('topological_order', 'N/A'):<6} "
                     f"Layer depth: {m.get('layer_depth', 'N/A')}"
                 )
 
+        self.stdout.write('\n'.join(lines))
+
     def _output_json(self, sorted_metrics, sort_by):
         """Output results as JSON."""
         output = {
@@ -207,22 +204,24 @@ class Command(BaseCommand):
                 for node, metrics in sorted_metrics
             ]
         }
-        self.stdout.write(json.dumps(output, indent=2))
+        write_json(self.stdout, output)
 
     def _output_yaml(self, sorted_metrics, sort_by):
         """Output results as YAML-like format."""
-        self.stdout.write(f"sorted_by: {sort_by}")
-        self.stdout.write("metrics:")
+        # Collect the lines and write them at once instead of once per line
+        lines = [f"sorted_by: {sort_by}", "metrics:"]
 
         for node, m in sorted_metrics:
-            self.stdout.write(f"  - node: {node}")
-            self.stdout.write(f"    fan_in: {m.get('fan_in', 0)}")
-            self.stdout.write(f"    fan_out: {m.get('fan_out', 0)}")
-            self.stdout.write(f"    instability: {m.get('instability', 0):.3f}")
-            self.stdout.write(f"    coupling_score: {m.get('coupling_score', 0):.2f}")
-            self.stdout.write(f"    degree_centrality: {m.get('degree_centrality', 0):.3f}")
-            self.stdout.write(f"    betweenness_centrality: {m.get('betweenness_centrality', 0):.3f}")
+            lines.append(f"  - node: {node}")
+            lines.append(f"    fan_in: {m.get('fan_in', 0)}")
+            lines.append(f"    fan_out: {m.get('fan_out', 0)}")
+            lines.append(f"    instability: {m.get('instability', 0):.3f}")
+            lines.append(f"    coupling_score: {m.get('coupling_score', 0):.2f}")
+            lines.append(f"    degree_centrality: {m.get('degree_centrality', 0):.3f}")
+            lines.append(f"    betweenness_centrality: {m.get('betweenness_centrality', 0):.3f}")
             if 'topological_order' in m:
-                self.stdout.write(f"    topological_order: {m.get('topological_order')}")
+                lines.append(f"    topological_order: {m.get('topological_order')}")
             if 'layer_depth' in m:
-                self.stdout.write(f"    layer_depth: {m.get('layer_depth')}")
+                lines.append(f"    layer_depth: {m.get('layer_depth')}")
+
+        self.stdout.write('\n'.join(lines))
@@ -18,14 +18,85 @@ Usage:
     python manage.py manage_layers violations
 """
 import re
+import uuid
+from itertools import groupby
+from operator import itemgetter
 from django.core.management.base import BaseCommand
 from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
 from dependencies.models import Component, Dependency, LayerDefinition, LayerAssignment
 
 
+# Rows per INSERT when saving auto-assignments
+SAVE_BATCH_SIZE = 500
+
+# Rows fetched per round trip when showing assignments
+SHOW_CHUNK_SIZE = 2000
+
+# Rows fetched per round trip when matching components to layer patterns
+AUTO_ASSIGN_CHUNK_SIZE = 1000
+
+
+def _component_lookups(component_key: str) -> list[dict]:
+    """Component field lookups for a CLI key, in order of precedence."""
+    lookups = []
+    if ':' in component_key:
+        group_id, artifact_id = component_key.split(':', 1)
+        lookups.append({'maven_group_id': group_id, 'artifact_id': artifact_id})
+    try:
+        lookups.append({'id': uuid.UUID(component_key)})
+    except ValueError:
+        pass
+    lookups.append({'name': component_key})
+    return lookups
+
+
+def _layer_matcher(patterns: list[tuple[re.Pattern, LayerDefinition]]):
+    """
+    Build a function returning the first layer whose pattern matches a key.
+
+    Patterns without groups of their own are joined into one alternation,
+    tried in the same order, so each key takes a single match call.
+    """
+    if all(pattern.groups == 0 for pattern, _ in patterns):
+        try:
+            combined = re.compile('|'.join(
+                f'(?P<l{i}>{pattern.pattern})' for i, (pattern, _) in enumerate(patterns)
+            ))
+        except re.error:  # e.g. global inline flags, only valid at the start
+            combined = None
+
+        if combined:
+            layers = {f'l{i}': layer for i, (_, layer) in enumerate(patterns)}
+
+            def match(key):
+                found = combined.match(key)
+                return layers[found.lastgroup] if found else None
+            return match
+
+    def match(key):
+        for pattern, layer in patterns:
+            if pattern.match(key):
+                return layer
+        return None
+    return match
+
+
 class Command(BaseCommand):
     help = 'Manage architectural layer definitions'
 
+    # Handler method name per action, built once at import
+    ACTION_HANDLERS = {
+        'list': '_handle_list',
+        'create': '_handle_create',
+        'delete': '_handle_delete',
+        'assign': '_handle_assign',
+        'unassign': '_handle_unassign',
+        'auto-assign': '_handle_auto_assign',
+        'show': '_handle_show',
+    }
+
     def add_arguments(self, parser):
         subparsers = parser.add_subparsers(dest='action', help='Action to perform')
 
@@ -63,29 +134,26 @@ class Command(BaseCommand):
         action = options.get('action')
 
         if not action:
-            self.stdout.write(self.style.ERROR("Please specify an action: list, create, delete, assign, unassign, auto-assign, show"))
+            self.stdout.write(self.style.ERROR(
+                f"Please specify an action: {', '.join(self.ACTION_HANDLERS)}"
+            ))
             return
 
-        handler = {
-            'list': self._handle_list,
-            'create': self._handle_create,
-            'delete': self._handle_delete,
-            'assign': self._handle_assign,
-            'unassign': self._handle_unassign,
-            'auto-assign': self._handle_auto_assign,
-            'show': self._handle_show,
-        }.get(action)
-
-        if handler:
-            handler(options)
+        handler_name = self.ACTION_HANDLERS.get(action)
+
+        if handler_name:
+            getattr(self, handler_name)(options)
         else:
             self.stdout.write(self.style.ERROR(f"Unknown action: {action}"))
 
     def _handle_list(self, options):
         """List all layer definitions."""
-        layers = LayerDefinition.objects.all().order_by('level')
+        # Assignment counts come from the same query (one GROUP BY, not a COUNT per layer)
+        layers = list(
+            LayerDefinition.objects.annotate(assignment_count=Count('assignments')).order_by('level')
+        )
 
-        if not layers.exists():
+        if not layers:
             self.stdout.write(self.style.WARNING("No layers defined. Use 'create' to add layers."))
             return
 
@@ -93,13 +161,12 @@ class Command(BaseCommand):
         self.stdout.write("-" * 60)
 
         for layer in layers:
-            assignment_count = layer.assignments.count()
             self.stdout.write(f"\n  Level {layer.level}: {layer.name}")
             if layer.description:
                 self.stdout.write(f"    Description: {layer.description}")
             if layer.pattern:
                 self.stdout.write(f"    Pattern: {layer.pattern}")
-            self.stdout.write(f"    Assigned projects: {assignment_count}")
+            self.stdout.write(f"    Assigned projects: {layer.assignment_count}")
 
     def _handle_create(self, options):
         """Create a layer definition."""
@@ -116,17 +183,14 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.ERROR(f"Invalid regex pattern: {e}"))
                 return
 
-        # Check if layer already exists
-        if LayerDefinition.objects.filter(name=name).exists():
-            self.stdout.write(self.style.ERROR(f"Layer '{name}' already exists"))
-            return
-
-        layer = LayerDefinition.objects.create(
+        # Existing layers are left untouched
+        layer, created = LayerDefinition.objects.get_or_create(
             name=name,
-            level=level,
-            description=description,
-            pattern=pattern,
+            defaults={'level': level, 'description': description, 'pattern': pattern},
         )
+        if not created:
+            self.stdout.write(self.style.ERROR(f"Layer '{name}' already exists"))
+            return
 
         self.stdout.write(self.style.SUCCESS(f"Created layer '{name}' at level {level}"))
 
@@ -134,37 +198,26 @@ class Command(BaseCommand):
         """Delete a layer definition."""
         name = options['name']
 
-        try:
-            layer = LayerDefinition.objects.get(name=name)
-            assignment_count = layer.assignments.count()
-
-            if assignment_count > 0:
-                self.stdout.write(
-                    self.style.WARNING(f"Layer '{name}' has {assignment_count} assignments. They will be deleted.")
-                )
-
-            layer.delete()
-            self.stdout.write(self.style.SUCCESS(f"Deleted layer '{name}'"))
-        except LayerDefinition.DoesNotExist:
+        # Delete directly; the per-model counts include the cascaded assignments
+        deleted, counts = LayerDefinition.objects.filter(name=name).delete()
+        if not deleted:
             self.stdout.write(self.style.ERROR(f"Layer '{name}' not found"))
+            return
+
+        assignment_count = counts.get(LayerAssignment._meta.label, 0)
+        if assignment_count > 0:
+            self.stdout.write(
+                self.style.WARNING(f"Layer '{name}' had {assignment_count} assignments. They were deleted.")
+            )
+        self.stdout.write(self.style.SUCCESS(f"Deleted layer '{name}'"))
 
     def _handle_assign(self, options):
         """Assign a component to a layer."""
         component_key = options['project']  # Keep arg name for CLI compatibility
         layer_name = options['layer']
 
-        # Try to find component by Maven coordinates or UUID
-        component = None
-        if ':' in component_key:
-            parts = component_key.split(':', 1)
-            component = Component.objects.filter(maven_group_id=parts[0], artifact_id=parts[1]).first()
-        if not component:
-            try:
-                component = Component.objects.get(id=component_key)
-            except (Component.DoesNotExist, ValueError):
-                pass
-        if not component:
-            component = Component.objects.filter(name=component_key).first()
+        # Find component by Maven coordinates, UUID or name
+        component = self._find_by_component_key(Component.objects.all(), component_key)
 
         if not component:
             self.stdout.write(self.style.ERROR(f"Component '{component_key}' not found"))
@@ -176,35 +229,25 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f"Layer '{layer_name}' not found"))
             return
 
-        assignment, created = LayerAssignment.objects.update_or_create(
-            component=component,
-            defaults={'layer': layer, 'auto_assigned': False}
+        # Try the UPDATE first and only INSERT when there was nothing to update
+        # (update() skips auto_now, so assigned_at is set explicitly)
+        updated = LayerAssignment.objects.filter(component=component).update(
+            layer=layer, auto_assigned=False, assigned_at=timezone.now()
         )
-
-        if created:
-            self.stdout.write(self.style.SUCCESS(f"Assigned '{component.name}' to layer '{layer_name}'"))
-        else:
+        if updated:
             self.stdout.write(self.style.SUCCESS(f"Updated '{component.name}' to layer '{layer_name}'"))
+        else:
+            LayerAssignment.objects.create(component=component, layer=layer, auto_assigned=False)
+            self.stdout.write(self.style.SUCCESS(f"Assigned '{component.name}' to layer '{layer_name}'"))
 
     def _handle_unassign(self, options):
         """Remove component from layer."""
         component_key = options['project']
 
-        # Try to find assignment by component Maven coordinates, UUID, or name
-        assignment = None
-        if ':' in component_key:
-            parts = component_key.split(':', 1)
-            assignment = LayerAssignment.objects.filter(
-                component__group_id=parts[0],
-                component__artifact_id=parts[1]
-            ).first()
-        if not assignment:
-            try:
-                assignment = LayerAssignment.objects.get(component__id=component_key)
-            except (LayerAssignment.DoesNotExist, ValueError):
-                pass
-        if not assignment:
-            assignment = LayerAssignment.objects.filter(component__name=component_key).first()
+        # Find assignment by component Maven coordinates, UUID, or name
+        assignment = self._find_by_component_key(
+            LayerAssignment.objects.select_related('component'), component_key, path='component'
+        )
 
         if assignment:
             component_name = assignment.component.name
@@ -213,33 +256,55 @@ class Command(BaseCommand):
         else:
             self.stdout.write(self.style.WARNING(f"Component '{component_key}' has no layer assignment"))
 
+    def _find_by_component_key(self, queryset, component_key, path=''):
+        """
+        Find the object whose component matches component_key, in one query.
+
+        All lookups are OR-ed together; when several rows match, Maven
+        coordinates win over UUID and UUID over name.
+        """
+        lookups = _component_lookups(component_key)
+        prefix = f'{path}__' if path else ''
+
+        condition = Q()
+        for lookup in lookups:
+            condition |= Q(**{prefix + field: value for field, value in lookup.items()})
+        candidates = list(queryset.filter(condition))
+
+        for lookup in lookups:
+            for candidate in candidates:
+                component = getattr(candidate, path) if path else candidate
+                if all(getattr(component, field) == value for field, value in lookup.items()):
+                    return candidate
+        return candidates[0] if candidates else None
+
     @transaction.atomic
     def _handle_auto_assign(self, options):
         """Auto-assign components based on layer patterns."""
         dry_run = options.get('dry_run', False)
 
+        # Compile each pattern once instead of per component (in level order)
         layers = LayerDefinition.objects.exclude(pattern='').order_by('level')
-        components = Component.objects.all()
+        patterns = [(re.compile(layer.pattern), layer) for layer in layers]
 
-        if not layers.exists():
+        if not patterns:
             self.stdout.write(self.style.WARNING("No layers with patterns defined"))
             return
+        match_layer = _layer_matcher(patterns)
 
-        assignments = []
-        for component in components:
-            # Skip if already manually assigned
-            existing = LayerAssignment.objects.filter(
-                component=component, auto_assigned=False
-            ).first()
-            if existing:
-                continue
+        # Manually assigned components are excluded in SQL; only the columns
+        # needed for matching and reporting are streamed
+        manual = LayerAssignment.objects.filter(component=OuterRef('pk'), auto_assigned=False)
+        components = Component.objects.exclude(Exists(manual)).values_list('id', 'key', 'name')
 
+        assignments = []
+        for component_id, component_key, component_name in components.iterator(
+            chunk_size=AUTO_ASSIGN_CHUNK_SIZE
+        ):
             # Use Maven coordinate as key for pattern matching
-            component_key = component.key
-            for layer in layers:
-                if layer.pattern and re.match(layer.pattern, component_key):
-                    assignments.append((component, layer))
-                    break
+            layer = match_layer(component_key)
+            if layer:
+                assignments.append((component_id, component_name, layer))
 
         if not assignments:
             self.stdout.write(self.style.WARNING("No components matched any layer patterns"))
@@ -247,37 +312,46 @@ class Command(BaseCommand):
 
         if dry_run:
             self.stdout.write(self.style.SUCCESS("\nWould assign (dry run):"))
-            for component, layer in assignments:
-                self.stdout.write(f"  {component.name} -> {layer.name}")
+            for _, component_name, layer in assignments:
+                self.stdout.write(f"  {component_name} -> {layer.name}")
         else:
-            count = 0
-            for component, layer in assignments:
-                LayerAssignment.objects.update_or_create(
-                    component=component,
-                    defaults={'layer': layer, 'auto_assigned': True}
-                )
-                count += 1
-
-            self.stdout.write(self.style.SUCCESS(f"Auto-assigned {count} components"))
+            # One upsert per batch instead of a SELECT and a write per component
+            LayerAssignment.objects.bulk_create(
+                [
+                    LayerAssignment(component_id=component_id, layer=layer, auto_assigned=True)
+                    for component_id, _, layer in assignments
+                ],
+                batch_size=SAVE_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['component'],
+                update_fields=['layer', 'auto_assigned', 'assigned_at'],
+            )
+
+            self.stdout.write(self.style.SUCCESS(f"Auto-assigned {len(assignments)} components"))
 
     def _handle_show(self, options):
         """Show all layer assignments."""
-        assignments = LayerAssignment.objects.select_related(
-            'component', 'layer'
-        ).order_by('layer__level', 'component__name')
-
-        if not assignments.exists():
+        # Plain tuples ordered so each layer's rows are contiguous (layers can
+        # share a level, hence the pk)
+        rows = LayerAssignment.objects.order_by(
+            'layer__level', 'layer__pk', 'component__name'
+        ).values_list('layer__pk', 'layer__level', 'layer__name', 'component__name', 'auto_assigned')
+
+        # Stream the rows; the header goes out with the first layer, so no
+        # separate exists() query is needed
+        found = False
+        for (_, level, layer_name), members in groupby(
+            rows.iterator(chunk_size=SHOW_CHUNK_SIZE), key=itemgetter(0, 1, 2)
+        ):
+            if not found:
+                found = True
+                self.stdout.write(self.style.SUCCESS("\nLayer Assignments:"))
+                self.stdout.write("-" * 60)
+
+            self.stdout.write(f"\n  [{level}] {layer_name}:")
+            for *_, component_name, auto_assigned in members:
+                auto = " (auto)" if auto_assigned else ""
+                self.stdout.write(f"    - {component_name}{auto}")
+
+        if not found:
             self.stdout.write(self.style.WARNING("No layer assignments. Use 'assign' or 'auto-assign'."))
-            return
-
-        self.stdout.write(self.style.SUCCESS("\nLayer Assignments:"))
-        self.stdout.write("-" * 60)
-
-        current_layer = None
-        for assignment in assignments:
-            if assignment.layer != current_layer:
-                current_layer = assignment.layer
-                self.stdout.write(f"\n  [{assignment.layer.level}] {assignment.layer.name}:")
-
-            auto = " (auto)" if assignment.auto_assigned else ""
-            self.stdout.write(f"    - {assignment.component.name}{auto}")
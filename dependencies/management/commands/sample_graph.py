@@ -1,14 +1,49 @@
+import io
+import os
 import random
+from collections import defaultdict
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
 from dependencies.models import Component, Dependency, NodeGroup
 
 
+# Rows per INSERT when creating the sample graph
+BATCH_SIZE = int(os.environ.get('SAMPLE_GRAPH_BATCH_SIZE', 500))
+
+# Bits per endpoint when packing an edge into one int (up to 65536 components)
+EDGE_SHIFT = 16
+
+
 class Command(BaseCommand):
     help = 'Create sample components and dependencies for graph testing'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=None,
+            help='Random seed for a reproducible graph (default: random)'
+        )
+        parser.add_argument(
+            '--with-descriptions',
+            action='store_true',
+            help='Fill in component descriptions (default: leave them empty)'
+        )
+
+    @transaction.atomic
     def handle(self, *args, **options):
-        # Clear existing data
-        Dependency.objects.all().delete()
+        # Bind the generator's methods once; they are called in every loop below
+        rng = random.Random(options['seed'])
+        sample, randint, shuffle = rng.sample, rng.randint, rng.shuffle
+        with_descriptions = options['with_descriptions']
+
+        # Clear existing data. Nothing references dependencies, so PostgreSQL
+        # can truncate that table instead of deleting it row by row
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'TRUNCATE {connection.ops.quote_name(Dependency._meta.db_table)}')
+        else:
+            Dependency.objects.all().delete()
         Component.objects.all().delete()
         NodeGroup.objects.all().delete()
 
@@ -34,87 +69,124 @@ class Command(BaseCommand):
         groups = {}
 
         # Create groups for each domain
-        for domain in list(domains.keys()) + ['misc']:
-            group = NodeGroup.objects.create(
-                key=domain,
-                name=domain.title(),
-            )
-            groups[domain] = group
+        for group in NodeGroup.objects.bulk_create([
+            NodeGroup(key=domain, name=domain.title())
+            for domain in list(domains.keys()) + ['misc']
+        ]):
+            groups[group.key] = group
+
+        # Display names are built once per service and type, not per component
+        type_titles = {svc_type: svc_type.title() for svc_type in service_types}
 
         # Generate 2000 components with domain:service naming convention
         for domain, services in domains.items():
+            group_id = groups[domain].pk
             for service in services:
-                for svc_type in random.sample(service_types, k=random.randint(1, 2)):
+                service_title = service.replace('-', ' ').title()
+                for svc_type in sample(service_types, k=randint(1, 2)):
                     # Use domain:service-type naming convention for automatic grouping
-                    key = f"{domain}:{service}-{svc_type}"
+                    artifact_id = f"{service}-{svc_type}"
+                    key = f"{domain}:{artifact_id}"
                     if key not in projects and len(projects) < 2000:
-                        name = f"{service.replace('-', ' ').title()} {svc_type.title()}"
-                        component = Component.objects.create(
+                        name = f"{service_title} {type_titles[svc_type]}"
+                        component = Component(
+                            key=key,
                             name=name,
-                            description=f"{name} for {domain} domain",
+                            description=f"{name} for {domain} domain" if with_descriptions else '',
                             component_type='service',
                             maven_group_id=domain,
-                            artifact_id=f"{service}-{svc_type}",
-                            group=groups[domain],
+                            artifact_id=artifact_id,
+                            group_id=group_id,
                         )
                         projects[key] = component
                         project_list.append((key, domain))
 
         # Fill remaining slots if needed
         extra_services = ['legacy', 'migration', 'batch', 'cron', 'admin', 'internal', 'external', 'public', 'private', 'shared']
-        while len(projects) < 2000:
-            svc = random.choice(extra_services)
-            num = len(projects)
-            key = f"misc:{svc}-{num}"
-            name = f"{svc.title()} Service {num}"
-            component = Component.objects.create(
+        extra_titles = {svc: svc.title() for svc in extra_services}
+        misc_group_id = groups['misc'].pk
+        start = len(projects)
+        for num, svc in enumerate(rng.choices(extra_services, k=2000 - start), start):
+            artifact_id = f"{svc}-{num}"
+            key = f"misc:{artifact_id}"
+            name = f"{extra_titles[svc]} Service {num}"
+            component = Component(
+                key=key,
                 name=name,
-                description=f"Additional service {num}",
+                description=f"Additional service {num}" if with_descriptions else '',
                 component_type='service',
                 maven_group_id='misc',
-                artifact_id=f"{svc}-{num}",
-                group=groups['misc'],
+                artifact_id=artifact_id,
+                group_id=misc_group_id,
             )
             projects[key] = component
             project_list.append((key, 'misc'))
 
+        # Insert the components in batches instead of one row at a time
+        Component.objects.bulk_create(projects.values(), batch_size=BATCH_SIZE)
         self.stdout.write(f'Created {len(groups)} groups and {len(projects)} components')
 
-        # Core services that many depend on
-        core_services = [k for k, d in project_list if d == 'core' or 'lib' in k or 'connector' in k]
-        platform_services = [k for k, d in project_list if d == 'platform']
+        # Edges refer to components by their index in project_list and are
+        # stored as (source << EDGE_SHIFT) | target, so the set holds plain ints
+        components = list(projects.values())
+
+        # Component indexes per domain, so lookups don't rescan project_list,
+        # and core services that many depend on, collected in the same pass
+        by_domain = defaultdict(list)
+        core_services = []
+        for node, (key, domain) in enumerate(project_list):
+            by_domain[domain].append(node)
+            if domain == 'core' or 'lib' in key or 'connector' in key:
+                core_services.append(node)
+        platform_services = by_domain['platform']
 
         # Generate dependencies
         dependencies = set()
+        max_core = min(3, len(core_services))
+        max_platform = min(2, len(platform_services))
+
+        # Draw how many of each kind every service depends on in one call per kind
+        core_counts = rng.choices(range(1, max_core + 1), k=len(project_list))
+        platform_counts = rng.choices(range(max_platform + 1), k=len(project_list))
+        same_domain_counts = rng.choices(range(4), k=len(project_list))
 
-        for key, domain in project_list:
+        for node, (_, domain) in enumerate(project_list):
+            source = node << EDGE_SHIFT
             # Each service depends on 1-3 core services
-            for core in random.sample(core_services, k=min(random.randint(1, 3), len(core_services))):
-                if core != key:
-                    dependencies.add((key, core))
+            dependencies.update(
+                source | core
+                for core in sample(core_services, k=core_counts[node])
+                if core != node
+            )
 
             # Each service depends on 0-2 platform services
             if platform_services:
-                for platform in random.sample(platform_services, k=min(random.randint(0, 2), len(platform_services))):
-                    if platform != key:
-                        dependencies.add((key, platform))
+                dependencies.update(
+                    source | platform
+                    for platform in sample(platform_services, k=platform_counts[node])
+                    if platform != node
+                )
 
-            # Services in same domain depend on each other
-            same_domain = [k for k, d in project_list if d == domain and k != key]
-            if same_domain:
-                for dep in random.sample(same_domain, k=min(random.randint(0, 3), len(same_domain))):
-                    dependencies.add((key, dep))
+            # Services in same domain depend on each other. Sample the shared
+            # list and drop the service itself rather than copying the list
+            same_domain = by_domain[domain]
+            if len(same_domain) > 1:
+                dependencies.update(
+                    source | dep
+                    for dep in sample(same_domain, k=min(same_domain_counts[node], len(same_domain)))
+                    if dep != node
+                )
 
         # Add some cross-domain dependencies
-        commerce_keys = [k for k, d in project_list if d == 'commerce']
-        fulfillment_keys = [k for k, d in project_list if d == 'fulfillment']
-        communication_keys = [k for k, d in project_list if d == 'communication']
+        commerce_keys = by_domain['commerce']
+        fulfillment_keys = by_domain['fulfillment']
+        communication_keys = by_domain['communication']
 
         for commerce in commerce_keys[:5]:
-            for fulfillment in random.sample(fulfillment_keys, k=min(2, len(fulfillment_keys))):
-                dependencies.add((commerce, fulfillment))
-            for comm in random.sample(communication_keys, k=min(2, len(communication_keys))):
-                dependencies.add((commerce, comm))
+            for fulfillment in sample(fulfillment_keys, k=min(2, len(fulfillment_keys))):
+                dependencies.add(commerce << EDGE_SHIFT | fulfillment)
+            for comm in sample(communication_keys, k=min(2, len(communication_keys))):
+                dependencies.add(commerce << EDGE_SHIFT | comm)
 
         # Add many explicit cycles for testing cycle detection
         # Focus on longer cycles (3+ nodes), minimize 2-node cycles
@@ -126,9 +198,12 @@ class Command(BaseCommand):
             nonlocal cycle_count
             if start_idx + length > len(keys):
                 return False
-            for j in range(length - 1):
-                dependencies.add((keys[start_idx + j], keys[start_idx + j + 1]))
-            dependencies.add((keys[start_idx + length - 1], keys[start_idx]))
+            # Pair each node with the next, wrapping the last back to the first
+            segment = keys[start_idx:start_idx + length]
+            dependencies.update(
+                source << EDGE_SHIFT | target
+                for source, target in zip(segment, segment[1:] + segment[:1])
+            )
             cycle_count += 1
             if length in cycle_lengths:
                 cycle_lengths[length] += 1
@@ -136,8 +211,8 @@ class Command(BaseCommand):
 
         # Create varied-length cycles within each domain
         for domain, services in domains.items():
-            domain_keys = [k for k, d in project_list if d == domain]
-            random.shuffle(domain_keys)
+            domain_keys = list(by_domain[domain])
+            shuffle(domain_keys)
 
             idx = 0
             # Create cycles of lengths 4, 5, 6 within domain
@@ -150,18 +225,19 @@ class Command(BaseCommand):
         all_domain_names = list(domains.keys())
         for i in range(20):  # Create 20 cross-domain long cycles
             # Pick 4 random domains
-            selected_domains = random.sample(all_domain_names, min(4, len(all_domain_names)))
+            selected_domains = sample(all_domain_names, min(4, len(all_domain_names)))
             cycle_nodes = []
             for dom in selected_domains:
-                dom_keys = [k for k, d in project_list if d == dom]
+                dom_keys = by_domain[dom]
                 if dom_keys:
-                    cycle_nodes.extend(random.sample(dom_keys, min(2, len(dom_keys))))
+                    cycle_nodes.extend(sample(dom_keys, min(2, len(dom_keys))))
 
             if len(cycle_nodes) >= 5:
                 # Create cycle through these nodes
-                for j in range(len(cycle_nodes) - 1):
-                    dependencies.add((cycle_nodes[j], cycle_nodes[j + 1]))
-                dependencies.add((cycle_nodes[-1], cycle_nodes[0]))
+                dependencies.update(
+                    source << EDGE_SHIFT | target
+                    for source, target in zip(cycle_nodes, cycle_nodes[1:] + cycle_nodes[:1])
+                )
                 cycle_count += 1
                 cycle_lengths[min(len(cycle_nodes), 8)] = cycle_lengths.get(min(len(cycle_nodes), 8), 0) + 1
 
@@ -175,21 +251,21 @@ class Command(BaseCommand):
             ('mobile', 'content'),
         ]
         for dom1, dom2 in domain_pairs:
-            keys1 = [k for k, d in project_list if d == dom1]
-            keys2 = [k for k, d in project_list if d == dom2]
+            keys1 = by_domain[dom1]
+            keys2 = by_domain[dom2]
             for i in range(min(10, len(keys1), len(keys2))):
                 # 4-node cycle: dom1 -> dom1 -> dom2 -> dom2 -> dom1
                 if i + 1 < len(keys1) and i + 1 < len(keys2):
-                    dependencies.add((keys1[i], keys1[i + 1]))
-                    dependencies.add((keys1[i + 1], keys2[i]))
-                    dependencies.add((keys2[i], keys2[i + 1]))
-                    dependencies.add((keys2[i + 1], keys1[i]))
+                    dependencies.add(keys1[i] << EDGE_SHIFT | keys1[i + 1])
+                    dependencies.add(keys1[i + 1] << EDGE_SHIFT | keys2[i])
+                    dependencies.add(keys2[i] << EDGE_SHIFT | keys2[i + 1])
+                    dependencies.add(keys2[i + 1] << EDGE_SHIFT | keys1[i])
                     cycle_count += 1
                     cycle_lengths[4] += 1
 
         # Create longer cycles in misc (5-8 nodes)
-        misc_keys = [k for k, d in project_list if d == 'misc']
-        random.shuffle(misc_keys)
+        misc_keys = list(by_domain['misc'])
+        shuffle(misc_keys)
         idx = 0
         for cycle_len in [5, 6, 7, 8, 5, 6, 7, 8, 5, 6, 7, 8] * 10:
             if idx + cycle_len <= len(misc_keys):
@@ -198,10 +274,10 @@ class Command(BaseCommand):
 
         # Only add a few 2-node cycles (direct bidirectional) for comparison
         for domain in ['core', 'platform']:
-            domain_keys = [k for k, d in project_list if d == domain]
+            domain_keys = by_domain[domain]
             if len(domain_keys) >= 2:
-                dependencies.add((domain_keys[0], domain_keys[1]))
-                dependencies.add((domain_keys[1], domain_keys[0]))
+                dependencies.add(domain_keys[0] << EDGE_SHIFT | domain_keys[1])
+                dependencies.add(domain_keys[1] << EDGE_SHIFT | domain_keys[0])
                 cycle_count += 1
                 cycle_lengths[2] = cycle_lengths.get(2, 0) + 1
 
@@ -209,15 +285,40 @@ class Command(BaseCommand):
         self.stdout.write(f'Cycle lengths: {dict(sorted(cycle_lengths.items()))}')
 
         # Create dependency records
-        dep_count = 0
-        for source_key, target_key in dependencies:
-            if source_key in projects and target_key in projects:
-                Dependency.objects.create(
-                    source=projects[source_key],
-                    target=projects[target_key],
-                )
-                dep_count += 1
+        # Insert in (source_id, target_id) order so index leaves fill sequentially
+        target_mask = (1 << EDGE_SHIFT) - 1
+        edges = sorted(
+            (components[edge >> EDGE_SHIFT].pk, components[edge & target_mask].pk)
+            for edge in dependencies
+        )
+        if connection.vendor == 'postgresql':
+            # COPY streams every row in one statement with no per-batch planning
+            self._copy_dependencies(edges)
+        else:
+            Dependency.objects.bulk_create([
+                Dependency(source_id=source_id, target_id=target_id)
+                for source_id, target_id in edges
+            ], batch_size=BATCH_SIZE)
+        dep_count = len(edges)
 
         self.stdout.write(self.style.SUCCESS(
             f'Created {len(groups)} groups, {len(projects)} projects and {dep_count} dependencies'
         ))
+
+    def _copy_dependencies(self, edges):
+        """Load (source_id, target_id) pairs with PostgreSQL COPY."""
+        opts = Dependency._meta
+        scope = opts.get_field('scope').default
+        weight = opts.get_field('weight').default
+        columns = ', '.join(
+            connection.ops.quote_name(opts.get_field(name).column)
+            for name in ('source', 'target', 'scope', 'weight')
+        )
+
+        buffer = io.StringIO()
+        buffer.writelines(f'{source}\t{target}\t{scope}\t{weight}\n' for source, target in edges)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {connection.ops.quote_name(opts.db_table)} ({columns}) FROM STDIN', buffer
+            )
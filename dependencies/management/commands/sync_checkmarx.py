@@ -1,16 +1,34 @@
+import time
 from django.core.management.base import BaseCommand
 from dependencies.sync import (
     sync_checkmarx_projects,
     sync_checkmarx_dependencies,
     export_checkmarx_sboms,
     import_from_cached_sboms,
+    WRITE_BATCH_SIZE,
 )
-from dependencies.service import CheckmarxService, DEFAULT_SBOM_CACHE_DIR
+from dependencies.service import CheckmarxService, DEFAULT_SBOM_CACHE_DIR, HAS_ZSTD
+
+
+# Minimum seconds between progress line updates
+PROGRESS_INTERVAL = 0.1
+
+# Minimum seconds between progress lines when stdout is not a terminal (e.g. CI logs)
+PROGRESS_LOG_INTERVAL = 10.0
+
+# Failed SBOM exports printed; later failures are only counted
+MAX_ERRORS_SHOWN = 5
 
 
 class Command(BaseCommand):
     help = 'Synchronize projects and dependencies from Checkmarx One SCA'
 
+    # time.monotonic() of the last progress line written
+    _progress_written = float('-inf')
+
+    # Whether stdout is a terminal; checked on the first progress update
+    _progress_tty = None
+
     def add_arguments(self, parser):
         parser.add_argument(
             '--base-url',
@@ -42,6 +60,18 @@ class Command(BaseCommand):
             type=str,
             help='Directory for caching SBOM files (default: sbom_cache)',
         )
+        parser.add_argument(
+            '--cache-compression',
+            choices=['none', 'zstd'],
+            default='zstd' if HAS_ZSTD else 'none',
+            help='Compression for newly cached SBOM files; both formats are read '
+                 '(default: zstd when zstandard is installed)',
+        )
+        parser.add_argument(
+            '--force-reauth',
+            action='store_true',
+            help='Request a new access token instead of reusing one cached by an earlier run',
+        )
         parser.add_argument(
             '--projects-only',
             action='store_true',
@@ -62,21 +92,44 @@ class Command(BaseCommand):
             action='store_true',
             help='Skip SBOM export, only use cached SBOMs for dependencies',
         )
+        parser.add_argument(
+            '--force-export',
+            action='store_true',
+            help='Re-export SBOMs even if the latest scan is already cached',
+        )
         parser.add_argument(
             '--request-delay',
             type=float,
-            help='Seconds to wait between API requests (default: 1.0 or CHECKMARX_REQUEST_DELAY env var)',
+            help='Minimum seconds between API request starts (default: 1.0 or CHECKMARX_REQUEST_DELAY env var)',
         )
         parser.add_argument(
             '--export-delay',
             type=float,
-            help='Seconds to wait before SBOM export operations (default: 10.0 or CHECKMARX_EXPORT_DELAY env var)',
+            help='Minimum seconds between SBOM export operations (default: 10.0 or CHECKMARX_EXPORT_DELAY env var)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Number of SBOM exports to run at once (default: 1)',
+        )
+        parser.add_argument(
+            '--write-batch-size',
+            type=int,
+            default=WRITE_BATCH_SIZE,
+            help=f'Rows per database write when syncing projects and dependencies (default: {WRITE_BATCH_SIZE})',
         )
         parser.add_argument(
             '--offline',
             action='store_true',
             help='Import from cached SBOM JSON files only, no HTTP requests',
         )
+        parser.add_argument(
+            '--parallelism',
+            type=int,
+            default=None,
+            help='Worker processes parsing cached SBOMs in --offline mode (default: CPU count, 1 = no subprocesses)',
+        )
         parser.add_argument(
             '--internal-prefix',
             type=str,
@@ -91,18 +144,35 @@ class Command(BaseCommand):
         client_id = options.get('client_id')
         client_secret = options.get('client_secret')
         cache_dir = options.get('cache_dir')
+        cache_compression = options.get('cache_compression')
+        force_reauth = options.get('force_reauth')
         projects_only = options.get('projects_only')
         export_only = options.get('export_only')
         dependencies_only = options.get('dependencies_only')
         skip_export = options.get('skip_export')
+        force_export = options.get('force_export')
         request_delay = options.get('request_delay')
         export_delay = options.get('export_delay')
+        concurrency = options.get('concurrency')
+        write_batch_size = options.get('write_batch_size')
         offline = options.get('offline')
+        parallelism = options.get('parallelism')
         internal_prefix = options.get('internal_prefix')
 
+        if concurrency < 1:
+            self.stderr.write(self.style.ERROR('--concurrency must be at least 1'))
+            return
+        if write_batch_size < 1:
+            self.stderr.write(self.style.ERROR('--write-batch-size must be at least 1'))
+            return
+
         # Offline mode: import from cached JSON files without any HTTP requests
         if offline:
             from pathlib import Path
+            if parallelism is not None and parallelism < 1:
+                self.stderr.write(self.style.ERROR('--parallelism must be at least 1'))
+                return
+
             cache_path = Path(cache_dir or DEFAULT_SBOM_CACHE_DIR)
             if not cache_path.exists():
                 self.stderr.write(self.style.ERROR(
@@ -117,9 +187,9 @@ class Command(BaseCommand):
                 result = import_from_cached_sboms(
                     cache_path,
                     internal_prefix=internal_prefix,
-                    on_progress=lambda p, d: (
-                        self.stdout.write(f'  Processed: {p} projects, {d} dependencies', ending='\r'),
-                        self.stdout.flush()
+                    parallelism=parallelism,
+                    on_progress=lambda p, d: self._write_progress(
+                        f'  Processed: {p} projects, {d} dependencies'
                     )
                 )
                 self.stdout.write('')  # newline after progress
@@ -132,16 +202,22 @@ class Command(BaseCommand):
                 self.stderr.write(self.style.ERROR(f'Failed: {e}'))
             return
 
-        service = CheckmarxService(
-            base_url=base_url,
-            iam_url=iam_url,
-            tenant=tenant,
-            client_id=client_id,
-            client_secret=client_secret,
-            cache_dir=cache_dir,
-            request_delay=request_delay,
-            export_delay=export_delay,
-        )
+        try:
+            service = CheckmarxService(
+                base_url=base_url,
+                iam_url=iam_url,
+                tenant=tenant,
+                client_id=client_id,
+                client_secret=client_secret,
+                cache_dir=cache_dir,
+                request_delay=request_delay,
+                export_delay=export_delay,
+                cache_compression=cache_compression,
+                force_reauth=force_reauth,
+            )
+        except ValueError as e:
+            self.stderr.write(self.style.ERROR(str(e)))
+            return
 
         if not service.base_url:
             self.stderr.write(self.style.ERROR(
@@ -159,7 +235,7 @@ class Command(BaseCommand):
         if not dependencies_only and not export_only:
             self.stdout.write('Syncing projects from Checkmarx One...')
             try:
-                count = sync_checkmarx_projects(service)
+                count = sync_checkmarx_projects(service, batch_size=write_batch_size)
                 self.stdout.write(self.style.SUCCESS(f'Synced {count} projects'))
             except Exception as e:
                 self.stderr.write(self.style.ERROR(f'Failed to sync projects: {e}'))
@@ -170,25 +246,38 @@ class Command(BaseCommand):
             return
 
         # Step 2: Export SBOMs sequentially (unless skipped)
+        export_failed = 0
         if not dependencies_only and not skip_export:
             delay_msg = f' (request delay: {request_delay}s)' if request_delay else ''
-            self.stdout.write(f'Exporting SBOMs sequentially{delay_msg}...')
+            if concurrency > 1:
+                self.stdout.write(f'Exporting SBOMs, {concurrency} at a time{delay_msg}...')
+            else:
+                self.stdout.write(f'Exporting SBOMs sequentially{delay_msg}...')
             self.stdout.write('  (Previously exported SBOMs will be skipped)')
 
             def on_progress(exported, skipped, processed):
-                self.stdout.write(
-                    f'  Processed: {processed} (exported: {exported}, cached: {skipped})',
-                    ending='\r'
+                self._write_progress(
+                    f'  Processed: {processed} (exported: {exported}, cached: {skipped})'
                 )
-                self.stdout.flush()
+
+            def on_error(cx_project, error):
+                nonlocal export_failed
+                export_failed += 1
+                if export_failed <= MAX_ERRORS_SHOWN:
+                    self.stdout.write('')  # newline after progress
+                    self.stderr.write(f'  Error: {cx_project.name}: {error}')
 
             try:
                 with service:
-                    result = export_checkmarx_sboms(service, on_progress=on_progress)
+                    result = export_checkmarx_sboms(
+                        service, on_progress=on_progress, concurrency=concurrency,
+                        force=force_export, on_error=on_error,
+                    )
                 self.stdout.write('')  # newline after progress
+                failed_msg = f', {result["failed"]} failed' if result['failed'] else ''
                 self.stdout.write(self.style.SUCCESS(
                     f'SBOM export complete: {result["exported"]} exported, '
-                    f'{result["skipped"]} cached'
+                    f'{result["skipped"]} cached{failed_msg}'
                 ))
             except Exception as e:
                 self.stdout.write('')  # newline after progress
@@ -202,11 +291,31 @@ class Command(BaseCommand):
         # Step 3: Sync dependencies from cached SBOMs
         self.stdout.write('Syncing dependencies from cached SBOMs...')
         try:
-            use_cached_only = skip_export or dependencies_only
-            count = sync_checkmarx_dependencies(service, use_cached_only=use_cached_only)
+            # SBOMs whose export just failed are not retried here
+            use_cached_only = skip_export or dependencies_only or export_failed > 0
+            count = sync_checkmarx_dependencies(
+                service, use_cached_only=use_cached_only, batch_size=write_batch_size
+            )
             self.stdout.write(self.style.SUCCESS(f'Synced {count} dependencies'))
         except Exception as e:
             self.stderr.write(self.style.ERROR(f'Failed to sync dependencies: {e}'))
             return
 
         self.stdout.write(self.style.SUCCESS('Checkmarx One sync complete'))
+
+    def _write_progress(self, message):
+        """Overwrite the progress line, at most once per PROGRESS_INTERVAL.
+
+        When stdout is not a terminal, whole lines are written instead, at
+        most once per PROGRESS_LOG_INTERVAL.
+        """
+        if self._progress_tty is None:
+            self._progress_tty = self.stdout.isatty()
+        interval = PROGRESS_INTERVAL if self._progress_tty else PROGRESS_LOG_INTERVAL
+
+        now = time.monotonic()
+        if now - self._progress_written < interval:
+            return
+        self._progress_written = now
+        self.stdout.write(message, ending='\r' if self._progress_tty else '\n')
+        self.stdout.flush()
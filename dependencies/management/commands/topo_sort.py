@@ -18,11 +18,11 @@ import json
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from dependencies.models import (
-    Component, Dependency, AnalysisRun, LayerDefinition,
+    AnalysisRun, LayerDefinition,
     LayerAssignment, LayerViolation
 )
 from dependencies.components.graph.graph import (
-    topological_sort, assign_topological_layers, detect_layer_violations
+    build_adjacency, topological_sort, assign_topological_layers, detect_layer_violations
 )
 
 
@@ -54,7 +54,7 @@ class Command(BaseCommand):
         save = options['save']
 
         # Build adjacency list from database
-        adjacency = self._build_adjacency()
+        adjacency = build_adjacency()
 
         if not adjacency:
             self.stderr.write(self.style.WARNING("No dependencies found"))
@@ -77,7 +77,7 @@ class Command(BaseCommand):
 
         # Save violations if requested
         if save and violations:
-            self._save_violations(violations)
+            self._save_violations(violations, total_projects=len(adjacency))
 
         # Output results
         if output_format == 'json':
@@ -87,59 +87,43 @@ class Command(BaseCommand):
         else:
             self._output_text(ordering, is_dag, back_edges, layers, violations)
 
-    def _build_adjacency(self) -> dict[str, set[str]]:
-        """Build adjacency list from database."""
-        adjacency: dict[str, set[str]] = {}
-
-        for dep in Dependency.objects.select_related('source', 'target').all():
-            source_key = str(dep.source.id)
-            target_key = str(dep.target.id)
-            adjacency.setdefault(source_key, set()).add(target_key)
-
-        for component in Component.objects.all():
-            adjacency.setdefault(str(component.id), set())
-
-        return adjacency
-
     def _get_layer_assignments(self) -> dict[str, int]:
         """Get layer assignments from database."""
-        assignments = {}
-        for la in LayerAssignment.objects.select_related('component', 'layer').all():
-            assignments[str(la.component.id)] = la.layer.level
-        return assignments
+        return {
+            str(component_id): level
+            for component_id, level in LayerAssignment.objects.values_list('component_id', 'layer__level')
+        }
 
     @transaction.atomic
-    def _save_violations(self, violations):
+    def _save_violations(self, violations, total_projects):
         """Save violations to database."""
         # Create analysis run
         analysis_run = AnalysisRun.objects.create(
-            total_projects=Component.objects.count(),
+            total_projects=total_projects,
             status='completed'
         )
 
-        # Get component and layer mappings
-        components = {str(c.id): c for c in Component.objects.all()}
-        layers = {l.level: l for l in LayerDefinition.objects.all()}
+        # Violation endpoints are adjacency keys, i.e. component ids that were
+        # just read, so only the layer ids need looking up
+        layer_ids = dict(LayerDefinition.objects.values_list('level', 'id'))
 
-        count = 0
+        rows = []
         for v in violations:
-            source_component = components.get(v['source'])
-            target_component = components.get(v['target'])
-            source_layer = layers.get(v['source_layer'])
-            target_layer = layers.get(v['target_layer'])
+            source_layer_id = layer_ids.get(v['source_layer'])
+            target_layer_id = layer_ids.get(v['target_layer'])
 
-            if source_component and target_component and source_layer and target_layer:
-                LayerViolation.objects.create(
+            if source_layer_id and target_layer_id:
+                rows.append(LayerViolation(
                     analysis_run=analysis_run,
-                    source_component=source_component,
-                    target_component=target_component,
-                    source_layer=source_layer,
-                    target_layer=target_layer,
+                    source_component_id=v['source'],
+                    target_component_id=v['target'],
+                    source_layer_id=source_layer_id,
+                    target_layer_id=target_layer_id,
                     severity=v['severity'],
-                )
-                count += 1
+                ))
+        LayerViolation.objects.bulk_create(rows)
 
-        self.stdout.write(self.style.SUCCESS(f"Saved {count} violations"))
+        self.stdout.write(self.style.SUCCESS(f"Saved {len(rows)} violations"))
 
     def _output_text(self, ordering, is_dag, back_edges, layers, violations):
         """Output results as text."""
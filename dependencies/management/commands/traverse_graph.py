@@ -19,8 +19,8 @@ Usage:
 """
 import json
 from django.core.management.base import BaseCommand
-from dependencies.models import Component, Dependency
-from dependencies.components.graph.graph import traverse_graph
+from dependencies.models import Component
+from dependencies.components.graph.graph import build_adjacency, traverse_graph
 
 
 class Command(BaseCommand):
@@ -87,7 +87,7 @@ class Command(BaseCommand):
         component_id = str(component.id)
 
         # Build adjacency list from database
-        adjacency = self._build_adjacency()
+        adjacency = build_adjacency()
 
         # Perform traversal
         result = traverse_graph(
@@ -106,21 +106,6 @@ class Command(BaseCommand):
         else:
             self._output_text(result, component.name, direction, algorithm, max_depth)
 
-    def _build_adjacency(self) -> dict[str, set[str]]:
-        """Build adjacency list from database."""
-        adjacency: dict[str, set[str]] = {}
-
-        for dep in Dependency.objects.select_related('source', 'target').all():
-            source_key = str(dep.source.id)
-            target_key = str(dep.target.id)
-            adjacency.setdefault(source_key, set()).add(target_key)
-
-        # Ensure all components are in adjacency (even if no outgoing deps)
-        for component in Component.objects.all():
-            adjacency.setdefault(str(component.id), set())
-
-        return adjacency
-
     def _output_text(self, result, start_node, direction, algorithm, max_depth):
         """Output results as text."""
         self.stdout.write(self.style.SUCCESS(f"\nGraph Traversal Results"))
@@ -0,0 +1,21 @@
+"""
+Output helpers shared by the management commands.
+"""
+import json
+
+
+# Characters of encoded JSON buffered per write to stdout
+JSON_WRITE_CHUNK_SIZE = 64 * 1024
+
+
+def write_json(stdout, output):
+    """Write output as indented JSON without building one large string."""
+    # Batch the encoder's small pieces into writes of ~JSON_WRITE_CHUNK_SIZE
+    buffer, size = [], 0
+    for chunk in json.JSONEncoder(indent=2, default=str).iterencode(output):
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= JSON_WRITE_CHUNK_SIZE:
+            stdout.write(''.join(buffer), ending='')
+            buffer, size = [], 0
+    stdout.write(''.join(buffer))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dependencies', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='analysisrun',
+            name='started_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dependencies', '0002_analysisrun_started_at_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='refactoringproposal',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -262,7 +262,7 @@ class Dependency(models.Model):
 
 class AnalysisRun(models.Model):
     """Tracks each refactoring analysis pipeline execution."""
-    started_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(auto_now_add=True, db_index=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     total_projects = models.IntegerField(default=0)
     total_sccs = models.IntegerField(default=0)
@@ -308,6 +308,17 @@ class RefactoringProposal(models.Model):
         ('rejected', 'Rejected'),
     ]
 
+    # Bootstrap badge colours per choice value
+    IMPACT_BADGES = {'high': 'danger', 'medium': 'warning', 'low': 'info'}
+    RISK_BADGES = {'high': 'danger', 'medium': 'warning', 'low': 'success'}
+    STATUS_BADGES = {
+        'proposed': 'primary',
+        'approved': 'info',
+        'in_progress': 'warning',
+        'completed': 'success',
+        'rejected': 'secondary',
+    }
+
     proposal_id = models.CharField(max_length=20, unique=True)  # e.g., ARC-042
     analysis_run = models.ForeignKey(
         AnalysisRun,
@@ -332,7 +343,7 @@ class RefactoringProposal(models.Model):
 
     # Status tracking
     status = models.CharField(max_length=20, default='proposed', choices=STATUS_CHOICES)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
@@ -343,21 +354,15 @@ class RefactoringProposal(models.Model):
 
     @property
     def impact_badge_class(self):
-        return {'high': 'danger', 'medium': 'warning', 'low': 'info'}.get(self.impact, 'secondary')
+        return self.IMPACT_BADGES.get(self.impact, 'secondary')
 
     @property
     def risk_badge_class(self):
-        return {'high': 'danger', 'medium': 'warning', 'low': 'success'}.get(self.risk, 'secondary')
+        return self.RISK_BADGES.get(self.risk, 'secondary')
 
     @property
     def status_badge_class(self):
-        return {
-            'proposed': 'primary',
-            'approved': 'info',
-            'in_progress': 'warning',
-            'completed': 'success',
-            'rejected': 'secondary',
-        }.get(self.status, 'secondary')
+        return self.STATUS_BADGES.get(self.status, 'secondary')
 
 
 class LayerDefinition(models.Model):
@@ -460,6 +465,17 @@ class LayerViolation(models.Model):
 
 class NodeMetrics(models.Model):
     """Cached node-level metrics for a component."""
+    # Columns overwritten when a component already has metrics
+    UPDATE_FIELDS = [
+        'analysis_run', 'fan_in', 'fan_out', 'coupling_score',
+        'afferent_coupling', 'efferent_coupling', 'instability',
+        'degree_centrality', 'betweenness_centrality',
+        'topological_order', 'layer_depth', 'computed_at',
+    ]
+
+    # Rows per INSERT when saving metrics
+    SAVE_BATCH_SIZE = 1000
+
     component = models.OneToOneField(
         Component,
         on_delete=models.CASCADE,
@@ -511,6 +527,42 @@ class NodeMetrics(models.Model):
     def __str__(self):
         return f"Metrics for {self.component.name}"
 
+    @classmethod
+    def save_metrics(cls, analysis_run, metrics: dict[str, dict]) -> int:
+        """Upsert the metrics of each existing component; returns the rows written.
+
+        `metrics` maps component ids to calculate_all_metrics() results. Rows
+        are written with one upsert per batch instead of one per component.
+        """
+        # Only the analysed ids are looked up (in_bulk batches the IN list)
+        component_ids = {str(pk) for pk in Component.objects.only('id').in_bulk(list(metrics))}
+        rows = [
+            cls(
+                component_id=node_key,
+                analysis_run=analysis_run,
+                fan_in=node_metrics.get('fan_in', 0),
+                fan_out=node_metrics.get('fan_out', 0),
+                coupling_score=node_metrics.get('coupling_score', 0.0),
+                afferent_coupling=node_metrics.get('afferent', 0),
+                efferent_coupling=node_metrics.get('efferent', 0),
+                instability=node_metrics.get('instability', 0.0),
+                degree_centrality=node_metrics.get('degree_centrality', 0.0),
+                betweenness_centrality=node_metrics.get('betweenness_centrality', 0.0),
+                topological_order=node_metrics.get('topological_order'),
+                layer_depth=node_metrics.get('layer_depth'),
+            )
+            for node_key, node_metrics in metrics.items()
+            if node_key in component_ids
+        ]
+        cls.objects.bulk_create(
+            rows,
+            batch_size=cls.SAVE_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['component'],
+            update_fields=cls.UPDATE_FIELDS,
+        )
+        return len(rows)
+
 
 class Vision(models.Model):
     """Workspace for architectural exploration."""
@@ -20,7 +20,7 @@ from typing import Iterator
 from django.db import transaction
 from django.utils import timezone
 
-from dependencies.models import Component, Dependency, NodeGroup, RefactoringProposal, AnalysisRun
+from dependencies.models import Component, NodeGroup, RefactoringProposal, AnalysisRun
 from dependencies.llm_service import RefactoringAnalyzer, AnalysisContext
 from dependencies.components.graph.graph import (
     find_sccs_tarjan,
@@ -28,6 +28,7 @@ from dependencies.components.graph.graph import (
     calculate_node_metrics,
     louvain_communities,
     get_high_coupling_services,
+    build_adjacency,
 )
 
 logger = logging.getLogger(__name__)
@@ -47,22 +48,6 @@ class RefactoringPipeline:
         self._proposal_counter += 1
         return f"{prefix}-{self._proposal_counter:03d}"
 
-    def build_adjacency(self) -> dict[str, set[str]]:
-        """Build adjacency list from database."""
-        adjacency: dict[str, set[str]] = {}
-
-        # Include all components
-        for component in Component.objects.all():
-            adjacency.setdefault(str(component.id), set())
-
-        # Add edges
-        for dep in Dependency.objects.select_related('source', 'target').all():
-            source_key = str(dep.source.id)
-            target_key = str(dep.target.id)
-            adjacency.setdefault(source_key, set()).add(target_key)
-
-        return adjacency
-
     def get_component_groups(self) -> dict[str, str]:
         """Get mapping of component IDs to their group names."""
         groups = {}
@@ -130,7 +115,7 @@ class RefactoringPipeline:
             return False
 
         # Must have actionable steps
-        if not result.steps or len(result.steps) == 0:
+        if not result.steps:
             return False
 
         # Type-specific validation
@@ -164,6 +149,7 @@ class RefactoringPipeline:
 
         logger.info(f"Found {len(cyclic_sccs)} SCCs with size >= {min_size}")
 
+        items = []
         for scc in cyclic_sccs:
             # Build context for this SCC
             scc_edges = [
@@ -180,14 +166,21 @@ class RefactoringPipeline:
                 existing_groups=scc_groups,
                 metrics=scc_metrics,
             )
+            items.append((scc, scc_edges, scc_metrics, context))
 
-            # Call LLM for analysis
-            if self.llm.is_available:
-                result = self.llm.analyze_scc(context)
-            else:
-                # Generate placeholder proposal without LLM
-                result = self._generate_placeholder_scc_result(scc, scc_edges)
+        # Call LLM for analysis (all SCCs concurrently)
+        if self.llm.is_available:
+            results = self.llm.analyze_batch(
+                self.llm.analyze_scc, [(context,) for *_, context in items]
+            )
+        else:
+            # Generate placeholder proposals without LLM
+            results = [
+                self._generate_placeholder_scc_result(scc, scc_edges)
+                for scc, scc_edges, _, _ in items
+            ]
 
+        for (scc, scc_edges, scc_metrics, _), result in zip(items, results):
             # Validate result
             if not self.validate_proposal('cycle_break', result, scc_metrics):
                 logger.warning(f"Invalid proposal for SCC: {scc}")
@@ -206,7 +199,7 @@ class RefactoringPipeline:
                 risk=risk,
                 summary=result.summary or f"Break cycle in {len(scc)} services",
                 root_cause=result.root_cause,
-                steps=result.steps or [],
+                steps=result.steps,
                 expected_improvement=result.expected_improvement,
                 scc_size_before=len(scc),
             )
@@ -222,6 +215,7 @@ class RefactoringPipeline:
 
         logger.info(f"Found {len(high_coupling)} high-coupling services")
 
+        items = []
         for service, service_metrics in high_coupling:
             # Only analyze services with high fan-in (many consumers)
             if service_metrics['fan_in'] < 3:
@@ -240,13 +234,21 @@ class RefactoringPipeline:
                 dependency_types=['API'],
                 metrics=service_metrics,
             )
+            items.append((service, service_metrics, downstream, context))
 
-            # Call LLM for analysis
-            if self.llm.is_available:
-                result = self.llm.analyze_api_stability(service, context)
-            else:
-                result = self._generate_placeholder_api_result(service, downstream)
+        # Call LLM for analysis (all services concurrently)
+        if self.llm.is_available:
+            results = self.llm.analyze_batch(
+                self.llm.analyze_api_stability,
+                [(service, context) for service, _, _, context in items],
+            )
+        else:
+            results = [
+                self._generate_placeholder_api_result(service, downstream)
+                for service, _, downstream, _ in items
+            ]
 
+        for (service, service_metrics, downstream, _), result in zip(items, results):
             # Validate result
             if not self.validate_proposal('api_stabilization', result, {service: service_metrics}):
                 logger.warning(f"Invalid API proposal for: {service}")
@@ -266,7 +268,7 @@ class RefactoringPipeline:
                 risk=risk,
                 summary=result.summary or f"Stabilize API for {service}",
                 root_cause='',
-                steps=result.steps or [],
+                steps=result.steps,
                 expected_improvement=result.expected_improvement,
                 fan_in_before=service_metrics['fan_in'],
                 fan_out_before=service_metrics['fan_out'],
@@ -282,6 +284,7 @@ class RefactoringPipeline:
         metrics = calculate_node_metrics(adjacency)
 
         # Filter to communities with potential issues (mixed domains)
+        items = []
         for community in communities:
             if len(community) < 3:
                 continue
@@ -314,13 +317,20 @@ class RefactoringPipeline:
                 service_names=community,
                 metrics={s: metrics.get(s, {}) for s in community},
             )
+            items.append((community, prefixes, context))
 
-            # Call LLM for analysis
-            if self.llm.is_available:
-                result = self.llm.analyze_boundaries(context)
-            else:
-                result = self._generate_placeholder_boundary_result(community, prefixes)
+        # Call LLM for analysis (all communities concurrently)
+        if self.llm.is_available:
+            results = self.llm.analyze_batch(
+                self.llm.analyze_boundaries, [(context,) for _, _, context in items]
+            )
+        else:
+            results = [
+                self._generate_placeholder_boundary_result(community, prefixes)
+                for community, prefixes, _ in items
+            ]
 
+        for (community, prefixes, _), result in zip(items, results):
             # Validate result
             community_metrics = {s: metrics.get(s, {}) for s in community}
             if not self.validate_proposal('boundary_redefinition', result, community_metrics):
@@ -338,8 +348,8 @@ class RefactoringPipeline:
                 impact=impact,
                 risk=risk,
                 summary=result.summary or f"Redefine boundaries for {len(community)} services",
-                root_cause='\n'.join(result.boundary_issues or []),
-                steps=result.steps or [],
+                root_cause='\n'.join(result.boundary_issues),
+                steps=result.steps,
                 expected_improvement=result.expected_improvement,
             )
 
@@ -437,7 +447,7 @@ class RefactoringPipeline:
 
         try:
             # Build graph
-            adjacency = self.build_adjacency()
+            adjacency = build_adjacency()
             logger.info(f"Built adjacency list with {len(adjacency)} nodes")
 
             # Compute SCCs
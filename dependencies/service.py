@@ -1,6 +1,9 @@
 import os
 import json
+import hashlib
 import logging
+import tempfile
+import threading
 import time
 import base64
 from dataclasses import dataclass, field
@@ -9,12 +12,60 @@ from typing import Iterator
 from urllib.parse import quote
 import httpx
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
 logger = logging.getLogger(__name__)
 
 # Default cache directory for SBOM files
 DEFAULT_SBOM_CACHE_DIR = os.environ.get('SBOM_CACHE_DIR', 'sbom_cache')
 DEFAULT_POM_CACHE_DIR = os.environ.get('POM_CACHE_DIR', 'pom_cache')
 
+# Times a Checkmarx request is retried after HTTP 429 Too Many Requests
+MAX_RATE_LIMIT_RETRIES = 3
+
+# Seconds to wait after a 429 response without a usable Retry-After header
+DEFAULT_RETRY_AFTER = 2.0
+
+# Suffix appended to cached SBOM files stored zstd-compressed
+ZSTD_SUFFIX = '.zst'
+
+# zstd level for cached SBOMs; CycloneDX JSON compresses well at low levels
+ZSTD_LEVEL = 3
+
+
+def read_cached_sbom(path) -> bytes:
+    """Read a cached SBOM file's JSON bytes, decompressing .zst files."""
+    path = Path(path)
+    if path.suffix != ZSTD_SUFFIX:
+        return path.read_bytes()
+    if not HAS_ZSTD:
+        raise OSError(f"zstandard is not installed, cannot read {path}")
+    try:
+        with open(path, 'rb') as f, zstandard.ZstdDecompressor().stream_reader(f) as reader:
+            return reader.read()
+    except zstandard.ZstdError as e:
+        raise OSError(f"Corrupt compressed SBOM {path}: {e}") from e
+
+
+def parse_sbom(content: bytes) -> dict:
+    """Parse SBOM JSON bytes, using orjson when available.
+
+    Raises json.JSONDecodeError on invalid JSON (orjson's error subclasses it).
+    """
+    if HAS_ORJSON:
+        return orjson.loads(content)
+    return json.loads(content)
+
 
 # =============================================================================
 # SonarQube Service
@@ -163,6 +214,45 @@ class SonarQubeService:
 # =============================================================================
 
 
+class TokenBucket:
+    """Thread-safe limiter on how often requests may start.
+
+    Tokens refill at `rate` per second up to `burst`; acquire() sleeps until
+    one is available. The server's RateLimit headers can slow the bucket down
+    further but never speed it up; with a rate of 0 only they apply.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self.burst = burst
+        self._next_free = 0.0  # time.monotonic() when the bucket is next full enough
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, sleeping until one is available."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_free - (self.burst - 1) * self.interval)
+            self._next_free = max(self._next_free, start) + self.interval
+        wait = start - now
+        if wait > 0:
+            logger.info(f"Throttling: waiting {wait:.1f}s")
+            time.sleep(wait)
+
+    def update_from_headers(self, headers):
+        """Hold back the next request as RateLimit-Remaining/-Reset ask."""
+        try:
+            remaining = int(headers['RateLimit-Remaining'])
+            reset = float(headers['RateLimit-Reset'])
+        except (KeyError, ValueError):
+            return
+
+        # Spread the remaining quota over the rest of the window
+        earliest = time.monotonic() + (reset if remaining <= 0 else reset / remaining)
+        with self._lock:
+            self._next_free = max(self._next_free, earliest)
+
+
 @dataclass
 class CheckmarxProject:
     """Project data from Checkmarx One API."""
@@ -192,6 +282,9 @@ class CheckmarxService:
 
     Optional:
     - cache_dir: Directory for caching SBOM files (default: .sbom_cache)
+    - cache_compression: 'zstd' or 'none' for newly cached SBOMs
+      (default: 'zstd' when zstandard is installed)
+    - force_reauth: Ignore an access token cached by an earlier run
     """
 
     def __init__(
@@ -204,15 +297,24 @@ class CheckmarxService:
         cache_dir: str | None = None,
         request_delay: float | None = None,
         export_delay: float | None = None,
+        cache_compression: str | None = None,
+        force_reauth: bool = False,
     ):
         self.base_url = (base_url or os.environ.get('CHECKMARX_BASE_URL', '')).rstrip('/')
         self.tenant = tenant or os.environ.get('CHECKMARX_TENANT', '')
         self.client_id = client_id or os.environ.get('CHECKMARX_CLIENT_ID', '')
         self.client_secret = client_secret or os.environ.get('CHECKMARX_CLIENT_SECRET', '')
         self.cache_dir = Path(cache_dir or DEFAULT_SBOM_CACHE_DIR)
+        self.cache_compression = cache_compression or ('zstd' if HAS_ZSTD else 'none')
+        if self.cache_compression == 'zstd' and not HAS_ZSTD:
+            raise ValueError("zstd cache compression requires the zstandard package")
         self._client: httpx.Client | None = None
         self._access_token: str | None = None
         self._token_expires_at: float = 0  # Unix timestamp when token expires
+        self._force_reauth = force_reauth
+        self._token_from_cache = False  # True until the cached token is replaced
+        # Serializes token refresh and client creation across export threads
+        self._auth_lock = threading.RLock()
 
         # Throttle delay between regular API requests (seconds)
         if request_delay is not None:
@@ -228,6 +330,10 @@ class CheckmarxService:
             env_delay = os.environ.get('CHECKMARX_EXPORT_DELAY', '')
             self.export_delay = float(env_delay) if env_delay else 10.0
 
+        # Delays are minimum gaps between request starts, shared by all threads
+        self._request_limiter = TokenBucket(1 / self.request_delay if self.request_delay > 0 else 0)
+        self._export_limiter = TokenBucket(1 / self.export_delay if self.export_delay > 0 else 0)
+
         # Use explicit IAM URL or derive from base URL
         if iam_url:
             self._iam_url = iam_url.rstrip('/')
@@ -242,11 +348,13 @@ class CheckmarxService:
     @property
     def client(self) -> httpx.Client:
         if self._client is None:
-            self._client = httpx.Client(
-                base_url=self.base_url,
-                timeout=30.0,
-            )
-            self._authenticate()
+            with self._auth_lock:
+                if self._client is None:
+                    self._client = httpx.Client(
+                        base_url=self.base_url,
+                        timeout=30.0,
+                    )
+                    self._ensure_valid_token()
         return self._client
 
     def _authenticate(self):
@@ -270,6 +378,7 @@ class CheckmarxService:
             response.raise_for_status()
             data = response.json()
             self._access_token = data.get('access_token')
+            self._token_from_cache = False
 
             # Store token expiration time (with 60 second buffer for safety)
             expires_in = data.get('expires_in', 300)  # Default 5 min if not provided
@@ -280,11 +389,71 @@ class CheckmarxService:
             logger.error(f"Checkmarx One authentication failed: {e}")
             raise
 
+        self._save_cached_token()
+
+    def _get_token_path(self) -> Path:
+        """Get the token cache file for this base URL, tenant and client."""
+        key = f'{self.base_url}\n{self.tenant}\n{self.client_id}'.encode()
+        # Not *.json, so the SBOM cache globs never pick it up
+        return self.cache_dir / f".{hashlib.sha1(key, usedforsecurity=False).hexdigest()[:16]}.token"
+
+    def _load_cached_token(self) -> bool:
+        """Reuse an unexpired access token saved by an earlier run."""
+        try:
+            with open(self._get_token_path()) as f:
+                data = json.load(f)
+            access_token, expires_at = data['access_token'], float(data['expires_at'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        if time.time() >= expires_at:
+            return False
+
+        self._access_token = access_token
+        self._token_expires_at = expires_at
+        self._token_from_cache = True
+        logger.info("Using cached Checkmarx One access token")
+        return True
+
+    def _save_cached_token(self):
+        """Save the access token for later runs, readable by the owner only."""
+        try:
+            self._ensure_cache_dir()
+            path = self._get_token_path()
+            # mkstemp creates the file 0600; replacing also resets an older, looser file
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=path.name, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump({'access_token': self._access_token, 'expires_at': self._token_expires_at}, f)
+                os.replace(tmp_path, path)
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+        except OSError as e:
+            logger.warning(f"Failed to cache Checkmarx One access token: {e}")
+
+    def _discard_cached_token(self):
+        """Delete the saved access token so later runs do not reuse it."""
+        try:
+            self._get_token_path().unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Failed to delete cached Checkmarx One access token: {e}")
+
     def _ensure_valid_token(self):
         """Check if token is valid, refresh if expired or about to expire."""
-        if not self._access_token or time.time() >= self._token_expires_at:
-            logger.info("Token expired or missing, re-authenticating...")
-            self._authenticate()
+        with self._auth_lock:
+            if not self._access_token and not self._force_reauth and self._load_cached_token():
+                return
+            if not self._access_token or time.time() >= self._token_expires_at:
+                logger.info("Token expired or missing, re-authenticating...")
+                self._authenticate()
+
+    def _replace_rejected_token(self, rejected: str):
+        """Re-authenticate after a 401, unless another thread already did."""
+        with self._auth_lock:
+            if self._access_token == rejected:
+                logger.info("Cached access token rejected, re-authenticating...")
+                self._discard_cached_token()
+                self._authenticate()
 
     def close(self):
         if self._client:
@@ -297,12 +466,9 @@ class CheckmarxService:
     def __exit__(self, *args):
         self.close()
 
-    def _throttle(self, delay: float | None = None):
+    def _throttle(self, export: bool = False):
         """Wait before making a request to avoid overloading the server."""
-        wait = delay if delay is not None else self.request_delay
-        if wait > 0:
-            logger.info(f"Throttling: waiting {wait}s")
-            time.sleep(wait)
+        (self._export_limiter if export else self._request_limiter).acquire()
 
     def _request(
         self,
@@ -310,43 +476,67 @@ class CheckmarxService:
         endpoint: str,
         params: dict | None = None,
         json_data: dict | None = None,
-        delay: float | None = None,
+        export: bool = False,
     ) -> dict | list:
         """Make authenticated request to Checkmarx One API."""
         # Ensure token is valid (refresh if expired)
         self._ensure_valid_token()
 
         # Wait before making request
-        self._throttle(delay)
-
-        headers = {
-            'Authorization': f'Bearer {self._access_token}',
-        }
+        self._throttle(export)
 
         endpoint = endpoint.lstrip('/')
         url = f"{self.base_url}/{endpoint}"
 
         logger.info(f"Request: {method} {url}")
 
-        response = httpx.request(
-            method,
-            url,
-            params=params,
-            json=json_data,
-            headers=headers,
-            timeout=30.0,
-        )
+        attempt = 0
+        while True:
+            with self._auth_lock:
+                token, token_from_cache = self._access_token, self._token_from_cache
+            response = httpx.request(
+                method,
+                url,
+                params=params,
+                json=json_data,
+                headers={'Authorization': f'Bearer {token}'},
+                timeout=30.0,
+            )
+            self._request_limiter.update_from_headers(response.headers)
+
+            # A cached token may have been revoked: authenticate and retry once
+            if response.status_code == 401 and token_from_cache:
+                self._replace_rejected_token(token)
+                continue
+
+            if response.status_code != 429 or attempt == MAX_RATE_LIMIT_RETRIES:
+                break
+            attempt += 1
+
+            # Rate limited: wait as long as the server asks, then retry
+            wait = self._retry_after(response)
+            logger.info(f"Rate limited, retrying in {wait}s")
+            time.sleep(wait)
+
         response.raise_for_status()
 
         return response.json()
 
-    def _get(self, endpoint: str, params: dict | None = None, delay: float | None = None) -> dict | list:
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> float:
+        """Seconds to wait from a 429 response's Retry-After header."""
+        try:
+            return max(0.0, float(response.headers['Retry-After']))
+        except (KeyError, ValueError):
+            return DEFAULT_RETRY_AFTER
+
+    def _get(self, endpoint: str, params: dict | None = None, export: bool = False) -> dict | list:
         """Make authenticated GET request."""
-        return self._request('GET', endpoint, params=params, delay=delay)
+        return self._request('GET', endpoint, params=params, export=export)
 
-    def _post(self, endpoint: str, json_data: dict | None = None, delay: float | None = None) -> dict | list:
+    def _post(self, endpoint: str, json_data: dict | None = None, export: bool = False) -> dict | list:
         """Make authenticated POST request."""
-        return self._request('POST', endpoint, json_data=json_data, delay=delay)
+        return self._request('POST', endpoint, json_data=json_data, export=export)
 
     def get_projects(self) -> Iterator[CheckmarxProject]:
         """Fetch all projects from Checkmarx One with pagination."""
@@ -389,11 +579,26 @@ class CheckmarxService:
         data = self._get('api/scans', {'project-id': project_id})
         return data if isinstance(data, list) else data.get('scans', [])
 
-    def _get_cache_path(self, scan_id: str) -> Path:
-        """Get the cache file path for a scan's SBOM."""
+    def _get_cache_path(self, scan_id: str, compressed: bool | None = None) -> Path:
+        """Get the cache file path for a scan's SBOM.
+
+        Compressed paths end in .json.zst; by default the service's
+        cache_compression setting decides which path is returned.
+        """
+        if compressed is None:
+            compressed = self.cache_compression == 'zstd'
         # Sanitize scan_id for safe filenames (alphanumeric, hyphen, underscore only)
         safe_id = ''.join(c if c.isalnum() or c in '-_' else '_' for c in scan_id)
-        return self.cache_dir / f"{safe_id}.json"
+        suffix = '.json' + ZSTD_SUFFIX if compressed else '.json'
+        return self.cache_dir / f"{safe_id}{suffix}"
+
+    def _find_cached_sbom(self, scan_id: str) -> Path | None:
+        """Get the path of a scan's cached SBOM in either format, if any."""
+        for compressed in (False, True) if HAS_ZSTD else (False,):
+            cache_path = self._get_cache_path(scan_id, compressed)
+            if cache_path.exists():
+                return cache_path
+        return None
 
     def _ensure_cache_dir(self):
         """Ensure the cache directory exists."""
@@ -408,24 +613,29 @@ class CheckmarxService:
         Returns:
             Parsed SBOM dict if cached, None otherwise
         """
-        cache_path = self._get_cache_path(scan_id)
-        if cache_path.exists():
+        cache_path = self._find_cached_sbom(scan_id)
+        if cache_path:
             try:
-                with open(cache_path) as f:
-                    return json.load(f)
+                return parse_sbom(read_cached_sbom(cache_path))
             except (json.JSONDecodeError, OSError) as e:
                 logger.warning(f"Failed to read cached SBOM for {scan_id}: {e}")
         return None
 
     def is_sbom_cached(self, scan_id: str) -> bool:
         """Check if SBOM is already cached for a scan."""
-        return self._get_cache_path(scan_id).exists()
+        return self._find_cached_sbom(scan_id) is not None
 
     def list_cached_scans(self) -> list[str]:
         """List all scan IDs that have cached SBOMs."""
         if not self.cache_dir.exists():
             return []
-        return [p.stem for p in self.cache_dir.glob('*.json')]
+        scan_ids = [p.stem for p in self.cache_dir.glob('*.json')]
+        if HAS_ZSTD:
+            scan_ids += [
+                p.name[:-len('.json' + ZSTD_SUFFIX)]
+                for p in self.cache_dir.glob('*.json' + ZSTD_SUFFIX)
+            ]
+        return list(dict.fromkeys(scan_ids))
 
     def export_sbom(
         self,
@@ -440,7 +650,8 @@ class CheckmarxService:
 
         Args:
             scan_id: The scan ID to export SBOM for
-            output_path: Local file path to save the SBOM JSON (default: cache directory)
+            output_path: Local file path to save the SBOM JSON (default: cache directory);
+                paths ending in .zst are written zstd-compressed
             hide_dev_dependencies: Whether to exclude dev/test dependencies
             poll_interval: Seconds between status checks
             max_wait: Maximum seconds to wait for export completion
@@ -457,14 +668,17 @@ class CheckmarxService:
 
         self._ensure_cache_dir()
 
-        # Use cache path if no output path specified
+        # Use cache path if no output path specified; either format counts as cached
         if output_path is None:
             output_path = str(self._get_cache_path(scan_id))
+            cached_path = self._find_cached_sbom(scan_id)
+        else:
+            cached_path = Path(output_path) if Path(output_path).exists() else None
 
         # Check cache first
-        if use_cache and Path(output_path).exists():
+        if use_cache and cached_path:
             logger.info(f"Using cached SBOM for scan {scan_id}")
-            return output_path
+            return str(cached_path)
 
         # Request SBOM export via Export Service API (use export_delay for this expensive operation)
         export_response = self._post('api/sca/export/requests', {
@@ -473,7 +687,7 @@ class CheckmarxService:
             'ExportParameters': {
                 'hideDevAndTestDependencies': hide_dev_dependencies,
             },
-        }, delay=self.export_delay)
+        }, export=True)
         export_id = export_response['exportId']
         logger.info(f"SBOM export requested, exportId: {export_id}")
 
@@ -490,7 +704,7 @@ class CheckmarxService:
 
                 # Download the SBOM file (Checkmarx One requires auth)
                 self._ensure_valid_token()  # Refresh token if expired during polling
-                self._throttle(self.export_delay)
+                self._throttle(export=True)
                 logger.info(f"Downloading SBOM from {file_url}")
                 download_response = httpx.get(
                     file_url,
@@ -500,8 +714,15 @@ class CheckmarxService:
                 download_response.raise_for_status()
 
                 # Save to local file (cache)
+                content = download_response.content
+                if output_path.endswith(ZSTD_SUFFIX):
+                    content = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(content)
                 with open(output_path, 'wb') as f:
-                    f.write(download_response.content)
+                    f.write(content)
+
+                # A re-export replaces a copy cached in the other format
+                if cached_path and str(cached_path) != output_path and cached_path.parent == self.cache_dir:
+                    cached_path.unlink(missing_ok=True)
 
                 logger.info(f"Cached SBOM to file: {output_path}")
                 return output_path
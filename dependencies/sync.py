@@ -1,15 +1,38 @@
+import hashlib
+import json
 import logging
+import os
 import re
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
+from django.db import connection
 from django.utils import timezone
 from .models import Component, Dependency, NodeGroup, SonarProject, CheckmarxProject, GitProject
-from .service import SonarQubeService, CheckmarxService
+from .service import SonarQubeService, CheckmarxService, HAS_ZSTD, ZSTD_SUFFIX, parse_sbom, read_cached_sbom
 
 logger = logging.getLogger(__name__)
 
 # Separators to detect groups in project keys (order matters - check most specific first)
 GROUP_SEPARATORS = [':', '/', '.']
 
+# Rows per INSERT/UPDATE when writing synced Checkmarx data
+WRITE_BATCH_SIZE = 10000
+
+# Rows fetched per round trip when loading local Checkmarx projects
+READ_CHUNK_SIZE = 2000
+
+# CheckmarxProject columns overwritten when a project is synced again
+CHECKMARX_PROJECT_UPDATE_FIELDS = ['name', 'created_at', 'tags', 'synced_at']
+
+# Cached SBOM count from which the offline import parses files in worker processes
+PARALLEL_SBOM_MIN_FILES = 8
+
+# Files queued per worker process during a parallel offline import; bounds how
+# many parsed SBOM sections wait in memory to be yielded in order
+PARALLEL_SBOM_PENDING_PER_WORKER = 2
+
 
 def extract_group_from_key(key: str) -> tuple[str | None, str]:
     """
@@ -176,16 +199,32 @@ def sync_dependencies(service: SonarQubeService | None = None) -> int:
 # =============================================================================
 
 
-def sync_checkmarx_projects(service: CheckmarxService | None = None) -> int:
+def sync_checkmarx_projects(
+    service: CheckmarxService | None = None,
+    batch_size: int = WRITE_BATCH_SIZE,
+) -> int:
     """Synchronize all projects from Checkmarx SCA to local database.
 
     Creates CheckmarxProject records. Components are created later when
     processing SBOMs which contain the actual artifact information.
+    Projects are upserted `batch_size` at a time.
     """
     if service is None:
         service = CheckmarxService()
 
     synced = 0
+    # Keyed by Checkmarx id so a project seen twice is written once per batch
+    pending: dict[str, CheckmarxProject] = {}
+
+    def flush():
+        CheckmarxProject.objects.bulk_create(
+            pending.values(),
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['checkmarx_id'],
+            update_fields=CHECKMARX_PROJECT_UPDATE_FIELDS,
+        )
+        pending.clear()
 
     with service:
         for cx_project in service.get_projects():
@@ -198,90 +237,142 @@ def sync_checkmarx_projects(service: CheckmarxService | None = None) -> int:
                 except ValueError:
                     pass
 
-            CheckmarxProject.objects.update_or_create(
+            pending[cx_project.id] = CheckmarxProject(
                 checkmarx_id=cx_project.id,
-                defaults={
-                    'name': cx_project.name,
-                    'created_at': created_at,
-                    'tags': cx_project.tags or {},
-                }
+                name=cx_project.name,
+                created_at=created_at,
+                tags=cx_project.tags or {},
             )
             synced += 1
             logger.info(f"Synced Checkmarx project: {cx_project.name}")
 
+            if len(pending) >= batch_size:
+                flush()
+
+    if pending:
+        flush()
+
     return synced
 
 
 def export_checkmarx_sboms(
     service: CheckmarxService,
     on_progress: callable = None,
+    concurrency: int = 1,
+    force: bool = False,
+    on_error: callable = None,
 ) -> dict:
-    """Export SBOMs for all Checkmarx projects sequentially.
+    """Export SBOMs for all Checkmarx projects.
 
-    Processes one project at a time:
+    Walks the projects one at a time:
     1. Fetch project
     2. Get scans for project
     3. Export SBOM if not cached
     4. Move to next project
 
-    All request throttling is handled by the service's request_delay setting.
-    HTTP errors will propagate and stop processing immediately.
+    The cache is keyed by scan ID, so a project rescanned since its last
+    export has a new latest scan and is exported again; unchanged projects
+    are skipped unless `force` is set.
+
+    Exports spend most of their time waiting on the server, so up to
+    `concurrency` of them run at once on worker threads while the walk
+    continues. Requests from all workers share the service's rate limits.
+    A failed export is passed to `on_error` and the walk continues; without
+    `on_error` the error propagates and stops processing.
 
     Args:
         service: CheckmarxService instance
         on_progress: Optional callback(exported, skipped, processed) for progress updates
+        concurrency: Maximum number of SBOM exports in flight (default: 1)
+        force: Re-export SBOMs that are already cached
+        on_error: Optional callback(project, exception) for failed exports
 
     Returns:
-        dict with 'exported', 'skipped' counts
+        dict with 'exported', 'skipped', 'failed' counts
     """
-    result = {'exported': 0, 'skipped': 0}
+    result = {'exported': 0, 'skipped': 0, 'failed': 0}
     processed = 0
 
-    # Process projects one at a time using the generator
-    for cx_project in service.get_projects():
-        processed += 1
-        logger.info(f"Processing project {processed}: {cx_project.name}")
-
-        # Get latest scan for this project
-        scans = service.get_scans(cx_project.id)
-        if not scans:
-            logger.info(f"  No scans found for {cx_project.name}")
-            if on_progress:
-                on_progress(result['exported'], result['skipped'], processed)
-            continue
+    def report():
+        if on_progress:
+            on_progress(result['exported'], result['skipped'], processed)
 
-        scan_id = scans[0].get('id') or scans[0].get('scanId')
-        if not scan_id:
-            logger.info(f"  No scan ID found for {cx_project.name}")
-            if on_progress:
-                on_progress(result['exported'], result['skipped'], processed)
-            continue
+    def collect(futures):
+        # Callbacks run here, on the walking thread, never on the workers
+        for future in futures:
+            cx_project, scan_id, error = future.result()
+            if error:
+                result['failed'] += 1
+                logger.warning(f"  SBOM export failed for {cx_project.name} (scan: {scan_id}): {error}")
+                on_error(cx_project, error)
+            else:
+                result['exported'] += 1
+                logger.info(f"  Exported SBOM (scan: {scan_id})")
+            report()
 
-        # Check if already cached
-        if service.is_sbom_cached(scan_id):
-            result['skipped'] += 1
-            logger.info(f"  SBOM already cached (scan: {scan_id})")
-        else:
+    def export(cx_project, scan_id):
+        try:
             service.export_sbom(scan_id, use_cache=False)
-            result['exported'] += 1
-            logger.info(f"  Exported SBOM (scan: {scan_id})")
+        except Exception as e:
+            if on_error is None:
+                raise
+            return cx_project, scan_id, e
+        return cx_project, scan_id, None
 
-        if on_progress:
-            on_progress(result['exported'], result['skipped'], processed)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = set()
+
+        # Walk projects one at a time using the generator
+        for cx_project in service.get_projects():
+            processed += 1
+            logger.info(f"Processing project {processed}: {cx_project.name}")
+
+            # Get latest scan for this project
+            scans = service.get_scans(cx_project.id)
+            if not scans:
+                logger.info(f"  No scans found for {cx_project.name}")
+                report()
+                continue
+
+            scan_id = scans[0].get('id') or scans[0].get('scanId')
+            if not scan_id:
+                logger.info(f"  No scan ID found for {cx_project.name}")
+                report()
+                continue
+
+            # Check if already cached
+            if not force and service.is_sbom_cached(scan_id):
+                result['skipped'] += 1
+                logger.info(f"  SBOM already cached (scan: {scan_id})")
+                report()
+                continue
 
-    logger.info(f"Completed: {result['exported']} exported, {result['skipped']} cached")
+            pending.add(executor.submit(export, cx_project, scan_id))
+
+            # Wait for a free slot before walking further
+            if len(pending) >= concurrency:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+
+        collect(pending)
+
+    logger.info(
+        f"Completed: {result['exported']} exported, {result['skipped']} cached, {result['failed']} failed"
+    )
     return result
 
 
 def sync_checkmarx_dependencies(
     service: CheckmarxService | None = None,
     use_cached_only: bool = False,
+    batch_size: int = WRITE_BATCH_SIZE,
 ) -> int:
     """Synchronize dependencies from Checkmarx SCA for all local projects.
 
     Args:
         service: CheckmarxService instance
         use_cached_only: If True, only process projects with cached SBOMs
+        batch_size: Rows per INSERT/UPDATE when writing a project's dependencies
 
     Returns:
         Number of dependencies synced
@@ -290,8 +381,9 @@ def sync_checkmarx_dependencies(
         service = CheckmarxService()
 
     synced = 0
-    # Get all Checkmarx projects
-    cx_projects = {cp.checkmarx_id: cp for cp in CheckmarxProject.objects.all()}
+    # Get all Checkmarx projects, with their components in the same query
+    projects = CheckmarxProject.objects.select_related('component')
+    cx_projects = {cp.checkmarx_id: cp for cp in projects.iterator(chunk_size=READ_CHUNK_SIZE)}
     components_cache: dict[str, Component] = {}
 
     with service:
@@ -325,6 +417,8 @@ def sync_checkmarx_dependencies(
 
             source_component = cx_proj.component
 
+            # Scope per target; a package listed twice keeps its last entry
+            scopes: dict = {}
             for dep in service.get_dependencies_from_sbom(scan_id, cx_project.id):
                 # Get or create component for the package
                 package_key = f"pkg:{dep.package_name}"
@@ -341,20 +435,58 @@ def sync_checkmarx_dependencies(
                 else:
                     target = components_cache[package_key]
 
-                Dependency.objects.update_or_create(
-                    source=source_component,
-                    target=target,
-                    defaults={
-                        'scope': 'direct' if dep.is_direct else 'transitive',
-                        'weight': 1,
-                    }
-                )
+                scopes[target.pk] = 'direct' if dep.is_direct else 'transitive'
                 synced += 1
                 logger.info(f"Synced Checkmarx dependency: {source_component.name} -> {target.name}")
 
+            _save_dependencies(source_component, scopes, batch_size)
+
     return synced
 
 
+def _save_dependencies(source: Component, scopes: dict, batch_size: int):
+    """Create or update the dependencies of `source` on the targets in `scopes`.
+
+    Existing rows are read in one query, then new ones are bulk created and
+    changed ones bulk updated.
+    """
+    existing = {dep.target_id: dep for dep in Dependency.objects.filter(source=source)}
+    to_create, to_update = [], []
+    for target_id, scope in scopes.items():
+        dep = existing.get(target_id)
+        if dep is None:
+            to_create.append(Dependency(source=source, target_id=target_id, scope=scope, weight=1))
+        elif dep.scope != scope or dep.weight != 1:
+            dep.scope, dep.weight = scope, 1
+            to_update.append(dep)
+
+    Dependency.objects.bulk_create(to_create, batch_size=batch_size)
+    _update_dependency_scopes(to_update, batch_size)
+
+
+def _update_dependency_scopes(deps: list, batch_size: int):
+    """Write the scope and weight of existing dependencies.
+
+    bulk_update builds a CASE WHEN per row and column. PostgreSQL instead
+    gets one UPDATE joined against a VALUES list per batch.
+    """
+    if connection.vendor != 'postgresql':
+        Dependency.objects.bulk_update(deps, ['scope', 'weight'], batch_size=batch_size)
+        return
+
+    quote = connection.ops.quote_name
+    table = quote(Dependency._meta.db_table)
+    with connection.cursor() as cursor:
+        for start in range(0, len(deps), batch_size):
+            batch = deps[start:start + batch_size]
+            values = ', '.join(['(%s, %s, %s)'] * len(batch))
+            cursor.execute(
+                f'UPDATE {table} AS d SET {quote("scope")} = v.scope, {quote("weight")} = v.weight '
+                f'FROM (VALUES {values}) AS v(id, scope, weight) WHERE d.{quote("id")} = v.id',
+                [value for dep in batch for value in (dep.pk, dep.scope, dep.weight)],
+            )
+
+
 def parse_purl(purl: str) -> dict:
     """Parse a purl into its components.
 
@@ -504,25 +636,80 @@ def get_or_create_group_hierarchy(group_key: str, groups_cache: dict) -> 'NodeGr
     return groups_cache[group_key]
 
 
+def _load_sbom_section(path, section: str, skip_digests=frozenset()) -> tuple[bytes, list | None] | None:
+    """Read a cached SBOM file and return its content digest and `section` list.
+
+    Only the requested part of the SBOM is returned, so little is pickled back
+    from worker processes. The list is None when the digest is in
+    skip_digests; None is returned instead of a tuple if the file is unreadable.
+    """
+    try:
+        content = read_cached_sbom(path)
+        digest = hashlib.sha1(content, usedforsecurity=False).digest()
+        if digest in skip_digests:
+            return digest, None
+        return digest, parse_sbom(content).get(section, [])
+    except (json.JSONDecodeError, OSError) as e:
+        logger.warning(f"Failed to read {path}: {e}")
+        return None
+
+
+def _iter_sbom_sections(sbom_files: list, section: str, parallelism: int = None, skip_digests=frozenset()):
+    """Yield (path, _load_sbom_section result) for each file, in order.
+
+    With at least PARALLEL_SBOM_MIN_FILES files and more than one worker the
+    files are parsed in worker processes; skip_digests only applies serially.
+    """
+    done = 0
+    workers = min(parallelism or os.cpu_count() or 1, len(sbom_files))
+    if len(sbom_files) >= PARALLEL_SBOM_MIN_FILES and workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # executor.map would submit every file up front and hold each
+                # result until it is read, so keep a bounded window instead
+                queued = iter(sbom_files)
+                pending = deque()
+                for sbom_file in queued:
+                    pending.append(executor.submit(_load_sbom_section, sbom_file, section))
+                    if len(pending) >= workers * PARALLEL_SBOM_PENDING_PER_WORKER:
+                        break
+                while pending:
+                    loaded = pending.popleft().result()
+                    yield sbom_files[done], loaded
+                    done += 1
+                    sbom_file = next(queued, None)
+                    if sbom_file is not None:
+                        pending.append(executor.submit(_load_sbom_section, sbom_file, section))
+        except (OSError, BrokenProcessPool) as e:
+            # Fall back to the serial path for the files not yet yielded
+            logger.warning(f"SBOM worker processes failed, parsing serially: {e}")
+
+    for sbom_file in sbom_files[done:]:
+        yield sbom_file, _load_sbom_section(sbom_file, section, skip_digests)
+
+
 def import_from_cached_sboms(
     cache_dir,
     internal_prefix: str = None,
     on_progress: callable = None,
+    parallelism: int = None,
 ) -> dict:
     """Import components and dependencies from cached SBOM JSON files.
 
     This is a fully offline operation - no HTTP requests are made.
-    Components and dependencies are extracted directly from CycloneDX JSON files.
+    Components and dependencies are extracted directly from CycloneDX JSON files,
+    plain (.json) or zstd-compressed (.json.zst).
+    Files with byte-identical content (re-scans, forks) are only imported once.
 
     Args:
         cache_dir: Path to directory containing cached SBOM JSON files
         internal_prefix: Purl prefix for internal packages (e.g., "pkg:maven/fi.company")
         on_progress: Optional callback(components_count, dependencies_count)
+        parallelism: Worker processes parsing SBOM files (None = CPU count, 1 = serial)
 
     Returns:
         dict with 'projects' (components) and 'dependencies' counts
     """
-    import json
     from pathlib import Path
 
     cache_path = Path(cache_dir)
@@ -539,17 +726,29 @@ def import_from_cached_sboms(
     # Track bom-ref -> version-less key mapping for dependency resolution
     bomref_to_key: dict[str, str] = {}
 
+    # SHA-1 of each SBOM content seen, and the files the second pass reads
+    seen_digests: set[bytes] = set()
+    sbom_files = []
+
+    cached_files = list(cache_path.glob('*.json'))
+    if HAS_ZSTD:
+        cached_files += cache_path.glob('*.json' + ZSTD_SUFFIX)
+
+    logger.info(f"Importing {len(cached_files)} cached SBOMs: parallelism={parallelism or os.cpu_count()} cores={os.cpu_count()}")
+
     # First pass: create all components from all SBOM files
-    for sbom_file in cache_path.glob('*.json'):
-        try:
-            with open(sbom_file) as f:
-                sbom = json.load(f)
-        except (json.JSONDecodeError, OSError) as e:
-            logger.warning(f"Failed to read {sbom_file}: {e}")
+    for sbom_file, loaded in _iter_sbom_sections(cached_files, 'components', parallelism, seen_digests):
+        if loaded is None:
             continue
+        digest, sbom_components = loaded
+        if digest in seen_digests:
+            logger.debug(f"Skipping {sbom_file}: same content as an earlier SBOM")
+            continue
+        seen_digests.add(digest)
+        sbom_files.append(sbom_file)
 
         # Create components for all SBOM components
-        for sbom_component in sbom.get('components', []):
+        for sbom_component in sbom_components:
             bom_ref = sbom_component.get('bom-ref', '')
             if not bom_ref:
                 continue
@@ -621,15 +820,12 @@ def import_from_cached_sboms(
             components_cache[purl_key] = component
 
     # Second pass: create dependencies from the dependencies array
-    for sbom_file in cache_path.glob('*.json'):
-        try:
-            with open(sbom_file) as f:
-                sbom = json.load(f)
-        except (json.JSONDecodeError, OSError) as e:
+    for sbom_file, loaded in _iter_sbom_sections(sbom_files, 'dependencies', parallelism):
+        if loaded is None:
             continue
 
         # Process dependencies array (each entry has ref and dependsOn)
-        for dep_entry in sbom.get('dependencies', []):
+        for dep_entry in loaded[1]:
             source_ref = dep_entry.get('ref', '')
             depends_on = dep_entry.get('dependsOn', [])
 
@@ -0,0 +1,268 @@
+"""
+Tests for the analyze_graph, compute_metrics, topo_sort and analyze_refactoring
+management commands.
+"""
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from dependencies.models import (
+    AnalysisRun, Component, Dependency, LayerAssignment, LayerDefinition, LayerViolation,
+    NodeMetrics,
+)
+from dependencies.components.graph.graph import build_adjacency
+
+
+@pytest.fixture
+def graph():
+    """Cycle a -> b -> c -> a, plus c -> d and an isolated node e."""
+    components = {key: Component.objects.create(key=key, name=key) for key in 'abcde'}
+    for source, target in [('a', 'b'), ('b', 'c'), ('c', 'a'), ('c', 'd')]:
+        Dependency.objects.create(source=components[source], target=components[target])
+    return components
+
+
+def run(command, *args):
+    out = StringIO()
+    call_command(command, *args, stdout=out)
+    return out.getvalue()
+
+
+@pytest.mark.django_db
+class TestAnalyzeGraph:
+    """Tests for the analyze_graph command."""
+
+    def test_build_adjacency(self, graph):
+        """Test that edges and isolated components are both in the adjacency."""
+        ids = {key: str(c.id) for key, c in graph.items()}
+
+        adjacency = build_adjacency()
+
+        assert adjacency[ids['c']] == {ids['a'], ids['d']}
+        assert adjacency[ids['e']] == set()
+        assert len(adjacency) == 5
+
+    def test_json_summary(self, graph):
+        """Test that the graph is loaded with every component and edge."""
+        output = json.loads(run('analyze_graph', '--scc', '--metrics', '--output', 'json'))
+
+        assert output['total_projects'] == 5
+        assert output['total_dependencies'] == 4
+        assert output['scc']['cyclic_sccs'] == 1
+        assert output['scc']['largest_cycle_size'] == 3
+        assert output['metrics']['total_nodes'] == 5
+        assert 'all_metrics' not in output['metrics']
+
+    def test_json_written_in_chunks(self, graph, monkeypatch):
+        """Test that chunked JSON output matches a single json.dumps."""
+        from dependencies.management import output
+
+        full = run('analyze_graph', '--scc', '--output', 'json')
+        monkeypatch.setattr(output, 'JSON_WRITE_CHUNK_SIZE', 16)
+
+        assert run('analyze_graph', '--scc', '--output', 'json') == full
+        assert full == json.dumps(json.loads(full), indent=2) + '\n'
+
+    def test_save_upserts_node_metrics(self, graph):
+        """Test that repeated saves update metrics rows in place."""
+        run('analyze_graph', '--metrics', '--save')
+        Dependency.objects.create(source=graph['e'], target=graph['a'])
+        run('analyze_graph', '--metrics', '--save')
+
+        assert NodeMetrics.objects.count() == 5
+        latest_run = AnalysisRun.objects.order_by('-pk').first()
+        metrics = NodeMetrics.objects.get(component=graph['e'])
+        assert metrics.fan_out == 1
+        assert metrics.analysis_run == latest_run
+
+    def test_save_query_count_independent_of_graph_size(self, graph):
+        """Test that saving metrics does not issue per-component queries."""
+        with CaptureQueriesContext(connection) as small:
+            run('analyze_graph', '--metrics', '--save')
+
+        extra = [Component.objects.create(key=f"x{i}", name=f"x{i}") for i in range(10)]
+        for source, target in zip(extra, extra[1:]):
+            Dependency.objects.create(source=source, target=target)
+
+        with CaptureQueriesContext(connection) as large:
+            run('analyze_graph', '--metrics', '--save')
+
+        assert len(large) == len(small)
+
+    def test_failed_metrics_write_rolls_back_run(self, graph, monkeypatch):
+        """Test that no analysis run is left behind when saving metrics fails."""
+        def fail(*args, **kwargs):
+            raise RuntimeError('write failed')
+
+        monkeypatch.setattr(NodeMetrics.objects, 'bulk_create', fail)
+
+        with pytest.raises(RuntimeError):
+            run('analyze_graph', '--metrics', '--save')
+
+        assert not AnalysisRun.objects.exists()
+
+    def test_sampled_betweenness(self, graph):
+        """Test that --betweenness-k runs the approximate metrics."""
+        output = json.loads(run('analyze_graph', '--metrics', '--betweenness-k', '2', '--output', 'json'))
+
+        assert len(output['metrics']['high_betweenness']) == 5
+
+    def test_layer_violations(self, graph):
+        """Test that assignments are read by component id and layer level."""
+        infra = LayerDefinition.objects.create(name='infra', level=0)
+        app = LayerDefinition.objects.create(name='app', level=1)
+        LayerAssignment.objects.create(component=graph['c'], layer=infra)
+        LayerAssignment.objects.create(component=graph['a'], layer=app)
+
+        output = json.loads(run('analyze_graph', '--layers', '--output', 'json'))
+
+        assert output['layers']['assigned_projects'] == 2
+        assert [(v['source'], v['target']) for v in output['layers']['violations']] == [
+            (str(graph['c'].id), str(graph['a'].id)),
+        ]
+
+    def test_layers_unconfigured_skips_graph_work(self, graph, monkeypatch):
+        """Test that no topological layering runs when nothing is assigned."""
+        from dependencies.components.graph import graph as graph_module
+        from dependencies.management.commands import analyze_graph
+
+        def fail(*args, **kwargs):
+            raise AssertionError('layers computed')
+
+        monkeypatch.setattr(graph_module, 'assign_topological_layers', fail)
+        monkeypatch.setattr(analyze_graph, 'detect_layer_violations', fail)
+
+        output = json.loads(run('analyze_graph', '--layers', '--output', 'json'))
+
+        assert output['layers']['configured'] is False
+
+    def test_clusters_largest_first(self, graph):
+        """Test that cluster summaries are ranked by size and cover every node."""
+        clusters = json.loads(run('analyze_graph', '--clusters', '--output', 'json'))['clusters']
+
+        sizes = [c['size'] for c in clusters['clusters']]
+        assert sum(clusters['cluster_sizes']) == 5
+        assert sizes == clusters['cluster_sizes'][:5]
+        assert [c['id'] for c in clusters['clusters']] == list(range(len(sizes)))
+
+
+@pytest.mark.django_db
+class TestComputeMetrics:
+    """Tests for the compute_metrics command."""
+
+    def test_json_sorted_by_fan_in(self, graph):
+        """Test that the top nodes come back sorted by the requested metric."""
+        output = json.loads(run('compute_metrics', '--sort-by', 'fan_in', '--top', '2', '--output', 'json'))
+
+        nodes = output['metrics']
+        assert len(nodes) == 2
+        assert nodes[0]['fan_in'] == 1
+        assert str(graph['e'].id) not in [n['node'] for n in nodes]
+
+    def test_top_by_fan_out(self, graph):
+        """Test that the node with the most outgoing edges ranks first."""
+        output = json.loads(run('compute_metrics', '--sort-by', 'fan_out', '--top', '1', '--output', 'json'))
+
+        assert [n['node'] for n in output['metrics']] == [str(graph['c'].id)]
+
+    def test_save(self, graph):
+        """Test that --save writes one metrics row per component."""
+        output = run('compute_metrics', '--save')
+
+        assert 'Saved metrics for 5 components' in output
+        assert NodeMetrics.objects.filter(analysis_run__isnull=False).count() == 5
+        analysis_run = AnalysisRun.objects.get()
+        assert analysis_run.status == 'completed'
+        assert analysis_run.completed_at is not None
+
+    def test_save_single_project(self, graph):
+        """Test that --project --save writes only that component's metrics."""
+        run('compute_metrics', '--project', str(graph['c'].id), '--save')
+
+        assert list(NodeMetrics.objects.values_list('component_id', flat=True)) == [graph['c'].id]
+
+    def test_yaml_output(self, graph):
+        """Test that buffered YAML output has one line per field and a trailing newline."""
+        output = run('compute_metrics', '--project', str(graph['c'].id), '--output', 'yaml')
+
+        assert output.splitlines()[:5] == [
+            'sorted_by: instability',
+            'metrics:',
+            f"  - node: {graph['c'].id}",
+            '    fan_in: 1',
+            '    fan_out: 2',
+        ]
+        assert output.endswith('\n') and not output.endswith('\n\n')
+
+    @pytest.mark.parametrize('args, workers', [([], 3), (['--workers', '1'], 1), (['--workers', '0'], 1)])
+    def test_workers(self, graph, monkeypatch, args, workers):
+        """Test that the command asks for CPU-count workers unless --workers is given."""
+        from dependencies.management.commands import compute_metrics
+        calls = []
+
+        def calculate(adjacency, **kwargs):
+            calls.append(kwargs['workers'])
+            return {}
+
+        monkeypatch.setattr(compute_metrics.os, 'cpu_count', lambda: 3)
+        monkeypatch.setattr(compute_metrics, 'calculate_all_metrics', calculate)
+        run('compute_metrics', *args)
+
+        assert calls == [workers]
+
+    def test_negative_workers_rejected(self, graph):
+        """Test that a negative --workers is reported instead of computed."""
+        err = StringIO()
+        call_command('compute_metrics', '--workers', '-1', stdout=StringIO(), stderr=err)
+
+        assert '--workers must not be negative' in err.getvalue()
+        assert not NodeMetrics.objects.exists()
+
+
+@pytest.mark.django_db
+class TestTopoSort:
+    """Tests for the topo_sort command."""
+
+    def test_save_violations(self, graph):
+        """Test that violations are saved against component and layer ids."""
+        infra = LayerDefinition.objects.create(name='infra', level=0)
+        app = LayerDefinition.objects.create(name='app', level=1)
+        LayerAssignment.objects.create(component=graph['c'], layer=infra)
+        LayerAssignment.objects.create(component=graph['a'], layer=app)
+
+        output = run('topo_sort', '--check-violations', '--save')
+
+        assert 'Saved 1 violations' in output
+        violation = LayerViolation.objects.get()
+        assert (violation.source_component, violation.target_component) == (graph['c'], graph['a'])
+        assert (violation.source_layer, violation.target_layer) == (infra, app)
+        assert violation.analysis_run.total_projects == 5
+
+
+@pytest.mark.django_db
+class TestAnalyzeRefactoring:
+    """Tests for the analyze_refactoring command summary."""
+
+    @pytest.fixture(autouse=True)
+    def no_llm(self, monkeypatch):
+        """Generate placeholder proposals without calling the API."""
+        monkeypatch.delenv('ANTHROPIC_API_KEY', raising=False)
+
+    def test_summary_uses_type_labels(self, graph):
+        """Test that proposals are listed with their display type."""
+        output = run('analyze_refactoring', '--scc-only')
+
+        assert '[CYC-001] Cycle Breaking: ' in output
+
+    def test_summary_is_limited(self, graph, monkeypatch):
+        """Test that only PROPOSAL_SUMMARY_LIMIT proposals are listed."""
+        from dependencies.management.commands import analyze_refactoring
+        monkeypatch.setattr(analyze_refactoring, 'PROPOSAL_SUMMARY_LIMIT', 0)
+
+        output = run('analyze_refactoring', '--scc-only')
+
+        assert '[CYC-001]' not in output
+        assert '... and 1 more' in output
@@ -15,7 +15,9 @@ from dependencies.components.graph.graph import (
     louvain_communities,
     get_cycle_edges,
     enumerate_cycles,
+    GraphContext,
 )
+from dependencies.components.graph import graph as graph_module
 
 
 class TestTraverseGraph:
@@ -122,6 +124,23 @@ class TestTopologicalSort:
         assert is_dag is True
         assert back_edges == []
 
+    def test_ties_broken_by_node_id(self):
+        """Test that ready nodes are emitted in sorted order."""
+        adjacency = {'c': {'a'}, 'b': set(), 'd': {'a'}, 'a': set()}
+
+        ordering, is_dag, back_edges = topological_sort(adjacency)
+
+        assert ordering == ['b', 'c', 'd', 'a']
+
+    def test_back_edges_between_unsorted_nodes(self):
+        """Test that back edges join nodes left unsorted by a cycle."""
+        adjacency = {'X': {'A'}, 'A': {'B'}, 'B': {'A', 'Y'}, 'Y': set()}
+
+        ordering, is_dag, back_edges = topological_sort(adjacency)
+
+        assert ordering == ['X']
+        assert sorted(back_edges) == [('A', 'B'), ('B', 'A'), ('B', 'Y')]
+
 
 class TestAssignTopologicalLayers:
     """Tests for assign_topological_layers function."""
@@ -244,6 +263,52 @@ class TestCalculateBetweennessCentrality:
         assert centrality['B'] > centrality['A']
         assert centrality['C'] > centrality['D']
 
+    def test_parallel_matches_serial(self, cyclic_adjacency, monkeypatch):
+        """Test that the multi-process path gives the same scores."""
+        from dependencies.components.graph import graph
+
+        serial = calculate_betweenness_centrality(cyclic_adjacency)
+
+        monkeypatch.setattr(graph, 'PARALLEL_CENTRALITY_MIN_NODES', 1)
+        parallel = calculate_betweenness_centrality(cyclic_adjacency, workers=2)
+
+        assert parallel == pytest.approx(serial)
+
+    def test_serial_by_default(self, cyclic_adjacency, monkeypatch):
+        """Test that the default and workers=1 never start a process pool."""
+        from dependencies.components.graph import graph
+
+        def no_pool(*args, **kwargs):
+            raise AssertionError('process pool started')
+
+        monkeypatch.setattr(graph, 'PARALLEL_CENTRALITY_MIN_NODES', 1)
+        monkeypatch.setattr(graph, 'ProcessPoolExecutor', no_pool)
+
+        centrality = calculate_betweenness_centrality(cyclic_adjacency)
+
+        assert centrality == calculate_betweenness_centrality(cyclic_adjacency, workers=1)
+
+    def test_sample_covering_all_nodes_is_exact(self, cyclic_adjacency):
+        """Test that k >= node count falls back to the exact computation."""
+        exact = calculate_betweenness_centrality(cyclic_adjacency)
+        sampled = calculate_betweenness_centrality(cyclic_adjacency, k=100)
+
+        assert sampled == exact
+
+    def test_sample_scaled_and_reproducible(self):
+        """Test that sampled scores are scaled by n/k and repeatable with a seed."""
+        # In a directed ring every source contributes the same total, so the
+        # scaled sample sum matches the exact sum
+        nodes = [f"N{i}" for i in range(7)]
+        adjacency = {node: {nodes[(i + 1) % 7]} for i, node in enumerate(nodes)}
+
+        first = calculate_betweenness_centrality(adjacency, k=3, seed=1)
+        second = calculate_betweenness_centrality(adjacency, k=3, seed=1)
+        exact = calculate_betweenness_centrality(adjacency)
+
+        assert first == second
+        assert sum(first.values()) == pytest.approx(sum(exact.values()))
+
 
 class TestCalculateAllMetrics:
     """Tests for calculate_all_metrics function."""
@@ -268,6 +333,19 @@ class TestCalculateAllMetrics:
         all_nodes = {'A', 'B', 'C', 'D', 'E', 'F'}
         assert set(metrics.keys()) == all_nodes
 
+    def test_empty_graph(self):
+        """Test that an empty graph has no metrics."""
+        assert calculate_all_metrics({}) == {}
+
+    def test_two_node_graph(self):
+        """Test that a tiny graph still gets full metrics."""
+        metrics = calculate_all_metrics({'A': {'B'}})
+
+        assert metrics['A']['fan_out'] == 1
+        assert metrics['B']['fan_in'] == 1
+        assert metrics['A']['betweenness_centrality'] == 0.0
+        assert metrics['B']['layer_depth'] == 1
+
 
 class TestFindSccsKosaraju:
     """Tests for find_sccs_kosaraju function."""
@@ -293,6 +371,21 @@ class TestFindSccsKosaraju:
         found_cycle = any(cycle_nodes.issubset(set(scc)) for scc in sccs)
         assert found_cycle
 
+    def test_sccs_in_topological_order(self):
+        """Test that every edge points to the same or a later SCC."""
+        adjacency = {
+            'A': {'B'}, 'B': {'C'}, 'C': {'B', 'D'},
+            'D': {'E'}, 'E': {'D'}, 'F': {'A'},
+        }
+
+        sccs = find_sccs_kosaraju(adjacency)
+
+        assert sorted(sorted(scc) for scc in sccs) == [['A'], ['B', 'C'], ['D', 'E'], ['F']]
+        position = {node: i for i, scc in enumerate(sccs) for node in scc}
+        for source, targets in adjacency.items():
+            for target in targets:
+                assert position[source] <= position[target]
+
 
 class TestLouvainCommunities:
     """Tests for louvain_communities function."""
@@ -416,6 +509,15 @@ class TestGetCycleEdges:
         cycle_edges = get_cycle_edges({})
         assert len(cycle_edges) == 0
 
+    def test_deep_cycle_detected(self):
+        """Test that a cycle deeper than the recursion limit is detected."""
+        n = 5000
+        adjacency = {f'N{i}': {f'N{(i + 1) % n}'} for i in range(n)}
+
+        cycle_edges = get_cycle_edges(adjacency, timeout=10.0)
+
+        assert len(cycle_edges) == n
+
 
 class TestEnumerateCycles:
     """Tests for enumerate_cycles function."""
@@ -503,3 +605,31 @@ class TestEnumerateCycles:
         # Cycles should be sorted by length
         for i in range(1, len(cycles)):
             assert len(cycles[i]) >= len(cycles[i-1])
+
+
+class TestGraphContext:
+    """Tests for GraphContext memoization."""
+
+    def test_metrics_reuse_topological_passes(self, sample_adjacency, monkeypatch):
+        """Test that metrics reuse the context's topological sort and layers."""
+        calls = []
+        original = graph_module.topological_sort
+
+        def counting_sort(adjacency, timeout=None):
+            calls.append(adjacency)
+            return original(adjacency, timeout)
+
+        monkeypatch.setattr(graph_module, 'topological_sort', counting_sort)
+        ctx = GraphContext(sample_adjacency)
+
+        ordering, is_dag, _ = ctx.topo_sort
+        metrics = ctx.metrics
+
+        assert len(calls) == 1
+        assert ctx.metrics is metrics
+        assert metrics['A']['topological_order'] == ordering.index('A')
+        assert metrics['F']['layer_depth'] == ctx.layers['F']
+
+    def test_matches_standalone_metrics(self, cyclic_adjacency):
+        """Test that context metrics equal calculate_all_metrics output."""
+        assert GraphContext(cyclic_adjacency).metrics == calculate_all_metrics(cyclic_adjacency)
@@ -0,0 +1,274 @@
+"""
+Tests for LLM response parsing in dependencies/llm_service.py
+"""
+import pytest
+from dependencies import llm_service
+from dependencies.llm_service import AnalysisContext, RefactoringAnalyzer, RefactoringResult
+
+
+@pytest.fixture(autouse=True)
+def llm_cache(settings):
+    """Use an in-memory LLM cache instead of the on-disk one."""
+    settings.CACHES = {
+        **settings.CACHES,
+        'llm': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'llm-tests'},
+    }
+    from django.core.cache import caches
+    caches['llm'].clear()
+    yield caches['llm']
+    caches['llm'].clear()
+
+
+@pytest.fixture
+def analyzer():
+    """Analyzer without an API key (no network access)."""
+    return RefactoringAnalyzer(api_key='')
+
+
+class TestDataclasses:
+    """Tests for AnalysisContext and RefactoringResult defaults."""
+
+    def test_result_defaults_are_empty_lists(self):
+        """Test that list fields default to fresh, unshared empty lists."""
+        first, second = RefactoringResult(), RefactoringResult()
+        first.steps.append('Extract interface')
+
+        assert second.steps == []
+        assert first.boundary_issues == []
+
+    def test_minimal_context_prompts(self, analyzer, monkeypatch):
+        """Test that a context with only services and edges builds every prompt."""
+        monkeypatch.setattr(analyzer, '_call_llm', lambda prompt: '')
+        context = AnalysisContext(services=['a'], edges=[])
+
+        analyzer.analyze_scc(context)
+        analyzer.analyze_extraction('a', context)
+        analyzer.analyze_api_stability('a', context)
+        analyzer.analyze_boundaries(context)
+
+        assert context.metrics == {}
+        assert not hasattr(context, '__dict__')
+
+
+class TestParseListItems:
+    """Tests for RefactoringAnalyzer._parse_list_items."""
+
+    def test_bullet_items(self, analyzer):
+        """Test that dash and star bullets are extracted."""
+        items = analyzer._parse_list_items("- first\n* second\nplain text")
+        assert items == ['first', 'second']
+
+    def test_numbered_items(self, analyzer):
+        """Test that numbered items lose their prefix."""
+        items = analyzer._parse_list_items("1. Extract interface\n  12.   Move module  \n3.No space")
+        assert items == ['Extract interface', 'Move module', 'No space']
+
+    def test_empty_text(self, analyzer):
+        """Test that empty text yields no items."""
+        assert analyzer._parse_list_items('') == []
+
+
+class TestParseMarkdownSections:
+    """Tests for RefactoringAnalyzer._parse_markdown_sections."""
+
+    def test_sections_keyed_by_header(self, analyzer):
+        """Test that level 2 and 3 headers become normalized section keys."""
+        text = (
+            "Preamble\n"
+            "## Root Cause Analysis\n"
+            "Shared model package.\n"
+            "### Step-by-Step Refactoring Plan\n"
+            "1. Extract\n"
+            "2. Invert\n"
+        )
+
+        sections = analyzer._parse_markdown_sections(text)
+
+        assert sections['intro'] == 'Preamble'
+        assert sections['root_cause_analysis'] == 'Shared model package.'
+        assert sections['step-by-step_refactoring_plan'] == '1. Extract\n2. Invert'
+
+    def test_deeper_headers_stay_in_body(self, analyzer):
+        """Test that level 4 headers are not treated as section breaks."""
+        sections = analyzer._parse_markdown_sections("## Summary\n#### Detail\ntext")
+        assert sections['summary'] == '#### Detail\ntext'
+
+
+class FakeStream:
+    """Minimal stand-in for the anthropic MessageStream context manager."""
+
+    def __init__(self, chunks):
+        self.text_stream = iter(chunks)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeMessages:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.calls = []
+
+    def stream(self, **kwargs):
+        self.calls.append(kwargs)
+        return FakeStream(self.chunks)
+
+
+class FakeClient:
+    def __init__(self, chunks):
+        self.messages = FakeMessages(chunks)
+
+
+class TestCallLlm:
+    """Tests for RefactoringAnalyzer._call_llm."""
+
+    def test_joins_streamed_chunks(self, monkeypatch):
+        """Test that streamed text chunks are joined into the response."""
+        monkeypatch.setattr('dependencies.llm_service.HAS_ANTHROPIC', True)
+        analyzer = RefactoringAnalyzer(api_key='test-key')
+        analyzer._client = FakeClient(['## Summary\n', 'Split ', 'the cycle'])
+
+        assert analyzer._call_llm('prompt') == '## Summary\nSplit the cycle'
+
+    def test_unavailable_returns_empty(self, analyzer):
+        """Test that no API key yields an empty response."""
+        assert analyzer._call_llm('prompt') == ''
+
+    def test_identical_prompt_served_from_cache(self, monkeypatch):
+        """Test that a repeated prompt does not call the API again."""
+        monkeypatch.setattr('dependencies.llm_service.HAS_ANTHROPIC', True)
+        analyzer = RefactoringAnalyzer(api_key='test-key')
+        analyzer._client = FakeClient(['cached answer'])
+
+        assert analyzer._call_llm('same prompt') == 'cached answer'
+        assert analyzer._call_llm('same prompt') == 'cached answer'
+        assert len(analyzer._client.messages.calls) == 1
+
+        analyzer._call_llm('other prompt')
+        assert len(analyzer._client.messages.calls) == 2
+
+    def test_cache_disabled(self, monkeypatch):
+        """Test that use_cache=False always calls the API."""
+        monkeypatch.setattr('dependencies.llm_service.HAS_ANTHROPIC', True)
+        analyzer = RefactoringAnalyzer(api_key='test-key', use_cache=False)
+        analyzer._client = FakeClient(['answer'])
+
+        analyzer._call_llm('prompt')
+        analyzer._call_llm('prompt')
+        assert len(analyzer._client.messages.calls) == 2
+
+
+class TestSharedClient:
+    """Tests for the shared Anthropic client."""
+
+    @pytest.fixture
+    def fake_anthropic(self, monkeypatch):
+        from types import SimpleNamespace
+        monkeypatch.setattr(llm_service, 'HAS_ANTHROPIC', True)
+        monkeypatch.setattr(llm_service, 'anthropic', SimpleNamespace(
+            Anthropic=lambda api_key: SimpleNamespace(api_key=api_key),
+        ), raising=False)
+        monkeypatch.setattr(llm_service, '_clients', {})
+
+    def test_analyzers_share_client(self, fake_anthropic):
+        """Test that analyzers with the same key reuse one client."""
+        first = RefactoringAnalyzer(api_key='key-a').client
+        second = RefactoringAnalyzer(api_key='key-a').client
+        assert first is second
+
+    def test_client_per_api_key(self, fake_anthropic):
+        """Test that different keys get different clients."""
+        client_a = RefactoringAnalyzer(api_key='key-a').client
+        client_b = RefactoringAnalyzer(api_key='key-b').client
+        assert client_a is not client_b
+        assert client_b.api_key == 'key-b'
+
+
+class TestAnalyzeBatch:
+    """Tests for RefactoringAnalyzer.analyze_batch."""
+
+    def test_results_keep_call_order(self, analyzer):
+        """Test that concurrent results come back in input order."""
+        import time
+
+        def analyze(name, delay):
+            time.sleep(delay)
+            return name
+
+        calls = [('slow', 0.05), ('fast', 0.0), ('medium', 0.02)]
+        assert analyzer.analyze_batch(analyze, calls) == ['slow', 'fast', 'medium']
+
+    def test_empty_batch(self, analyzer):
+        """Test that an empty batch makes no calls."""
+        assert analyzer.analyze_batch(analyzer.analyze_scc, []) == []
+
+
+class TestPromptDeterminism:
+    """Tests that equal contexts produce identical prompts."""
+
+    def capture_prompt(self, analyzer, monkeypatch, analyze, *args):
+        prompts = []
+        monkeypatch.setattr(analyzer, '_call_llm', lambda prompt: prompts.append(prompt) or '')
+        analyze(*args)
+        return prompts[0]
+
+    def test_scc_prompt_ignores_input_order(self, analyzer, monkeypatch):
+        """Test that service and edge order do not change the SCC prompt."""
+        first = AnalysisContext(
+            services=['b', 'a', 'c'],
+            edges=[('a', 'b'), ('b', 'c'), ('c', 'a')],
+            shared_concepts=['Order', 'Customer'],
+            existing_groups=['sales'],
+        )
+        second = AnalysisContext(
+            services=['c', 'a', 'b'],
+            edges=[('c', 'a'), ('a', 'b'), ('b', 'c')],
+            shared_concepts=['Customer', 'Order'],
+            existing_groups=['sales'],
+        )
+
+        assert (
+            self.capture_prompt(analyzer, monkeypatch, analyzer.analyze_scc, first)
+            == self.capture_prompt(analyzer, monkeypatch, analyzer.analyze_scc, second)
+        )
+
+    def test_boundary_prompt_sorts_dict_keys(self, analyzer, monkeypatch):
+        """Test that edge density dicts are serialized with sorted keys."""
+        context = AnalysisContext(
+            services=['x:a', 'y:b'],
+            edges=[],
+            internal_vs_external_edges={'ratio': 0.5, 'external': 2, 'internal': 1},
+        )
+
+        prompt = self.capture_prompt(analyzer, monkeypatch, analyzer.analyze_boundaries, context)
+
+        assert prompt.index('"external"') < prompt.index('"internal"') < prompt.index('"ratio"')
+
+    def test_json_fallback_matches_orjson(self, monkeypatch):
+        """Test that the stdlib fallback serializes prompt values the same way."""
+        pytest.importorskip('orjson')
+        value = {'ratio': 0.5, 'services': ['b', 'a'], 'edges': [['a', 'b']]}
+
+        fast = llm_service._to_json(value)
+        monkeypatch.setattr(llm_service, 'HAS_ORJSON', False)
+
+        assert llm_service._to_json(value) == fast
+
+
+class TestPromptTemplates:
+    """Tests for the module-level prompt templates."""
+
+    @pytest.mark.parametrize('template, fields', [
+        (llm_service.SCC_PROMPT, {'services', 'edges', 'shared_concepts', 'existing_groups'}),
+        (llm_service.EXTRACTION_PROMPT, {'service_name', 'internal_clusters', 'external_dependencies', 'fan_in', 'fan_out'}),
+        (llm_service.API_STABILITY_PROMPT, {'service_name', 'consumers', 'dependency_types', 'fan_in', 'fan_out'}),
+        (llm_service.BOUNDARY_PROMPT, {'services', 'edge_density', 'naming_patterns'}),
+    ])
+    def test_template_fields(self, template, fields):
+        """Test that each template has exactly the placeholders its method fills."""
+        import string
+        names = {name for _, name, _, _ in string.Formatter().parse(template) if name}
+        assert names == fields
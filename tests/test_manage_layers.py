@@ -0,0 +1,309 @@
+"""
+Tests for the manage_layers management command.
+"""
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from dependencies.models import Component, LayerAssignment, LayerDefinition
+
+
+@pytest.fixture
+def layers():
+    """Two layers with patterns and three components, one assigned to each layer."""
+    infra = LayerDefinition.objects.create(name='infra', level=0, pattern='^infra:')
+    domain = LayerDefinition.objects.create(name='domain', level=1, pattern='^domain:')
+    components = {
+        key: Component.objects.create(key=key, name=key)
+        for key in ['infra:db', 'domain:user', 'app:web']
+    }
+    LayerAssignment.objects.create(component=components['infra:db'], layer=infra)
+    LayerAssignment.objects.create(component=components['domain:user'], layer=domain)
+    return {'infra': infra, 'domain': domain, **components}
+
+
+def run(*args):
+    out = StringIO()
+    call_command('manage_layers', *args, stdout=out)
+    return out.getvalue()
+
+
+class TestDispatch:
+    """Tests for action dispatch."""
+
+    def test_every_action_has_a_handler(self):
+        """Test that each action maps to a method of the command."""
+        from dependencies.management.commands.manage_layers import Command
+
+        for action, handler_name in Command.ACTION_HANDLERS.items():
+            assert callable(getattr(Command, handler_name)), action
+
+    def test_missing_action(self):
+        """Test that the available actions are listed when none is given."""
+        out = StringIO()
+        call_command('manage_layers', stdout=out)
+
+        assert 'list, create, delete, assign, unassign, auto-assign, show' in out.getvalue()
+
+
+@pytest.mark.django_db
+class TestList:
+    """Tests for the list action."""
+
+    def test_lists_layers_with_counts(self, layers):
+        """Test that each layer is listed with its assignment count."""
+        LayerDefinition.objects.create(name='app', level=2)
+
+        output = run('list')
+
+        assert output.index('Level 0: infra') < output.index('Level 1: domain') < output.index('Level 2: app')
+        assert output.count('Assigned projects: 1') == 2
+        assert output.count('Assigned projects: 0') == 1
+
+    def test_single_query(self, layers):
+        """Test that listing does not issue a count query per layer."""
+        with CaptureQueriesContext(connection) as queries:
+            run('list')
+
+        assert len(queries) == 1
+
+    def test_no_layers(self, db):
+        """Test the message shown when no layers exist."""
+        assert 'No layers defined' in run('list')
+
+
+@pytest.mark.django_db
+class TestCreateDelete:
+    """Tests for the create and delete actions."""
+
+    def test_create(self, db):
+        """Test that a new layer is created with its options."""
+        output = run('create', 'app', '2', '--pattern', '^app:')
+
+        assert "Created layer 'app' at level 2" in output
+        assert LayerDefinition.objects.get(name='app').pattern == '^app:'
+
+    def test_create_existing(self, layers):
+        """Test that an existing layer is reported and left unchanged."""
+        output = run('create', 'infra', '5')
+
+        assert "Layer 'infra' already exists" in output
+        assert LayerDefinition.objects.get(name='infra').level == 0
+
+    def test_create_invalid_pattern(self, db):
+        """Test that an invalid regex is rejected."""
+        assert 'Invalid regex pattern' in run('create', 'app', '2', '--pattern', '(')
+        assert not LayerDefinition.objects.exists()
+
+    def test_delete_reports_assignments(self, layers):
+        """Test that deleting a layer reports its cascaded assignments."""
+        output = run('delete', 'infra')
+
+        assert "Layer 'infra' had 1 assignments" in output
+        assert "Deleted layer 'infra'" in output
+        assert not LayerAssignment.objects.filter(component=layers['infra:db']).exists()
+
+    def test_delete_missing(self, db):
+        """Test the error shown for an unknown layer."""
+        assert "Layer 'missing' not found" in run('delete', 'missing')
+
+
+@pytest.mark.django_db
+class TestAutoAssign:
+    """Tests for the auto-assign action."""
+
+    def test_assigns_by_pattern(self, layers):
+        """Test that matching components are assigned and earlier auto-assignments updated."""
+        new = Component.objects.create(key='infra:cache', name='cache')
+        LayerAssignment.objects.create(component=new, layer=layers['domain'], auto_assigned=True)
+
+        output = run('auto-assign')
+
+        assert 'Auto-assigned 1 components' in output
+        assignment = LayerAssignment.objects.get(component=new)
+        assert assignment.layer == layers['infra']
+        assert assignment.auto_assigned is True
+
+    def test_reassignment_updates_timestamp(self, layers):
+        """Test that a re-matched auto-assignment gets a new assigned_at."""
+        new = Component.objects.create(key='infra:cache', name='cache')
+        LayerAssignment.objects.create(component=new, layer=layers['domain'], auto_assigned=True)
+        old = timezone.now() - timedelta(days=1)
+        LayerAssignment.objects.filter(component=new).update(assigned_at=old)
+
+        run('auto-assign')
+
+        assert LayerAssignment.objects.get(component=new).assigned_at > old
+
+    def test_manual_assignments_kept(self, layers):
+        """Test that manually assigned components are not reassigned."""
+        LayerAssignment.objects.filter(component=layers['infra:db']).update(layer=layers['domain'])
+
+        run('auto-assign')
+
+        assert LayerAssignment.objects.get(component=layers['infra:db']).layer == layers['domain']
+        assert LayerAssignment.objects.count() == 2
+
+    def test_first_matching_level_wins(self, layers):
+        """Test that overlapping patterns resolve to the lowest level."""
+        LayerDefinition.objects.create(name='catch-all', level=2, pattern='.*')
+        cache = Component.objects.create(key='infra:cache', name='cache')
+
+        run('auto-assign')
+
+        assert LayerAssignment.objects.get(component=cache).layer == layers['infra']
+        assert LayerAssignment.objects.get(component=layers['app:web']).layer.name == 'catch-all'
+
+    def test_patterns_with_groups(self, layers):
+        """Test that patterns with their own groups or flags still match."""
+        LayerDefinition.objects.create(name='app', level=2, pattern='(?i)^(APP):(web)$')
+
+        run('auto-assign')
+
+        assert LayerAssignment.objects.get(component=layers['app:web']).layer.name == 'app'
+
+    def test_no_patterns(self, db):
+        """Test that nothing is read when no layer has a pattern."""
+        LayerDefinition.objects.create(name='plain', level=0)
+
+        with CaptureQueriesContext(connection) as queries:
+            output = run('auto-assign')
+
+        assert 'No layers with patterns defined' in output
+        assert len([q for q in queries if q['sql'].startswith('SELECT')]) == 1
+
+    def test_dry_run(self, layers):
+        """Test that a dry run lists matches without saving them."""
+        Component.objects.create(key='domain:order', name='order')
+
+        output = run('auto-assign', '--dry-run')
+
+        assert 'order -> domain' in output
+        assert LayerAssignment.objects.count() == 2
+
+    def test_query_count_independent_of_components(self, layers):
+        """Test that auto-assign does not query per component."""
+        with CaptureQueriesContext(connection) as small:
+            run('auto-assign', '--dry-run')
+
+        for i in range(5):
+            Component.objects.create(key=f'app:svc{i}', name=f'svc{i}')
+
+        with CaptureQueriesContext(connection) as large:
+            run('auto-assign', '--dry-run')
+
+        assert len(large) == len(small)
+
+
+@pytest.mark.django_db
+class TestAssign:
+    """Tests for the assign and unassign actions."""
+
+    def test_assign_by_maven_coordinates(self, layers):
+        """Test that a groupId:artifactId key resolves the component."""
+        component = Component.objects.create(
+            key='com.acme:billing', name='billing', maven_group_id='com.acme', artifact_id='billing'
+        )
+
+        output = run('assign', 'com.acme:billing', 'domain')
+
+        assert "Assigned 'billing' to layer 'domain'" in output
+        assert LayerAssignment.objects.get(component=component).layer == layers['domain']
+
+    def test_assign_by_id_and_name(self, layers):
+        """Test that UUID and name keys resolve the component."""
+        run('assign', str(layers['app:web'].id), 'infra')
+        output = run('assign', 'app:web', 'domain')
+
+        assert "Updated 'app:web' to layer 'domain'" in output
+        assert LayerAssignment.objects.get(component=layers['app:web']).layer == layers['domain']
+
+    def test_coordinates_take_precedence_over_name(self, layers):
+        """Test that a Maven coordinate match wins over a component with that name."""
+        by_name = Component.objects.create(key='named', name='com.acme:billing')
+        by_coordinates = Component.objects.create(
+            key='com.acme:billing', name='billing', maven_group_id='com.acme', artifact_id='billing'
+        )
+
+        run('assign', 'com.acme:billing', 'infra')
+
+        assert LayerAssignment.objects.get(component=by_coordinates).layer == layers['infra']
+        assert not LayerAssignment.objects.filter(component=by_name).exists()
+
+    def test_reassign_clears_auto_flag(self, layers):
+        """Test that assigning an auto-assigned component makes it manual."""
+        LayerAssignment.objects.create(component=layers['app:web'], layer=layers['infra'], auto_assigned=True)
+
+        output = run('assign', 'app:web', 'domain')
+
+        assert "Updated 'app:web' to layer 'domain'" in output
+        assignment = LayerAssignment.objects.get(component=layers['app:web'])
+        assert (assignment.layer, assignment.auto_assigned) == (layers['domain'], False)
+
+    def test_reassign_updates_timestamp(self, layers):
+        """Test that a manual reassignment gets a new assigned_at."""
+        old = timezone.now() - timedelta(days=1)
+        LayerAssignment.objects.filter(component=layers['infra:db']).update(assigned_at=old)
+
+        run('assign', 'infra:db', 'domain')
+
+        assert LayerAssignment.objects.get(component=layers['infra:db']).assigned_at > old
+
+    def test_assign_unknown_component(self, layers):
+        """Test the error shown for an unknown component key."""
+        assert "Component 'missing' not found" in run('assign', 'missing', 'infra')
+
+    def test_unassign(self, layers):
+        """Test that unassign removes the component's assignment in one lookup."""
+        with CaptureQueriesContext(connection) as queries:
+            output = run('unassign', 'infra:db')
+
+        assert "Removed layer assignment for 'infra:db'" in output
+        assert not LayerAssignment.objects.filter(component=layers['infra:db']).exists()
+        assert len([q for q in queries if q['sql'].startswith('SELECT')]) == 1
+
+    def test_unassign_by_maven_coordinates(self, layers):
+        """Test that unassign resolves Maven coordinates on the component."""
+        component = Component.objects.create(
+            key='com.acme:billing', name='billing', maven_group_id='com.acme', artifact_id='billing'
+        )
+        LayerAssignment.objects.create(component=component, layer=layers['domain'])
+
+        assert "Removed layer assignment for 'billing'" in run('unassign', 'com.acme:billing')
+
+
+@pytest.mark.django_db
+class TestShow:
+    """Tests for the show action."""
+
+    def test_grouped_by_layer(self, layers):
+        """Test that assignments are listed under their layer in level order."""
+        LayerAssignment.objects.create(component=layers['app:web'], layer=layers['infra'], auto_assigned=True)
+
+        lines = run('show').splitlines()
+
+        assert lines[lines.index('  [0] infra:') + 1:lines.index('  [0] infra:') + 3] == [
+            '    - app:web (auto)',
+            '    - infra:db',
+        ]
+        assert lines[-2:] == ['  [1] domain:', '    - domain:user']
+
+    def test_layers_sharing_a_level(self, layers):
+        """Test that two layers on the same level each get one header."""
+        shared = LayerDefinition.objects.create(name='shared', level=0)
+        for key in ['a', 'b']:
+            component = Component.objects.create(key=key, name=key)
+            LayerAssignment.objects.create(component=component, layer=shared if key == 'b' else layers['infra'])
+
+        output = run('show')
+
+        assert output.count('[0] infra:') == 1
+        assert output.count('[0] shared:') == 1
+
+    def test_no_assignments(self, db):
+        """Test the message shown when nothing is assigned."""
+        assert 'No layer assignments' in run('show')
@@ -0,0 +1,224 @@
+"""
+Tests for the refactoring backlog component in dependencies/components/refactoring/refactoring.py
+"""
+import json
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from dependencies.models import AnalysisRun, RefactoringProposal
+from dependencies.components.refactoring.refactoring import RefactoringBacklog
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start each test with an empty cache."""
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def create_proposals(run, count, start=0):
+    """Create `count` proposals attached to `run`."""
+    for i in range(start, start + count):
+        RefactoringProposal.objects.create(
+            proposal_id=f"ARC-{i:03d}",
+            analysis_run=run,
+            proposal_type='cycle_break',
+            summary=f"Proposal {i}",
+            scope=['a', 'b'],
+            steps=['Step one', 'Step two'],
+        )
+
+
+def render_list(**filters):
+    """Build the backlog context and render every proposal row attribute."""
+    context = RefactoringBacklog().get_context_data(**filters)
+    for proposal in context["proposals"]:
+        proposal.get_proposal_type_display()
+        proposal.get_status_display()
+        proposal.status_badge_class
+        proposal.impact_badge_class
+        proposal.risk_badge_class
+        len(proposal.scope)
+    return context
+
+
+@pytest.mark.django_db
+class TestRefactoringBacklogContext:
+    """Tests for RefactoringBacklog.get_context_data."""
+
+    def test_counts_per_type(self):
+        """Test that per-type counts and total come from the database."""
+        run = AnalysisRun.objects.create()
+        create_proposals(run, 3)
+        RefactoringProposal.objects.create(
+            proposal_id="ARC-900", proposal_type='api_stabilization', summary="API",
+        )
+
+        context = render_list()
+
+        counts = {ptype: count for ptype, _, count in context["proposal_types"]}
+        assert counts['cycle_break'] == 3
+        assert counts['api_stabilization'] == 1
+        assert counts['service_extraction'] == 0
+        assert context["total_count"] == 4
+
+    def test_query_count_independent_of_list_size(self):
+        """Test that rendering the list does not issue per-row queries."""
+        run = AnalysisRun.objects.create()
+        create_proposals(run, 1)
+        render_list()  # Warm the latest-run cache
+
+        with CaptureQueriesContext(connection) as small:
+            render_list()
+
+        create_proposals(run, 20, start=1)
+
+        with CaptureQueriesContext(connection) as large:
+            context = render_list()
+
+        assert len(context["proposals"]) == 21
+        assert len(large) == len(small)
+
+    def test_latest_run_cached(self):
+        """Test that the latest run is shown and then served from the cache."""
+        AnalysisRun.objects.create(total_projects=1)
+        latest = AnalysisRun.objects.create(total_projects=2)
+
+        assert render_list()["latest_run"].pk == latest.pk
+        with CaptureQueriesContext(connection) as queries:
+            context = render_list()
+        assert context["latest_run"].pk == latest.pk
+        assert not any('dependencies_analysisrun' in q['sql'] for q in queries)
+
+
+@pytest.mark.django_db
+class TestRefactoringBacklogDetail:
+    """Tests for RefactoringBacklog._render_detail."""
+
+    def test_detail_lists_steps_and_collapses_scope(self):
+        """Test that steps are numbered and long scopes are collapsed."""
+        proposal = RefactoringProposal.objects.create(
+            proposal_id="ARC-100",
+            proposal_type='cycle_break',
+            summary="Break the cycle",
+            scope=[f"svc-{i}" for i in range(12)],
+            steps=['Extract interface', 'Invert dependency'],
+            fan_in_before=2.5,
+        )
+
+        html = RefactoringBacklog._render_detail(proposal)
+
+        assert '1. Extract interface' in html
+        assert '2. Invert dependency' in html
+        assert 'svc-9' in html
+        assert 'svc-10' not in html
+        assert '+2 more' in html
+        assert 'Fan-in: 2.5' in html
+
+    def test_detail_escapes_llm_text(self):
+        """Test that LLM-generated text is HTML-escaped."""
+        proposal = RefactoringProposal.objects.create(
+            proposal_id="ARC-101",
+            proposal_type='cycle_break',
+            summary="<script>alert(1)</script>",
+            steps=['<b>bold</b>'],
+        )
+
+        html = RefactoringBacklog._render_detail(proposal)
+
+        assert '<script>' not in html
+        assert '&lt;b&gt;bold&lt;/b&gt;' in html
+
+    def test_detail_cached_until_proposal_changes(self):
+        """Test that repeat opens reuse the cached HTML until the proposal is saved."""
+        proposal = RefactoringProposal.objects.create(
+            proposal_id="ARC-102", proposal_type='cycle_break', summary="Original",
+        )
+        request = RequestFactory().get('/')
+
+        RefactoringBacklog.htmx_detail(request, "ARC-102")
+        with CaptureQueriesContext(connection) as queries:
+            response = RefactoringBacklog.htmx_detail(request, "ARC-102")
+        assert len(queries) == 1
+        assert b'Original' in response.content
+
+        proposal.summary = "Changed"
+        proposal.save()
+        response = RefactoringBacklog.htmx_detail(request, "ARC-102")
+        assert b'Changed' in response.content
+
+    def test_detail_not_found(self):
+        """Test that an unknown proposal returns 404."""
+        response = RefactoringBacklog.htmx_detail(RequestFactory().get('/'), "ARC-404")
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db
+class TestRefactoringBacklogStatus:
+    """Tests for RefactoringBacklog.htmx_update_status."""
+
+    def post_status(self, proposal_id, status):
+        request = RequestFactory().post(
+            '/', data=json.dumps({'status': status}), content_type='application/json'
+        )
+        return RefactoringBacklog.htmx_update_status(request, proposal_id)
+
+    def test_status_updated(self):
+        """Test that the status is saved with one query and the new badge returned."""
+        proposal = RefactoringProposal.objects.create(
+            proposal_id="ARC-200", proposal_type='cycle_break', summary="S",
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_status("ARC-200", 'approved')
+
+        assert response.status_code == 200
+        assert len(queries) == 1
+        assert b'Approved' in response.content
+        proposal.refresh_from_db()
+        assert proposal.status == 'approved'
+
+    def test_status_change_refreshes_detail(self):
+        """Test that a status change is visible in a previously cached detail."""
+        RefactoringProposal.objects.create(
+            proposal_id="ARC-201", proposal_type='cycle_break', summary="S",
+        )
+        RefactoringBacklog.htmx_detail(RequestFactory().get('/'), "ARC-201")
+
+        self.post_status("ARC-201", 'rejected')
+
+        response = RefactoringBacklog.htmx_detail(RequestFactory().get('/'), "ARC-201")
+        assert b'Rejected' in response.content
+
+    def test_invalid_status(self):
+        """Test that unknown statuses are rejected."""
+        RefactoringProposal.objects.create(
+            proposal_id="ARC-202", proposal_type='cycle_break', summary="S",
+        )
+        assert self.post_status("ARC-202", 'bogus').status_code == 400
+
+    def test_unknown_proposal(self):
+        """Test that updating an unknown proposal returns 404."""
+        assert self.post_status("ARC-404", 'approved').status_code == 404
+
+
+class TestBadgeClasses:
+    """Tests for the RefactoringProposal badge class properties."""
+
+    def test_every_status_has_badge(self):
+        """Test that each status choice maps to its own badge entry."""
+        for value, _ in RefactoringProposal.STATUS_CHOICES:
+            assert value in RefactoringProposal.STATUS_BADGES
+
+    def test_badge_lookup(self):
+        """Test badge classes for known and unknown values."""
+        proposal = RefactoringProposal(impact='high', risk='low', status='completed')
+        assert proposal.impact_badge_class == 'danger'
+        assert proposal.risk_badge_class == 'success'
+        assert proposal.status_badge_class == 'success'
+
+        proposal.status = 'unknown'
+        assert proposal.status_badge_class == 'secondary'
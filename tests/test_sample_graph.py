@@ -0,0 +1,48 @@
+"""
+Tests for the sample_graph management command.
+"""
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from dependencies.models import Component, Dependency, NodeGroup
+
+
+def run(*args):
+    out = StringIO()
+    call_command('sample_graph', *args, stdout=out)
+    return out.getvalue()
+
+
+@pytest.mark.django_db
+class TestSampleGraph:
+    """Tests for the sample_graph command."""
+
+    def test_creates_graph(self):
+        """Test that groups, components and dependencies are all created."""
+        output = run()
+
+        assert NodeGroup.objects.count() == 11
+        assert Component.objects.count() == 2000
+        assert Component.objects.filter(group__isnull=True).count() == 0
+        assert Dependency.objects.count() > 2000
+        assert f'{Dependency.objects.count()} dependencies' in output
+
+    def test_component_keys_follow_domain(self):
+        """Test that each component key is its group key and artifact id."""
+        run()
+
+        for key, group_key, artifact_id in Component.objects.values_list(
+            'key', 'group__key', 'artifact_id'
+        )[:100]:
+            assert key == f'{group_key}:{artifact_id}'
+
+    def test_descriptions_optional(self):
+        """Test that descriptions are only filled in with --with-descriptions."""
+        run()
+        assert not Component.objects.exclude(description='').exists()
+
+    def test_with_descriptions(self):
+        """Test that --with-descriptions describes every component."""
+        run('--with-descriptions')
+        assert not Component.objects.filter(description='').exists()
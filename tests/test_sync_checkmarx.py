@@ -0,0 +1,734 @@
+"""
+Tests for the sync_checkmarx management command and Checkmarx sync helpers.
+"""
+import json
+import threading
+import time
+from io import StringIO
+
+import httpx
+import pytest
+from django.core.management import call_command
+
+from dependencies import models, service as service_module, sync as sync_module
+from dependencies.management.commands import sync_checkmarx
+from dependencies.management.commands.sync_checkmarx import Command
+from dependencies.service import CheckmarxDependency, CheckmarxProject, CheckmarxService, TokenBucket
+from dependencies.sync import (
+    export_checkmarx_sboms, import_from_cached_sboms, sync_checkmarx_dependencies,
+    sync_checkmarx_projects,
+)
+
+
+class FakeCheckmarx:
+    """Stand-in for CheckmarxService that records SBOM exports."""
+
+    def __init__(self, scans, cached=(), export_time=0.0, sboms=None):
+        self.scans = scans
+        self.sboms = sboms or {}
+        self.cached = set(cached)
+        self.export_time = export_time
+        self.exported = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def get_projects(self):
+        for project_id in self.scans:
+            yield CheckmarxProject(id=project_id, name=f'Project {project_id}')
+
+    def get_scans(self, project_id):
+        scan_id = self.scans[project_id]
+        return [{'id': scan_id}] if scan_id else []
+
+    def is_sbom_cached(self, scan_id):
+        return scan_id in self.cached
+
+    def export_sbom(self, scan_id, use_cache=True):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.export_time)
+        with self.lock:
+            self.in_flight -= 1
+            self.exported.append(scan_id)
+
+    def get_dependencies_from_sbom(self, scan_id, project_id):
+        for name, is_direct in self.sboms.get(scan_id, []):
+            yield CheckmarxDependency(project_id, name, '1.0', is_direct)
+
+
+class TestExportCheckmarxSboms:
+    """Tests for export_checkmarx_sboms."""
+
+    def test_counts_exported_and_cached(self):
+        """Test that cached scans are skipped and the rest exported."""
+        service = FakeCheckmarx({'p1': 's1', 'p2': 's2', 'p3': None}, cached={'s2'})
+        progress = []
+
+        result = export_checkmarx_sboms(service, on_progress=lambda *args: progress.append(args))
+
+        assert result == {'exported': 1, 'skipped': 1, 'failed': 0}
+        assert service.exported == ['s1']
+        assert progress[-1] == (1, 1, 3)
+
+    def test_rescanned_project_exported(self):
+        """Test that only projects whose latest scan is not cached are exported."""
+        service = FakeCheckmarx({'p1': 's1-new', 'p2': 's2'}, cached={'s1-old', 's2'})
+
+        result = export_checkmarx_sboms(service)
+
+        assert result == {'exported': 1, 'skipped': 1, 'failed': 0}
+        assert service.exported == ['s1-new']
+
+    def test_force_exports_cached(self):
+        """Test that force re-exports SBOMs that are already cached."""
+        service = FakeCheckmarx({'p1': 's1', 'p2': 's2'}, cached={'s1', 's2'})
+
+        result = export_checkmarx_sboms(service, force=True)
+
+        assert result == {'exported': 2, 'skipped': 0, 'failed': 0}
+        assert service.exported == ['s1', 's2']
+
+    def test_sequential_by_default(self):
+        """Test that only one export runs at a time without concurrency."""
+        service = FakeCheckmarx({f'p{i}': f's{i}' for i in range(4)}, export_time=0.01)
+
+        export_checkmarx_sboms(service)
+
+        assert service.max_in_flight == 1
+        assert service.exported == ['s0', 's1', 's2', 's3']
+
+    def test_concurrent_exports(self):
+        """Test that exports overlap up to the concurrency limit."""
+        service = FakeCheckmarx({f'p{i}': f's{i}' for i in range(6)}, export_time=0.05)
+
+        result = export_checkmarx_sboms(service, concurrency=3)
+
+        assert result['exported'] == 6
+        assert sorted(service.exported) == [f's{i}' for i in range(6)]
+        assert 1 < service.max_in_flight <= 3
+
+    def test_export_error_propagates(self):
+        """Test that a failed export stops the run with its error."""
+        service = FakeCheckmarx({'p1': 's1'})
+
+        def export_sbom(scan_id, use_cache=True):
+            raise RuntimeError('boom')
+        service.export_sbom = export_sbom
+
+        with pytest.raises(RuntimeError, match='boom'):
+            export_checkmarx_sboms(service, concurrency=2)
+
+    def test_export_errors_reported(self):
+        """Test that with on_error a failed export is reported and the walk continues."""
+        service = FakeCheckmarx({'p1': 's1', 'p2': 's2', 'p3': 's3'})
+        export_sbom = service.export_sbom
+
+        def failing_export_sbom(scan_id, use_cache=True):
+            if scan_id == 's2':
+                raise RuntimeError('boom')
+            export_sbom(scan_id, use_cache)
+        service.export_sbom = failing_export_sbom
+        errors = []
+
+        result = export_checkmarx_sboms(
+            service, concurrency=2, on_error=lambda project, e: errors.append((project.id, str(e))),
+        )
+
+        assert result == {'exported': 2, 'skipped': 0, 'failed': 1}
+        assert errors == [('p2', 'boom')]
+        assert sorted(service.exported) == ['s1', 's3']
+
+
+@pytest.mark.django_db
+class TestSyncCheckmarxProjects:
+    """Tests for sync_checkmarx_projects."""
+
+    def test_creates_and_updates_projects(self):
+        """Test that new projects are created and known ones renamed."""
+        models.CheckmarxProject.objects.create(checkmarx_id='p1', name='Old name')
+        service = FakeCheckmarx({'p1': 's1', 'p2': 's2', 'p3': 's3'})
+
+        assert sync_checkmarx_projects(service, batch_size=2) == 3
+
+        names = dict(models.CheckmarxProject.objects.values_list('checkmarx_id', 'name'))
+        assert names == {'p1': 'Project p1', 'p2': 'Project p2', 'p3': 'Project p3'}
+
+    def test_repeated_project_written_once(self):
+        """Test that a project listed twice in one batch does not conflict."""
+        service = FakeCheckmarx({'p1': 's1'})
+        service.get_projects = lambda: iter([
+            CheckmarxProject(id='p1', name='First'), CheckmarxProject(id='p1', name='Second'),
+        ])
+
+        sync_checkmarx_projects(service)
+
+        assert list(models.CheckmarxProject.objects.values_list('name', flat=True)) == ['Second']
+
+
+@pytest.mark.django_db
+class TestSyncCheckmarxDependencies:
+    """Tests for sync_checkmarx_dependencies."""
+
+    @pytest.fixture
+    def source(self):
+        source = models.Component.objects.create(key='app', name='app')
+        models.CheckmarxProject.objects.create(checkmarx_id='p1', name='app', component=source)
+        for name in ('lib-a', 'lib-b', 'lib-c'):
+            models.Component.objects.create(key=name, name=name, component_type='java')
+        return source
+
+    def scopes(self, source):
+        return dict(
+            models.Dependency.objects.filter(source=source).values_list('target__name', 'scope')
+        )
+
+    def test_creates_dependencies(self, source):
+        """Test that SBOM components become direct or transitive dependencies."""
+        service = FakeCheckmarx({'p1': 's1'}, sboms={'s1': [('lib-a', True), ('lib-b', False)]})
+
+        assert sync_checkmarx_dependencies(service) == 2
+        assert self.scopes(source) == {'lib-a': 'direct', 'lib-b': 'transitive'}
+
+    def test_updates_existing_scope(self, source):
+        """Test that a known dependency is updated instead of duplicated."""
+        lib_a = models.Component.objects.get(name='lib-a')
+        models.Dependency.objects.create(source=source, target=lib_a, scope='transitive', weight=3)
+        service = FakeCheckmarx({'p1': 's1'}, sboms={'s1': [('lib-a', True), ('lib-c', True)]})
+
+        sync_checkmarx_dependencies(service)
+
+        assert self.scopes(source) == {'lib-a': 'direct', 'lib-c': 'direct'}
+        assert models.Dependency.objects.get(source=source, target=lib_a).weight == 1
+
+    def test_cached_only_skips_uncached(self, source):
+        """Test that use_cached_only ignores projects without a cached SBOM."""
+        service = FakeCheckmarx({'p1': 's1'}, sboms={'s1': [('lib-a', True)]})
+
+        assert sync_checkmarx_dependencies(service, use_cached_only=True) == 0
+        assert self.scopes(source) == {}
+
+
+def write_sbom(path, edges):
+    """Write a CycloneDX SBOM whose packages depend on each other as in `edges`."""
+    refs = sorted({ref for edge in edges for ref in edge})
+    path.write_text(json.dumps({
+        'components': [{'bom-ref': f'pkg:maven/org.example/{ref}@1.0'} for ref in refs],
+        'dependencies': [
+            {'ref': f'pkg:maven/org.example/{source}@1.0', 'dependsOn': [f'pkg:maven/org.example/{target}@1.0']}
+            for source, target in edges
+        ],
+    }))
+
+
+@pytest.mark.django_db
+class TestImportFromCachedSboms:
+    """Tests for import_from_cached_sboms."""
+
+    @pytest.fixture(autouse=True)
+    def packages(self):
+        for name in ('app', 'lib-a', 'lib-b'):
+            models.Component.objects.create(
+                key=f'org.example:{name}', name=name, maven_group_id='org.example', artifact_id=name,
+            )
+
+    def test_identical_sboms_read_once(self, tmp_path):
+        """Test that a byte-identical copy of an SBOM is skipped."""
+        write_sbom(tmp_path / 'scan-1.json', [('app', 'lib-a')])
+        write_sbom(tmp_path / 'scan-2.json', [('app', 'lib-a')])
+        write_sbom(tmp_path / 'scan-3.json', [('app', 'lib-b')])
+
+        result = import_from_cached_sboms(tmp_path)
+
+        assert result['dependencies'] == 2
+        assert set(models.Dependency.objects.values_list('source__name', 'target__name')) == {
+            ('org.example.app', 'org.example.lib-a'), ('org.example.app', 'org.example.lib-b'),
+        }
+
+    def test_unreadable_sbom_skipped(self, tmp_path):
+        """Test that an invalid JSON file is skipped in both passes."""
+        (tmp_path / 'broken.json').write_text('{not json')
+        write_sbom(tmp_path / 'scan-1.json', [('app', 'lib-a')])
+
+        assert import_from_cached_sboms(tmp_path)['dependencies'] == 1
+
+    def test_compressed_sboms_imported(self, tmp_path):
+        """Test that .json.zst files are read, and deduplicated by content."""
+        zstandard = pytest.importorskip('zstandard')
+        write_sbom(tmp_path / 'scan-1.json', [('app', 'lib-a')])
+        write_sbom(tmp_path / 'plain.json', [('app', 'lib-b')])
+        compressed = zstandard.ZstdCompressor().compress((tmp_path / 'plain.json').read_bytes())
+        (tmp_path / 'plain.json').unlink()
+        (tmp_path / 'scan-2.json.zst').write_bytes(compressed)
+        (tmp_path / 'scan-3.json.zst').write_bytes(compressed)
+
+        assert import_from_cached_sboms(tmp_path)['dependencies'] == 2
+
+    def test_parallel_parsing(self, tmp_path):
+        """Test that worker processes import the same as serial parsing."""
+        (tmp_path / 'broken.json').write_text('{not json')
+        for i in range(sync_module.PARALLEL_SBOM_MIN_FILES):
+            write_sbom(tmp_path / f'scan-{i}.json', [('app', 'lib-a' if i % 2 else 'lib-b')])
+
+        result = import_from_cached_sboms(tmp_path, parallelism=2)
+
+        assert result['dependencies'] == 2
+        assert models.Dependency.objects.count() == 2
+
+
+    def test_parallel_parsing_bounded(self, tmp_path, monkeypatch):
+        """Test that only a bounded window of files is queued to the workers."""
+        outstanding = []
+        peak = []
+
+        class Future:
+            def __init__(self, result):
+                self._result = result
+
+            def result(self):
+                outstanding.pop()
+                return self._result
+
+        class Executor:
+            def __init__(self, max_workers):
+                pass
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def submit(self, fn, *args):
+                outstanding.append(None)
+                peak.append(len(outstanding))
+                return Future(fn(*args))
+
+        monkeypatch.setattr(sync_module, 'ProcessPoolExecutor', Executor)
+        for i in range(sync_module.PARALLEL_SBOM_MIN_FILES * 4):
+            write_sbom(tmp_path / f'scan-{i}.json', [('app', 'lib-a' if i % 2 else 'lib-b')])
+
+        result = import_from_cached_sboms(tmp_path, parallelism=2)
+
+        assert result['dependencies'] == 2
+        assert max(peak) == 2 * sync_module.PARALLEL_SBOM_PENDING_PER_WORKER
+        assert outstanding == []
+
+class TestSbomCache:
+    """Tests for CheckmarxService's plain and zstd-compressed SBOM cache."""
+
+    @pytest.fixture(autouse=True)
+    def zstandard(self):
+        return pytest.importorskip('zstandard')
+
+    def export(self, service, monkeypatch, content=b'{"components": []}', **kwargs):
+        """Run export_sbom against canned export API responses."""
+        monkeypatch.setattr(service, '_ensure_valid_token', lambda: None)
+        monkeypatch.setattr(service, '_post', lambda *args, **kwargs: {'exportId': 'e1'})
+        monkeypatch.setattr(service, '_get', lambda *args, **kwargs: {
+            'exportStatus': 'Completed', 'fileUrl': 'https://cx.example/file',
+        })
+        request = httpx.Request('GET', 'https://cx.example/file')
+        monkeypatch.setattr(
+            service_module.httpx, 'get',
+            lambda *args, **kwargs: httpx.Response(200, content=content, request=request),
+        )
+        return service.export_sbom('scan-1', **kwargs)
+
+    def test_export_compressed(self, tmp_path, monkeypatch, zstandard):
+        """Test that exports are stored as .json.zst and read back."""
+        service = CheckmarxService(cache_dir=tmp_path, export_delay=0, cache_compression='zstd')
+
+        path = self.export(service, monkeypatch)
+
+        assert path.endswith('scan-1.json.zst')
+        assert zstandard.ZstdDecompressor().decompress(open(path, 'rb').read()) == b'{"components": []}'
+        assert service.is_sbom_cached('scan-1')
+        assert service.get_cached_sbom('scan-1') == {'components': []}
+        assert service.list_cached_scans() == ['scan-1']
+
+    def test_export_uncompressed(self, tmp_path, monkeypatch):
+        """Test that cache_compression='none' keeps plain JSON files."""
+        service = CheckmarxService(cache_dir=tmp_path, export_delay=0, cache_compression='none')
+
+        assert self.export(service, monkeypatch).endswith('scan-1.json')
+        assert service.get_cached_sbom('scan-1') == {'components': []}
+
+    def test_reexport_replaces_other_format(self, tmp_path, monkeypatch):
+        """Test that re-exporting a plain cached SBOM leaves only the compressed copy."""
+        (tmp_path / 'scan-1.json').write_text('{"components": [{"name": "old"}]}')
+        service = CheckmarxService(cache_dir=tmp_path, export_delay=0, cache_compression='zstd')
+
+        self.export(service, monkeypatch, use_cache=False)
+
+        assert not (tmp_path / 'scan-1.json').exists()
+        assert service.get_cached_sbom('scan-1') == {'components': []}
+
+    def test_plain_cache_reused(self, tmp_path):
+        """Test that SBOMs cached before compression still count as cached."""
+        (tmp_path / 'scan-1.json').write_text('{"components": []}')
+        service = CheckmarxService(cache_dir=tmp_path, cache_compression='zstd')
+
+        assert service.export_sbom('scan-1') == str(tmp_path / 'scan-1.json')
+        assert service.get_cached_sbom('scan-1') == {'components': []}
+
+    def test_corrupt_compressed_sbom(self, tmp_path):
+        """Test that an unreadable .zst file is reported as not loadable."""
+        (tmp_path / 'scan-1.json.zst').write_bytes(b'not zstd')
+        service = CheckmarxService(cache_dir=tmp_path)
+
+        assert service.get_cached_sbom('scan-1') is None
+
+
+class TestParseSbom:
+    """Tests for parse_sbom with and without orjson."""
+
+    @pytest.mark.parametrize('has_orjson', [True, False])
+    def test_parses_and_rejects(self, monkeypatch, has_orjson):
+        """Test that both parsers agree and raise json.JSONDecodeError."""
+        if has_orjson:
+            pytest.importorskip('orjson')
+        monkeypatch.setattr(service_module, 'HAS_ORJSON', has_orjson)
+
+        assert service_module.parse_sbom(b'{"components": [{"name": "a"}]}') == {
+            'components': [{'name': 'a'}],
+        }
+        with pytest.raises(json.JSONDecodeError):
+            service_module.parse_sbom(b'{not json')
+
+
+class TestRateLimitRetry:
+    """Tests for CheckmarxService retrying HTTP 429 responses."""
+
+    @pytest.fixture
+    def service(self, monkeypatch):
+        service = CheckmarxService(base_url='https://cx.example', request_delay=0)
+        monkeypatch.setattr(service, '_ensure_valid_token', lambda: None)
+        return service
+
+    def respond(self, monkeypatch, responses):
+        calls, sleeps = [], []
+
+        def request(method, url, **kwargs):
+            calls.append(url)
+            return responses.pop(0)
+
+        monkeypatch.setattr(service_module.httpx, 'request', request)
+        monkeypatch.setattr(service_module.time, 'sleep', sleeps.append)
+        return calls, sleeps
+
+    def make_response(self, status, headers=None, json=None):
+        request = httpx.Request('GET', 'https://cx.example/api/projects')
+        return httpx.Response(status, headers=headers, json=json, request=request)
+
+    def test_waits_retry_after(self, service, monkeypatch):
+        """Test that a 429 is retried after the Retry-After delay."""
+        calls, sleeps = self.respond(monkeypatch, [
+            self.make_response(429, headers={'Retry-After': '7'}),
+            self.make_response(200, json={'projects': []}),
+        ])
+
+        assert service._get('api/projects') == {'projects': []}
+        assert len(calls) == 2
+        assert sleeps == [7.0]
+
+    def test_default_wait_without_header(self, service, monkeypatch):
+        """Test that a 429 without a numeric Retry-After uses the default wait."""
+        calls, sleeps = self.respond(monkeypatch, [
+            self.make_response(429, headers={'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}),
+            self.make_response(200, json={}),
+        ])
+
+        service._get('api/projects')
+        assert sleeps == [service_module.DEFAULT_RETRY_AFTER]
+
+    def test_gives_up_after_retries(self, service, monkeypatch):
+        """Test that repeated 429s raise after MAX_RATE_LIMIT_RETRIES retries."""
+        retries = service_module.MAX_RATE_LIMIT_RETRIES
+        calls, sleeps = self.respond(monkeypatch, [
+            self.make_response(429) for _ in range(retries + 1)
+        ])
+
+        with pytest.raises(httpx.HTTPStatusError):
+            service._get('api/projects')
+        assert len(calls) == retries + 1
+
+
+class TestTokenCache:
+    """Tests for reusing Checkmarx access tokens across service instances."""
+
+    @pytest.fixture
+    def token_requests(self, monkeypatch):
+        requests = []
+
+        def post(url, **kwargs):
+            requests.append(url)
+            request = httpx.Request('POST', url)
+            return httpx.Response(200, json={'access_token': f'token-{len(requests)}', 'expires_in': 300}, request=request)
+
+        monkeypatch.setattr(service_module.httpx, 'post', post)
+        return requests
+
+    def make_service(self, tmp_path, **kwargs):
+        options = {'base_url': 'https://ast.example', 'tenant': 't', 'client_id': 'c', 'client_secret': 's'}
+        return CheckmarxService(cache_dir=tmp_path, **{**options, **kwargs})
+
+    def test_token_reused(self, tmp_path, token_requests):
+        """Test that a second service reuses the first one's token."""
+        self.make_service(tmp_path)._ensure_valid_token()
+        service = self.make_service(tmp_path)
+        service._ensure_valid_token()
+
+        assert len(token_requests) == 1
+        assert service._access_token == 'token-1'
+        token_path = service._get_token_path()
+        assert token_path.stat().st_mode & 0o777 == 0o600
+        assert service.list_cached_scans() == []
+
+    def test_existing_token_file_restricted(self, tmp_path, token_requests):
+        """Test that rewriting a readable token file makes it owner-only."""
+        service = self.make_service(tmp_path)
+        token_path = service._get_token_path()
+        token_path.write_text('{}')
+        token_path.chmod(0o644)
+        service._ensure_valid_token()
+
+        assert token_path.stat().st_mode & 0o777 == 0o600
+        assert json.loads(token_path.read_text())['access_token'] == 'token-1'
+        assert [p.name for p in tmp_path.iterdir()] == [token_path.name]
+
+    def test_expired_token_refreshed(self, tmp_path, token_requests, monkeypatch):
+        """Test that an expired cached token is not used."""
+        self.make_service(tmp_path)._ensure_valid_token()
+        monkeypatch.setattr(service_module.time, 'time', lambda: 10 ** 12)
+        self.make_service(tmp_path)._ensure_valid_token()
+
+        assert len(token_requests) == 2
+
+    def test_token_per_client(self, tmp_path, token_requests):
+        """Test that another client or tenant does not get the cached token."""
+        self.make_service(tmp_path)._ensure_valid_token()
+        self.make_service(tmp_path, client_id='other')._ensure_valid_token()
+        self.make_service(tmp_path, tenant='other')._ensure_valid_token()
+
+        assert len(token_requests) == 3
+
+    def test_force_reauth(self, tmp_path, token_requests):
+        """Test that force_reauth ignores the cached token and replaces it."""
+        self.make_service(tmp_path)._ensure_valid_token()
+        self.make_service(tmp_path, force_reauth=True)._ensure_valid_token()
+        service = self.make_service(tmp_path)
+        service._ensure_valid_token()
+
+        assert len(token_requests) == 2
+        assert service._access_token == 'token-2'
+
+
+    def respond(self, monkeypatch, statuses):
+        """Answer API requests with `statuses` in turn, recording the tokens sent."""
+        tokens = []
+
+        def request(method, url, headers=None, **kwargs):
+            tokens.append(headers['Authorization'])
+            return httpx.Response(statuses.pop(0), json={}, request=httpx.Request(method, url))
+
+        monkeypatch.setattr(service_module.httpx, 'request', request)
+        return tokens
+
+    def test_revoked_cached_token_replaced(self, tmp_path, token_requests, monkeypatch):
+        """Test that a 401 for a cached token re-authenticates and retries once."""
+        self.make_service(tmp_path, request_delay=0)._ensure_valid_token()
+        service = self.make_service(tmp_path, request_delay=0)
+        tokens = self.respond(monkeypatch, [401, 200])
+
+        assert service._get('api/projects') == {}
+        assert tokens == ['Bearer token-1', 'Bearer token-2']
+        assert json.loads(service._get_token_path().read_text())['access_token'] == 'token-2'
+
+    def test_concurrent_refresh_authenticates_once(self, tmp_path, monkeypatch):
+        """Test that threads finding the token expired share one re-authentication."""
+        requests = []
+
+        def post(url, **kwargs):
+            requests.append(url)
+            time.sleep(0.05)
+            return httpx.Response(200, json={'access_token': 'fresh', 'expires_in': 300},
+                                  request=httpx.Request('POST', url))
+
+        monkeypatch.setattr(service_module.httpx, 'post', post)
+        service = self.make_service(tmp_path, force_reauth=True)
+        threads = [threading.Thread(target=service._ensure_valid_token) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(requests) == 1
+        assert service._access_token == 'fresh'
+
+    def test_concurrent_401s_authenticate_once(self, tmp_path, token_requests, monkeypatch):
+        """Test that requests rejected with the same cached token re-authenticate once."""
+        self.make_service(tmp_path, request_delay=0)._ensure_valid_token()
+        service = self.make_service(tmp_path, request_delay=0)
+        service._ensure_valid_token()
+        barrier = threading.Barrier(2)
+
+        def request(method, url, headers=None, **kwargs):
+            if headers['Authorization'] == 'Bearer token-1':
+                barrier.wait(timeout=5)
+                return httpx.Response(401, request=httpx.Request(method, url))
+            return httpx.Response(200, json={}, request=httpx.Request(method, url))
+
+        monkeypatch.setattr(service_module.httpx, 'request', request)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(service._get('api/projects')))
+            for _ in range(2)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == [{}, {}]
+        assert len(token_requests) == 2
+
+    def test_fresh_token_401_raises(self, tmp_path, token_requests, monkeypatch):
+        """Test that a 401 for a newly issued token is not retried."""
+        service = self.make_service(tmp_path, request_delay=0)
+        tokens = self.respond(monkeypatch, [401, 200])
+
+        with pytest.raises(httpx.HTTPStatusError):
+            service._get('api/projects')
+        assert len(tokens) == 1
+        assert len(token_requests) == 1
+
+
+class TestTokenBucket:
+    """Tests for the TokenBucket request limiter."""
+
+    @pytest.fixture
+    def clock(self, monkeypatch):
+        """Fake monotonic clock that sleep() advances."""
+        clock = {'now': 1000.0, 'sleeps': []}
+
+        def sleep(seconds):
+            clock['sleeps'].append(round(seconds, 6))
+            clock['now'] += seconds
+
+        monkeypatch.setattr(service_module.time, 'monotonic', lambda: clock['now'])
+        monkeypatch.setattr(service_module.time, 'sleep', sleep)
+        return clock
+
+    def test_spaces_request_starts(self, clock):
+        """Test that only the time left in the interval is slept."""
+        bucket = TokenBucket(rate=0.5)
+
+        bucket.acquire()
+        clock['now'] += 1.5  # time spent on the request itself
+        bucket.acquire()
+
+        assert clock['sleeps'] == [0.5]
+
+    def test_burst(self, clock):
+        """Test that a burst of tokens is available without waiting."""
+        bucket = TokenBucket(rate=1, burst=3)
+
+        for _ in range(4):
+            bucket.acquire()
+
+        assert clock['sleeps'] == [1.0]
+
+    def test_zero_rate_never_waits(self, clock):
+        """Test that a rate of 0 disables limiting."""
+        bucket = TokenBucket(rate=0)
+
+        for _ in range(3):
+            bucket.acquire()
+
+        assert clock['sleeps'] == []
+
+    def test_exhausted_quota_waits_for_reset(self, clock):
+        """Test that RateLimit-Remaining 0 holds requests until the reset."""
+        bucket = TokenBucket(rate=0)
+
+        bucket.update_from_headers({'RateLimit-Remaining': '0', 'RateLimit-Reset': '30'})
+        bucket.acquire()
+
+        assert clock['sleeps'] == [30.0]
+
+    def test_remaining_quota_spread_over_window(self, clock):
+        """Test that the remaining quota slows requests to fit the window."""
+        bucket = TokenBucket(rate=10)
+
+        bucket.update_from_headers({'RateLimit-Remaining': '4', 'RateLimit-Reset': '20'})
+        bucket.acquire()
+
+        assert clock['sleeps'] == [5.0]
+
+    def test_headers_never_speed_up(self, clock):
+        """Test that a generous quota does not override the configured rate."""
+        bucket = TokenBucket(rate=0.5)
+
+        bucket.acquire()
+        bucket.update_from_headers({'RateLimit-Remaining': '1000', 'RateLimit-Reset': '1'})
+        bucket.acquire()
+
+        assert clock['sleeps'] == [2.0]
+
+    def test_missing_headers_ignored(self, clock):
+        """Test that responses without RateLimit headers change nothing."""
+        bucket = TokenBucket(rate=0)
+
+        bucket.update_from_headers({'RateLimit-Remaining': 'n/a'})
+        bucket.update_from_headers({})
+        bucket.acquire()
+
+        assert clock['sleeps'] == []
+
+
+class TestWriteProgress:
+    """Tests for Command._write_progress."""
+
+    def write(self, monkeypatch, times, tty):
+        clock = iter(times)
+        monkeypatch.setattr(sync_checkmarx.time, 'monotonic', lambda: next(clock))
+        out = StringIO()
+        out.isatty = lambda: tty
+        command = Command(stdout=out)
+
+        for count in range(len(times)):
+            command._write_progress(f'Processed: {count}')
+        return out.getvalue()
+
+    def test_updates_rate_limited(self, monkeypatch):
+        """Test that progress lines within PROGRESS_INTERVAL are dropped."""
+        output = self.write(monkeypatch, [100.0, 100.05, 100.2, 100.25], tty=True)
+        assert output == 'Processed: 0\rProcessed: 2\r'
+
+    def test_log_lines_without_terminal(self, monkeypatch):
+        """Test that non-terminal output gets whole lines every PROGRESS_LOG_INTERVAL."""
+        output = self.write(monkeypatch, [100.0, 100.2, 105.0, 110.0, 115.0], tty=False)
+        assert output == 'Processed: 0\nProcessed: 3\n'
+
+
+class TestOptionValidation:
+    """Tests for sync_checkmarx rejecting out-of-range options."""
+
+    @pytest.mark.parametrize('option', ['--concurrency', '--write-batch-size'])
+    @pytest.mark.parametrize('value', ['0', '-1'])
+    def test_below_one_rejected(self, option, value, monkeypatch):
+        """Test that a value below 1 stops the command before any sync starts."""
+        monkeypatch.setattr(sync_checkmarx, 'CheckmarxService', None)
+        out, err = StringIO(), StringIO()
+        call_command('sync_checkmarx', option, value, stdout=out, stderr=err)
+
+        assert f'{option} must be at least 1' in err.getvalue()
+        assert out.getvalue() == ''